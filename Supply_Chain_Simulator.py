@@ -1,15 +1,20 @@
-import pysqlite3
-import sys
-sys.modules['sqlite3'] = pysqlite3
-
-
 import streamlit as st
 import os
-from crewai import Crew, Agent, Task, Process
-from langchain.chat_models import ChatOpenAI
+import time
 import pandas as pd
+import plotly.express as px
 from datetime import datetime
-from textwrap import dedent
+from functools import partial
+# Only modules that do not pull in crewai, langchain or openai are imported up front;
+# the agent stack is loaded in the background (see section 4 and stack.py).
+from scheduler import DEFAULT_MAX_WORKERS
+from summarization import DEFAULT_EXTRACT_TOKENS, DEFAULT_SUMMARY_TOKEN_BUDGET
+from context_slicing import DEFAULT_DIGEST_TOKENS, DEFAULT_SLICE_TOKENS
+from run_store import DEFAULT_RUN_STORE_PATH, get_run_store
+from run_archive import DEFAULT_ARCHIVE_DIR, get_run_archive
+from kpis import KPI_FIELDS
+from monte_carlo import DEFAULT_TRIALS
+from stack import get_stack_loader
 
 
 # -----------------------------------------------------------------------------------
@@ -25,8 +30,41 @@ if not openai_api_key:
 
 os.environ["OPENAI_API_KEY"] = openai_api_key
 
-# Initialize the OpenAI LLM with GPT-4-mini
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7)
+# Maximum number of agents allowed to run at the same time in the production & logistics stage
+max_parallel_tasks = int(st.secrets.get("MAX_PARALLEL_TASKS", DEFAULT_MAX_WORKERS))
+
+# The settings of the LLM cache, the rate limiter, the task memo, the job queue and the
+# metrics are read in section 4, next to the agent stack that uses them.
+
+# Every finished run is kept in RUN_STORE_PATH and can be reopened from the run history.
+run_store_path = st.secrets.get("RUN_STORE_PATH", DEFAULT_RUN_STORE_PATH)
+# Finished runs are also appended to the Parquet archive in ARCHIVE_DIR, which the Run Analytics
+# page reads. Set ARCHIVE_DIR to "" to disable it.
+archive_dir = st.secrets.get("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+# Open pages poll their simulation every JOB_POLL_SECONDS.
+job_poll_seconds = float(st.secrets.get("JOB_POLL_SECONDS", 1.0))
+
+# Token limits of the map-reduce summary: each report is reduced to an extract of at most
+# SUMMARY_EXTRACT_TOKENS, and all extracts together must fit in SUMMARY_TOKEN_BUDGET.
+summary_extract_tokens = int(st.secrets.get("SUMMARY_EXTRACT_TOKENS", DEFAULT_EXTRACT_TOKENS))
+summary_token_budget = int(st.secrets.get("SUMMARY_TOKEN_BUDGET", DEFAULT_SUMMARY_TOKEN_BUDGET))
+
+# Each downstream task receives a shared digest of the crisis report plus the sections
+# relevant to its role, within CRISIS_CONTEXT_TOKENS.
+crisis_digest_tokens = int(st.secrets.get("CRISIS_DIGEST_TOKENS", DEFAULT_DIGEST_TOKENS))
+crisis_context_tokens = int(st.secrets.get("CRISIS_CONTEXT_TOKENS", DEFAULT_SLICE_TOKENS))
+
+# Number of Monte Carlo trials whose figures ground the agents' reports (0 disables the model).
+monte_carlo_trials = int(st.secrets.get("MONTE_CARLO_TRIALS", DEFAULT_TRIALS))
+
+# With SIMULATION_DEADLINE_SECONDS (e.g. 90), a run finishes within about that time: every
+# task gets a share of the time left, and agents that run out of it hand in a partial report.
+deadline_seconds = float(st.secrets.get("SIMULATION_DEADLINE_SECONDS", 0)) or None
+
+# With MEMORY_RECALL_ITEMS (e.g. 3), every production task also receives that many notes from
+# the reports further up its supply chain, at up to 200 tokens each. 0 leaves the prompts unchanged.
+memory_recall_items = int(st.secrets.get("MEMORY_RECALL_ITEMS", 0))
 
 # -----------------------------------------------------------------------------------
 # 2. CUSTOM STYLES & MAIN TITLE
@@ -61,677 +99,371 @@ with st.container():
 current_date = datetime.now().strftime("%Y-%m-%d")
 
 # -----------------------------------------------------------------------------------
-# 4. AGENTS DEFINITION (UNCHANGED CONFIGURATION)
+# 4. AGENTS DEFINITION (SHARED CATALOG, SEE agents.py)
 # -----------------------------------------------------------------------------------
-crisis_analyst = Agent(
-    role="Crisis Analyst",
-    goal="Expand the user's crisis input into a comprehensive detailed scenario across various domains.",
-    backstory=dedent("""
-    Dr. Elise Carter is an independent expert with over 20 years of experience in assessing global crises affecting various industries,
-    including technology supply chains. She holds a Ph.D. in International Economics from the London School of Economics and Political Science (LSE), 
-    where her groundbreaking thesis on 'The Interplay Between Geopolitics and Technology Supply Chains' earned international recognition.
-
-    Dr. Carter's career began as an economist focusing on global trade dynamics. She later served as a senior advisor for the United Nations Development Programme (UNDP), 
-    addressing supply chain vulnerabilities in developing nations. Subsequently, she joined a global think tank where she specialized in mitigating crises for multinational corporations. 
-    Notable achievements include leading projects during the 2011 Thai floods that disrupted hard drive production and the 2020 semiconductor shortages driven by pandemic-related demand spikes.
-
-    Renowned for her objectivity, meticulous analysis, and data-driven approach, Dr. Carter is a trusted consultant to governments, NGOs, and leading tech firms. 
-    Her insights are valued for their ability to transform complex crises into actionable strategies. Beyond her professional life, she has a deep interest in ancient trade networks like the Silk Road, 
-    believing they offer timeless lessons for modern supply chains.
-
-    Personality traits:
-    - Objective: Dr. Carter prioritizes facts and impartiality in her analyses.
-    - Meticulous: She thoroughly examines every detail, leaving no room for oversight.
-    - Data-Driven: Her conclusions are consistently informed by empirical evidence and historical precedents.
-    """),
-    personality="Objective, meticulous, and data-driven",
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-qualcomm_chipset = Agent(
-    role="Qualcomm",
-    goal="Manage Snapdragon chipset production for Galaxy S24 Ultra.",
-    backstory=dedent("""
-    Qualcomm, established in 1985, is a global leader in wireless technology and semiconductor innovation. 
-    The company pioneered the development of the CDMA (Code Division Multiple Access) standard, revolutionizing mobile communication. Over the decades, Qualcomm has cemented its position as a cornerstone in the mobile chipset industry, with Snapdragon as its flagship product line.
-
-    Qualcomm's Snapdragon division is specifically dedicated to designing and producing high-performance chipsets tailored for flagship smartphones, including Samsung's Galaxy S series. These chipsets are renowned for their power efficiency, advanced AI capabilities, and cutting-edge connectivity features like 5G and Wi-Fi 7.
-
-    The team responsible for Snapdragon production operates out of Qualcomm's state-of-the-art facilities in San Diego, California, with additional manufacturing partnerships across Asia. Qualcomm has a robust history of managing supply chain complexities, including the 2020 global semiconductor shortage, where it demonstrated agility by diversifying production partners and optimizing wafer yields.
-
-    Known for its reliability and technical excellence, Qualcomm is driven by a commitment to innovation and operational efficiency. The Snapdragon division maintains strong relationships with OEMs like Samsung, ensuring seamless integration of its chipsets into flagship devices.
-
-    Personality traits:
-    - Reliable: Qualcomm prides itself on meeting production deadlines and maintaining consistent quality standards.
-    - Innovative: The team constantly pushes the boundaries of technology to deliver best-in-class performance.
-    - Collaborative: Qualcomm works closely with clients and partners to align its production goals with broader market needs.
-
-    As a key supplier for the Galaxy S24 Ultra, Qualcomm's mission is to ensure uninterrupted chipset production, despite potential disruptions, by leveraging its extensive expertise and global network.
-
-    Location: San Diego, California, USA
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-samsung_display = Agent(
-    role="Samsung Display",
-    goal="Produce OLED displays for Galaxy S24 Ultra.",
-    backstory=dedent("""
-    Samsung Display, a subsidiary of Samsung Electronics, is a world leader in OLED technology and advanced display solutions. Founded in 2012, the company has been at the forefront of display innovation, setting industry standards for quality, efficiency, and cutting-edge technology. 
-    Samsung Display's research and development facilities are among the most advanced in the world, and the company holds a vast portfolio of patents in OLED and flexible display technologies. This expertise enables them to supply high-resolution, energy-efficient OLED panels that are integral to flagship devices like the Galaxy S24 Ultra.
-
-    Known for its commitment to sustainability, Samsung Display integrates eco-friendly practices into its production processes, reducing waste and improving energy efficiency. The company has successfully navigated previous challenges, such as supply chain disruptions during the pandemic, by maintaining diversified material sourcing and investing heavily in automation to enhance production reliability.
-
-    Personality traits:
-    - Efficient: Samsung Display excels in optimizing production timelines and resource utilization to meet tight deadlines without compromising quality.
-    - Innovative: The team continuously explores new technologies, such as foldable and micro-LED displays, to maintain a competitive edge.
-    - Resilient: The company has a proven track record of adapting to crises and ensuring uninterrupted delivery of its products.
-
-    As the sole supplier of OLED displays for the Galaxy S24 Ultra, Samsung Display plays a critical role in the device's visual and operational performance. 
-
-    Location: Asan, South Korea
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-sony_camera = Agent(
-    role="Sony",
-    goal="Supply high-resolution camera sensors for Galaxy S24 Ultra.",
-    backstory=dedent("""
-    Sony, established in 1946, has long been a pioneer in imaging technology. With its roots in electronics and innovation, Sony emerged as a global leader in imaging sensors, supplying components for professional cameras, smartphones, and other devices that demand cutting-edge visual performance. The company’s Exmor RS sensor line has redefined standards for resolution, low-light performance, and speed in mobile photography.
-
-    Sony's Imaging Solutions division is headquartered in Atsugi, Japan, where a dedicated team of engineers and researchers continually pushes the boundaries of sensor technology. Over the years, Sony has introduced revolutionary innovations such as stacked CMOS sensors, multi-layer pixel technology, and AI-enhanced image processing, which have become industry benchmarks.
-
-    Known for precision and reliability, Sony has built strong partnerships with top-tier smartphone manufacturers, including Samsung. For the Galaxy S24 Ultra, Sony is tasked with delivering high-resolution sensors capable of supporting advanced computational photography and video recording features.
-
-    Personality traits:
-    - Precision-Focused: Sony prioritizes accuracy and detail, ensuring every sensor meets rigorous quality standards.
-    - Innovative: The team is committed to staying ahead of trends in imaging technology, introducing features like advanced HDR and low-light optimization.
-    - Collaborative: Sony works closely with OEM partners to align its sensor designs with specific device requirements.
-
-    Location: Atsugi, Japan
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-lg_chem = Agent(
-    role="LG Chem",
-    goal="Produce high-density batteries for Galaxy S24 Ultra.",
-    backstory=dedent("""
-    LG Chem, founded in 1947, is a global leader in chemical innovation and one of the foremost producers of lithium-ion batteries. With a history spanning more than seven decades, LG Chem has consistently pushed the boundaries of material science, making significant contributions to industries ranging from energy storage to electronics.
-
-    The company's Battery Division, headquartered in Seoul, South Korea, is renowned for developing high-density, long-lasting batteries that power some of the world’s most advanced devices. LG Chem’s commitment to research and development has led to breakthroughs in battery energy density, safety, and lifecycle, ensuring its products remain at the cutting edge of the industry.
-
-    LG Chem has a proven track record of resilience, having navigated crises such as raw material shortages and fluctuations in global demand. The company maintains strategic partnerships with mining firms to secure critical materials like lithium and cobalt, while also investing heavily in recycling technologies to reduce dependency on virgin resources.
-
-    Personality traits:
-    - Punctual: LG Chem places a high priority on meeting deadlines and ensuring consistent delivery schedules.
-    - Innovative: The team continually advances battery technology, focusing on energy efficiency and sustainability.
-    - Dependable: Known for reliability, LG Chem builds trust through high-quality products and strong supplier relationships.
-
-    Location: Seoul, South Korea
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-sk_hynix = Agent(
-    role="SK Hynix",
-    goal="Supply reliable memory modules for Galaxy S24 Ultra.",
-    backstory=dedent("""
-    SK Hynix, founded in 1983, is one of the world's leading providers of DRAM and NAND flash memory solutions. Headquartered in Icheon, South Korea, the company is a cornerstone of the global semiconductor industry, known for its cutting-edge technology and commitment to excellence.
-
-    Over the years, SK Hynix has played a pivotal role in advancing memory technologies, pioneering innovations such as high-speed DDR memory and 3D NAND flash. These advancements have enabled the production of smaller, faster, and more energy-efficient devices, making SK Hynix a preferred partner for leading technology companies.
-
-    The company operates state-of-the-art fabrication facilities and has an extensive global supply network, ensuring robust production capacity and timely delivery even amidst industry disruptions. SK Hynix has demonstrated resilience during past challenges, including the global semiconductor shortage, by diversifying material sourcing and leveraging advanced automation in manufacturing.
-
-    Personality traits:
-    - Innovative: SK Hynix continuously pushes the boundaries of memory technology to meet the demands of next-generation devices.
-    - Reliable: The company is known for delivering high-quality products on time, fostering strong relationships with its partners.
-    - Adaptive: SK Hynix excels at navigating industry challenges, ensuring continuity in supply and production.
-
-    Location: Icheon, South Korea
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-ibiden = Agent(
-    role="Ibiden",
-    goal="Produce circuit boards (PCB) for Galaxy S24 Ultra.",
-    backstory=dedent("""
-    Founded in 1912, Ibiden is a Japanese company renowned for its expertise in high-precision printed circuit board (PCB) manufacturing. With over a century of experience, the company has evolved into a global leader in advanced materials and electronics, serving industries ranging from automotive to consumer electronics.
-
-    Ibiden’s state-of-the-art PCB production facilities are located across Asia, with a strong emphasis on precision engineering and quality control. The company’s commitment to innovation has led to the development of multi-layered and high-density interconnect (HDI) PCBs, essential for modern compact and high-performance devices like the Galaxy S24 Ultra.
-
-    Throughout its history, Ibiden has demonstrated resilience in the face of challenges, including raw material shortages and shifting market demands. By fostering strong relationships with suppliers and investing heavily in research and development, Ibiden ensures the reliability and sustainability of its production processes.
-
-    Personality traits:
-    - Detail-Oriented: Ibiden prioritizes precision in its manufacturing processes, ensuring every circuit board meets exacting standards.
-    - Innovative: The company is dedicated to staying at the forefront of PCB technology, introducing new materials and design techniques.
-    - Resilient: Ibiden adapts quickly to industry changes, maintaining uninterrupted supply and production quality.
-
-    Location: Ogaki, Japan
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-foxconn_assembly = Agent(
-    role="Foxconn Vietnam",
-    goal="Assemble the Galaxy S24 Ultra.",
-    backstory=dedent("""
-    Foxconn, officially known as Hon Hai Precision Industry Co., Ltd., is the world's largest electronics assembler and a vital player in the global supply chain. Founded in 1974 and headquartered in Taiwan, Foxconn operates manufacturing facilities in multiple countries, including a state-of-the-art assembly plant in Vietnam.
-
-    The Vietnam facility is a critical hub for assembling flagship smartphones, leveraging advanced robotics, precision engineering, and a highly skilled workforce. Foxconn Vietnam is renowned for its efficiency and ability to scale production rapidly to meet global demand. The facility has successfully assembled millions of devices annually while maintaining stringent quality control standards.
-
-    Foxconn's adaptability has been tested in past crises, such as the COVID-19 pandemic and geopolitical tensions, where it demonstrated resilience by reorganizing workflows, implementing health protocols, and optimizing logistics. Its collaboration with major technology companies, including Samsung, underscores its reputation as a reliable and organized partner.
-
-    Personality traits:
-    - Organized: Foxconn excels in managing complex workflows and maintaining a structured approach to high-volume production.
-    - Adaptive: The company is adept at reconfiguring assembly lines and processes in response to supply chain challenges.
-    - Efficient: Foxconn consistently meets tight deadlines without compromising on quality, ensuring timely delivery of assembled products.
-
-    Location: Hanoi, Vietnam
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-dhl_logistics = Agent(
-    role="DHL Logistics",
-    goal="Manage global logistics for Galaxy S24 Ultra.",
-    backstory=dedent("""
-    DHL, founded in 1969, is a global leader in logistics and supply chain management. With operations in over 220 countries and territories, DHL has earned a reputation for its ability to manage complex, large-scale transportation networks. From air and sea freight to ground delivery, DHL is renowned for its adaptability and innovative solutions.
-
-    The company specializes in optimizing transport routes, implementing real-time tracking, and ensuring the safe and timely delivery of goods. DHL's global presence and advanced logistics infrastructure make it an indispensable partner for major industries, including consumer electronics. Its experience in handling high-value, time-sensitive shipments aligns perfectly with the demands of flagship product launches like the Galaxy S24 Ultra.
-
-    DHL has consistently demonstrated resilience during disruptions such as natural disasters, geopolitical conflicts, and the COVID-19 pandemic. By leveraging advanced technologies like AI-driven logistics planning and data analytics, DHL has effectively rerouted shipments and maintained service continuity under challenging circumstances.
-
-    Personality traits:
-    - Adaptable: DHL thrives on flexibility, reconfiguring routes and strategies to address unexpected challenges.
-    - Reliable: The company consistently delivers on its commitments, ensuring goods arrive on time and intact.
-    - Strategic: DHL employs data-driven approaches to optimize supply chain efficiency and cost-effectiveness.
-
-    Location: Global
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-amazon_distribution = Agent(
-    role="Amazon Distribution",
-    goal="Distribute the Galaxy S24 Ultra worldwide.",
-    backstory=dedent("""
-    Amazon, founded in 1994, is the world's largest e-commerce platform and a leader in global logistics and distribution. Over the years, the company has built an unparalleled logistics network, combining advanced technologies, strategically located fulfillment centers, and a fleet of delivery options to ensure timely and efficient product distribution.
-
-    Amazon's distribution capabilities are powered by its proprietary algorithms that optimize inventory placement, route planning, and delivery times. These systems enable Amazon to maintain high standards of customer satisfaction, even during peak demand periods or in the face of logistical challenges.
-
-    The company has a proven track record of managing large-scale product launches, ensuring smooth distribution of high-demand items. For the Galaxy S24 Ultra, Amazon utilizes its extensive network to deliver products to customers across the globe, minimizing delays and maintaining product integrity.
-
-    Personality traits:
-    - Customer-Focused: Amazon prioritizes customer satisfaction, ensuring every delivery meets expectations.
-    - Innovative: The company leverages technology to continually improve its logistics and distribution processes.
-    - Reliable: Amazon's consistency and efficiency have made it a trusted partner for global product distribution.
-
-    Location: Global
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
-
-samsung_care = Agent(
-    role="Samsung Care",
-    goal="Provide after-sales support for the Galaxy S24 Ultra.",
-    backstory=dedent("""
-    Samsung Care, established as the dedicated customer service arm of Samsung Electronics, has become synonymous with world-class after-sales support. With a presence in over 100 countries, Samsung Care ensures that customers receive timely assistance for device repairs, technical troubleshooting, and general inquiries.
-
-    The organization operates a vast network of service centers, mobile repair units, and 24/7 customer support hotlines, offering solutions tailored to meet the needs of diverse regions. Samsung Care leverages advanced diagnostic tools, AI-driven chat systems, and a team of highly trained technicians to provide efficient and reliable support for all Samsung devices.
-
-    Over the years, Samsung Care has implemented proactive service models, including remote diagnostics and scheduled maintenance programs, which have significantly improved customer satisfaction and device longevity. The team’s experience in handling flagship products like the Galaxy S series ensures that customers receive unparalleled support for their premium devices.
-
-    Personality traits:
-    - Supportive: Samsung Care prioritizes customer well-being, offering empathetic and practical solutions.
-    - Reliable: The organization consistently meets high service standards, fostering customer loyalty.
-    - Proactive: Samsung Care anticipates customer needs, introducing innovative service programs and tools.
-
-    Location: Global
-    """),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
+# The LLM client and the twelve agents are built once per server process and reused
+# across reruns and sessions. They are built on the stack loader's background thread,
+# which the first page request starts, so the form above never waits for crewai to import.
+run_store = get_run_store(run_store_path)
+run_archive = get_run_archive(archive_dir) if archive_dir else None
+
+def build_stack(secrets):
+    """Import the agent stack and build the shared registry and job queue (stack loader thread)."""
+    from event_log import DEFAULT_LEVEL, DEFAULT_RING_EVENTS, DEFAULT_SAMPLE_RATE, get_event_log
+    from metrics import DEFAULT_METRICS_DIR
+    from registry import get_registry, registry_settings
+    from jobs import DEFAULT_MAX_CONCURRENT_JOBS, DEFAULT_MAX_QUEUED_JOBS, get_job_queue
+
+    # Agent steps and task events are logged as JSON lines to LOG_PATH (stderr when unset) from a
+    # background thread. Events below LOG_LEVEL are ignored, and below WARNING only a LOG_SAMPLE_RATE
+    # share of the runs is written. The last LOG_RING_EVENTS events of a run are kept for the app.
+    get_event_log(
+        level=secrets.get("LOG_LEVEL", DEFAULT_LEVEL),
+        sample_rate=float(secrets.get("LOG_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)),
+        path=secrets.get("LOG_PATH") or None,
+        ring_events=int(secrets.get("LOG_RING_EVENTS", DEFAULT_RING_EVENTS)),
+    )
+
+    # Simulations run on a shared pool of MAX_CONCURRENT_JOBS background workers; further
+    # runs wait in a queue of at most MAX_QUEUED_JOBS.
+    max_concurrent_jobs = int(secrets.get("MAX_CONCURRENT_JOBS", DEFAULT_MAX_CONCURRENT_JOBS))
+    max_queued_jobs = int(secrets.get("MAX_QUEUED_JOBS", DEFAULT_MAX_QUEUED_JOBS))
+
+    # The LLM cache, provider rate limits, task memo, crisis cache, model routing and supply
+    # network are configured by the secrets documented in registry.registry_settings.
+    registry = get_registry(**registry_settings(secrets))
+    job_queue = get_job_queue(max_concurrent_jobs, max_queued_jobs, run_store, run_archive)
+    # Timing spans of every run are appended to METRICS_DIR/spans.jsonl, and per-agent totals are
+    # exported to METRICS_DIR/simulator.prom for a Prometheus textfile collector.
+    metrics_dir = secrets.get("METRICS_DIR", DEFAULT_METRICS_DIR)
+    return registry, job_queue, metrics_dir
+
+stack_loader = get_stack_loader()
+stack_loader.start(partial(build_stack, st.secrets.to_dict()))
+
+def load_stack():
+    """Wait for the agent stack and bind the names the run view and the run button use."""
+    global registry, job_queue, metrics_dir, STAGE_PRODUCTION, SimulationSettings, FAILED, QUEUED, RUNNING, QueueFullError
+    with st.spinner("Loading the agent stack..."):
+        registry, job_queue, metrics_dir = stack_loader.wait()
+    from simulation import STAGE_PRODUCTION, SimulationSettings
+    from jobs import FAILED, QUEUED, RUNNING, QueueFullError
 
 # -----------------------------------------------------------------------------------
-# 4.B. NEW AGENT: "SUMMARY AGENT" (TO COLLECT KEY INFORMATION)
+# 5. TASKS DEFINITION (SEE tasks.py)
 # -----------------------------------------------------------------------------------
-summary_agent = Agent(
-    role="Summary Agent",
-    goal="Collect the most important highlights from all other agents' outputs and produce an overall summary.",
-    backstory=dedent("""
-    The Summary Agent is responsible for reading all the final outputs from the other agents 
-    and extracting the critical data such as key KPIs, major challenges, solutions implemented, 
-    and overall operational performance. It then provides a concise highlight section and 
-    concluding remarks on how the crisis was managed.
-    """),
-    personality="Concise, structured, direct",
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=5,
-    memory=True
-)
+# Tasks are rendered from their templates for each run by `registry.new_run`.
 
 # -----------------------------------------------------------------------------------
-# 5. TASKS DEFINITION (UNCHANGED)
+# 6. RUN VIEW (SEE simulation.py FOR THE PIPELINE AND jobs.py FOR THE JOB QUEUE)
 # -----------------------------------------------------------------------------------
-tasks = []
-
-task_crisis_analysis = Task(
-    description=f"""
-    The Crisis Analyst must expand upon the inputs provided by the user to develop a comprehensive context analysis.
-
-    Inputs:
-    - Crisis Details: '{crisis_detail}'
-    - Crisis Duration: {crisis_duration} months
-
-    Task:
-    - Analyze and expand upon the provided crisis details, considering geopolitical, economic, and logistical factors.
-    - Develop a detailed scenario that outlines potential impacts on the supply chain, key stakeholders involved, and ripple effects across industries.
-    - Focus on providing a thorough context for the crisis without suggesting mitigation actions or strategies.
-    """,
-    expected_output=f"""
-    Comprehensive Crisis Analysis Report
-
-    Prepared by: Crisis Analyst Team
-    Crisis in Focus: {crisis_detail}
-
-    The report should include:
-    - A detailed overview of the crisis, including root causes, key stakeholders, and affected industries.
-    - Analysis of potential impacts on the supply chain, with a focus on the Galaxy S24 Ultra production and distribution.
-    - Identification of secondary effects, such as economic, political, or environmental repercussions.
-    - Scenarios outlining possible developments over the crisis duration ({crisis_duration} months).
-    """,
-    agent=crisis_analyst
-)
-tasks.append(task_crisis_analysis)
-
-task_qualcomm = Task(
-    description="""
-    Qualcomm must ensure the production and delivery of Snapdragon chipsets for the Galaxy S24 Ultra.
-
-    - Consider the current crisis context based on the report provided by crisis_analyst.
-    - Evaluate the current production capacity and utilize available resources.
-    - Collaborate with Samsung R&D to determine production priorities.
-    - Interact with Foxconn Assembly to understand assembly requirements and synchronize timelines.
-    - Report any issues, such as material shortages or logistical delays, and implement appropriate solutions.
-    """,
-    expected_output="""
-    Qualcomm Supply Chain Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Details of production decisions based on current capacity and model priorities.
-    - Collaborations with other agents, such as Samsung R&D and Foxconn Assembly, to align production with supply chain requirements.
-    - Relevant KPIs, including production capacity, on-time delivery rate, inventory levels, and cost impacts.
-    - Challenges encountered (e.g., material shortages, logistical disruptions) and the solutions adopted.
-    - Evaluation of future outlooks and lessons learned.
-    """,
-    agent=qualcomm_chipset
-)
-tasks.append(task_qualcomm)
-
-task_samsung_display = Task(
-    description="""
-    Samsung Display must ensure uninterrupted OLED panel production for the Galaxy S24 Ultra.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Evaluate current production capacity and material availability.
-    - Collaborate with suppliers to address any material shortages and explore alternative sourcing options.
-    - Communicate with Foxconn Assembly to align delivery schedules with production needs.
-    - Report any disruptions or quality concerns and implement corrective measures.
-    """,
-    expected_output="""
-    Samsung Display Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Overview of production decisions and adjustments made to maintain OLED panel output.
-    - Details of collaborations with suppliers to secure materials and mitigate disruptions.
-    - Coordination efforts with Foxconn Assembly to align production timelines with assembly requirements.
-    - Key KPIs, including production volume, quality metrics, lead time adherence, and supplier performance.
-    - Challenges encountered (e.g., material shortages, production delays) and solutions implemented.
-    - Lessons learned and recommendations for future resilience.
-    """,
-    agent=samsung_display
-)
-tasks.append(task_samsung_display)
-
-task_sony_camera = Task(
-    description="""
-    Sony must ensure the production and delivery of high-resolution camera sensors for the Galaxy S24 Ultra.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Evaluate the production capacity and prioritize flagship sensor models to meet Samsung's requirements.
-    - Collaborate with suppliers to secure raw materials and address any shortages.
-    - Communicate with Foxconn Assembly to align sensor delivery with assembly timelines.
-    - Report on any production or quality issues encountered and outline the corrective actions taken.
-    """,
-    expected_output="""
-    Sony Camera Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Summary of production priorities and adjustments made to ensure high-resolution sensor output.
-    - Details of collaborations with suppliers to address material shortages or sourcing challenges.
-    - Coordination efforts with Foxconn Assembly to align sensor delivery with assembly requirements.
-    - Key KPIs, including production volume, quality rates, lead time adherence, and supplier performance.
-    - Challenges encountered (e.g., material shortages, production delays) and solutions implemented.
-    - Recommendations for improving supply chain resilience in future crises.
-    """,
-    agent=sony_camera
-)
-tasks.append(task_sony_camera)
-
-task_lg_chem = Task(
-    description="""
-    LG Chem must ensure the uninterrupted production and delivery of high-density batteries for the Galaxy S24 Ultra.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Evaluate the availability of raw materials and collaborate with suppliers to address any shortages.
-    - Optimize production processes to maintain quality and efficiency despite potential constraints.
-    - Communicate with Foxconn Assembly to synchronize battery delivery with the assembly schedule.
-    - Report on any production challenges, material shortages, or delays, and detail the actions taken to resolve them.
-    """,
-    expected_output="""
-    LG Chem Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Summary of measures implemented to secure raw materials and maintain production output.
-    - Collaborations with suppliers to address material shortages and ensure continuity.
-    - Coordination efforts with Foxconn Assembly to align battery delivery with assembly requirements.
-    - Key KPIs, including production capacity, defect rates, lead times, and cost variations for raw materials.
-    - Challenges encountered (e.g., raw material shortages, production inefficiencies) and solutions adopted.
-    - Recommendations for improving production resilience and supply chain efficiency in future crises.
-    """,
-    agent=lg_chem
-)
-tasks.append(task_lg_chem)
-
-task_sk_hynix = Task(
-    description="""
-    SK Hynix must ensure a stable supply of memory modules for the Galaxy S24 Ultra, addressing any potential disruptions caused by the crisis.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Evaluate current production capabilities and identify any risks to memory module supply.
-    - Collaborate with suppliers and production partners to diversify sourcing and ensure supply continuity.
-    - Communicate with Foxconn Assembly to align memory delivery schedules with assembly requirements.
-    - Report on challenges faced, such as material shortages or logistical delays, and the measures taken to address them.
-    """,
-    expected_output="""
-    SK Hynix Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Overview of steps taken to secure memory module supply and ensure production continuity.
-    - Collaborations with suppliers and production partners to address sourcing challenges and diversify supply.
-    - Coordination efforts with Foxconn Assembly to synchronize memory delivery with assembly timelines.
-    - Key KPIs, including production volume, on-time delivery rate, supply diversification index, and cost impact.
-    - Challenges encountered (e.g., material shortages, production delays) and solutions implemented.
-    - Recommendations for improving memory supply chain resilience in future crises.
-    """,
-    agent=sk_hynix
-)
-tasks.append(task_sk_hynix)
-
-task_ibiden = Task(
-    description="""
-    Ibiden must ensure uninterrupted PCB production for the Galaxy S24 Ultra, addressing any disruptions caused by the crisis.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Evaluate material availability and collaborate with suppliers to address any shortages.
-    - Explore alternative sourcing options and implement design adjustments to optimize production.
-    - Communicate with Foxconn Assembly to align PCB delivery schedules with assembly requirements.
-    - Report on any production challenges, material issues, or delays, and detail the corrective actions taken.
-    """,
-    expected_output="""
-    Ibiden Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Overview of measures implemented to maintain PCB production and address material sourcing challenges.
-    - Details of collaborations with suppliers to secure raw materials and diversify sourcing options.
-    - Coordination efforts with Foxconn Assembly to ensure timely delivery of PCBs for assembly.
-    - Key KPIs, including production throughput, defect rate, supply diversification index, and cost impact.
-    - Challenges encountered (e.g., material shortages, production inefficiencies) and solutions implemented.
-    - Recommendations for enhancing PCB production resilience and efficiency in future crises.
-    """,
-    agent=ibiden
-)
-tasks.append(task_ibiden)
-
-task_foxconn = Task(
-    description="""
-    Foxconn must oversee the final assembly of the Galaxy S24 Ultra while addressing any disruptions caused by the crisis.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Coordinate with suppliers such as Samsung Display, Qualcomm, and Ibiden to ensure timely delivery of components.
-    - Adjust assembly lines and optimize workflows to maintain production efficiency under challenging conditions.
-    - Implement stringent quality control measures to ensure the final product meets Samsung's standards.
-    - Collaborate with DHL Logistics to plan outbound shipments and synchronize delivery schedules.
-    - Report on challenges faced during assembly and logistics, and detail the actions taken to resolve them.
-    """,
-    expected_output="""
-    Foxconn Assembly Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Summary of assembly adjustments and workflow optimizations implemented to maintain production efficiency.
-    - Details of collaborations with suppliers (e.g., Samsung Display, Qualcomm, Ibiden) to ensure timely component delivery.
-    - Coordination efforts with DHL Logistics to plan outbound shipments and minimize delays.
-    - Key KPIs, including assembly throughput, defect rates, and on-time shipment percentage.
-    - Challenges encountered (e.g., component delays, assembly line disruptions) and solutions adopted.
-    - Recommendations for improving assembly and logistics coordination in future crises.
-    """,
-    agent=foxconn_assembly
-)
-tasks.append(task_foxconn)
-
-task_dhl = Task(
-    description="""
-    DHL must manage the global logistics operations for the Galaxy S24 Ultra, ensuring smooth inbound and outbound shipments despite the crisis.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Evaluate the actions and updates from other agents: Qualcomm, Sony Camera, Samsung Display, and LG Chem, SK Hynix, Ibiden and Foxconn Assembly including their geographic locations, to adapt logistics strategies accordingly.
-    - Incorporate geographic information into planning, mapping routes between agent locations (e.g., Samsung Display in South Korea to Foxconn Assembly in Vietnam).
-    - Develop contingency plans to reroute shipments in case of delays or disruptions.
-    - Prioritize the handling and delivery of critical components to maintain the supply chain flow.
-    - Report on logistical challenges faced, including transportation bottlenecks or cost overruns, and detail the solutions implemented.
-    """,
-    expected_output="""
-    DHL Logistics Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Overview of logistics adjustments made in response to the crisis, including rerouting and prioritization strategies.
-    - Geographic information on logistics routes, including:
-        - Key routes
-        - Alternate routes and contingency plans implemented to bypass disruptions.
-    - Details of coordination efforts with other agents: Qualcomm, Sony Camera, Samsung Display, and LG Chem, SK Hynix, Ibiden and Foxconn Assembly to align logistics with production timelines.
-    - Key KPIs, such as delivery time variance, on-time shipment rate, and cost impact of logistical changes.
-    - Challenges encountered and the measures taken to resolve them.
-    - Recommendations for improving logistics resilience and efficiency in future crises.
-    """,
-    agent=dhl_logistics
-)
-tasks.append(task_dhl)
-
-task_amazon = Task(
-    description="""
-    Amazon must manage the global distribution and sales of the Galaxy S24 Ultra, ensuring timely delivery and customer satisfaction despite the crisis.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Coordinate closely with DHL Logistics to align shipping schedules, prioritize key markets, and address disruptions in transportation.
-    - Use geographic and logistical insights from DHL Logistics to optimize inventory placement in regional fulfillment centers.
-    - Implement customer communication plans to manage expectations and provide updates on order status based on real-time delivery data from DHL Logistics.
-    - Report on challenges faced in distribution, such as regional delays or mismatches between supply and demand, and the actions taken to resolve them.
-    """,
-    expected_output="""
-    Amazon Distribution Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Summary of adjustments made to distribution and sales strategies based on the crisis context.
-    - Details of coordination with DHL Logistics, including:
-        - Shipping schedule alignment for timely deliveries.
-        - Prioritization of key markets based on demand and logistical feasibility.
-        - Inventory redistribution to minimize delays in regional fulfillment centers.
-    - Implementation of customer communication strategies informed by DHL's real-time delivery updates to manage expectations and improve satisfaction.
-    - Key KPIs:
-        - Delivery timeliness rate.
-        - Inventory turnover rates across regions.
-        - Customer satisfaction metrics.
-    - Challenges encountered:
-        - Regional delays due to logistical bottlenecks reported by DHL Logistics also specify teh geographical positions.
-        - Mismatches in demand and supply in certain regions.
-    - Solutions Adopted:
-        - Dynamic reprioritization of shipments with DHL to address high-priority regions.
-        - Enhanced communication channels to keep customers informed about delays and alternatives.
-    """,
-    agent=amazon_distribution
-)
-tasks.append(task_amazon)
-
-task_samsung_care = Task(
-    description="""
-    Samsung Care must provide comprehensive after-sales support for the Galaxy S24 Ultra, ensuring high customer satisfaction during the crisis.
-
-    - Assess the current crisis context based on the report provided by crisis_analyst.
-    - Plan and manage spare parts inventory to ensure availability for repairs, considering potential supply chain delays.
-    - Adjust repair workflows to maintain efficiency under constrained conditions, prioritizing high-impact cases.
-    - Implement proactive customer communication strategies to address concerns and manage expectations.
-    - Report on challenges faced in after-sales operations, such as spare part shortages or increased service demand, and the actions taken to address them.
-    """,
-    expected_output="""
-    Samsung Care After-Sales Report – Galaxy S24 Ultra
-
-    Actions Taken:
-    - Overview of spare parts inventory management and adjustments made to ensure repair readiness.
-    - Details of updated repair workflows to maintain efficiency and prioritize critical cases.
-    - Implementation of customer communication strategies to minimize dissatisfaction and build trust.
-    - Key KPIs, including repair turnaround time, first-time resolution rate, and customer satisfaction metrics.
-    - Challenges encountered (e.g., spare part shortages, increased service demand) and solutions adopted.
-    - Recommendations for improving after-sales service resilience and customer engagement in future crises.
-    """,
-    agent=samsung_care
-)
-tasks.append(task_samsung_care)
+# The simulation runs on a background job; the page is redrawn from the job's recorded
+# progress on every poll, so it can be left, refreshed or reopened at any time.
+STATUS_ICONS = {"waiting": "⏳", "running": "🔄", "done": "✅", "reused": "♻️", "truncated": "✂️", "error": "⚠️", "skipped": "⏭️"}
+# Reports are sent to the browser one page of at most REPORT_PAGE_CHARS characters at a time
+REPORT_PAGE_CHARS = 6000
+
+def render_agent_status(placeholder, role, state, detail=""):
+    placeholder.markdown(f"{STATUS_ICONS[state]} **{role}** — {state}{detail}")
+
+def render_job_status(job, role):
+    state, detail = job.agent_state(role)
+    render_agent_status(st.empty(), role, state, detail)
+
+def paginate_report(text, page_chars=REPORT_PAGE_CHARS):
+    """Split a report into pages of at most ``page_chars`` characters, breaking between paragraphs."""
+    pages, page = [], ""
+    for paragraph in text.split("\n\n"):
+        for start in range(0, max(1, len(paragraph)), page_chars):
+            chunk = paragraph[start:start + page_chars]
+            if page and len(page) + 2 + len(chunk) > page_chars:
+                pages.append(page)
+                page = ""
+            page = f"{page}\n\n{chunk}" if page else chunk
+    pages.append(page)
+    return pages
+
+def render_report_pages(text, key):
+    """Draw one page of ``text``; the page number is kept in the session under ``key``."""
+    pages = paginate_report(text)
+    page = 1
+    if len(pages) > 1:
+        page = st.number_input("Page", min_value=1, max_value=len(pages), key=key)
+        st.caption(f"Page {page} of {len(pages)} ({len(text):,} characters)")
+    st.markdown(pages[page - 1])
+
+def job_report_markdown(job, role):
+    text = job.report_text(role)
+    if job.agent_state(role)[0] == "running":
+        return text + " ▌"
+    return text or "⏳ Waiting for this agent..."
+
+@st.fragment
+def render_job_report(job, role):
+    render_report_pages(job_report_markdown(job, role), key=f"{job.job_id}_{role}_page")
+
+@st.fragment
+def render_report_viewer(key, reports):
+    """
+    One report of ``reports`` (``{role: markdown}``) at a time. Unlike ``st.tabs``,
+    only the selected report is sent to the browser, and picking another report or
+    page only reruns this fragment; the selection is kept in the session under ``key``.
+    """
+    role = st.radio("Report", list(reports), horizontal=True, key=f"{key}_report", label_visibility="collapsed")
+    st.markdown(f"### {role} Report")
+    render_report_pages(reports[role], key=f"{key}_{role}_page")
+
+def render_execution_timeline(graph, report):
+    for role, error in report.errors.items():
+        st.warning(f"{role} did not complete: {error}")
+
+    critical_path, critical_time = report.critical_path(graph)
+    with st.expander("Execution Timeline (Click to Expand)"):
+        st.markdown(
+            f"**Wall time:** {report.wall_time:.1f}s · "
+            f"**Sequential equivalent:** {report.sequential_time:.1f}s · "
+            f"**Critical path:** {' → '.join(critical_path)} ({critical_time:.1f}s) · "
+            f"**Max parallel agents:** {report.max_workers}"
+        )
+        stage_df = pd.DataFrame(
+            [{"stage": stage, "wall_time_s": round(seconds, 2)} for stage, seconds in report.stage_times().items()]
+        )
+        st.dataframe(stage_df, hide_index=True)
+        st.dataframe(pd.DataFrame(report.timeline()), hide_index=True)
+
+def render_agent_kpis(simulation_result):
+    if not simulation_result.kpis:
+        return
+    with st.expander("Agent KPIs (Click to Expand)"):
+        kpi_df = pd.DataFrame([
+            {"agent": role, **simulation_result.kpi_values(role)} for role in simulation_result.kpis
+        ])
+        st.dataframe(
+            kpi_df.rename(columns={name: f"{label} ({unit})" for name, (label, unit) in KPI_FIELDS.items()}),
+            hide_index=True,
+        )
 
-# -----------------------------------------------------------------------------------
-# 5.B. ADDITIONAL TASK FOR "SUMMARY AGENT"
-# -----------------------------------------------------------------------------------
-task_summary = Task(
-    description="""
-    Summary Agent must collect the most important information from all other agents' outputs 
-    and produce a final summary and highlight section.
-
-    - Review the final outputs from each agent (Qualcomm, Samsung Display, Sony Camera, LG Chem, 
-      SK Hynix, Ibiden, Foxconn, DHL, Amazon, Samsung Care, and the Crisis Analyst).
-    - Extract critical highlights, including major KPIs, challenges, solutions, and overall 
-      operational performance.
-    - Provide a concise set of bullet points for "Highlights" and a short paragraph summarizing 
-      how the crisis was managed.
-    """,
-    expected_output="""
-    Final Consolidated Summary
-
-    Highlights:
-    - Key bullet points capturing major achievements and metrics.
-
-    Overall Summary:
-    A concise paragraph describing the outcome of the crisis management efforts, 
-    including main challenges, solutions, and the final result on supply chain operations.
-    """,
-    agent=summary_agent
-)
-tasks.append(task_summary)
+def render_agent_metrics(simulation_result):
+    with st.expander("Agent Metrics (Click to Expand)"):
+        agent_metrics = pd.DataFrame(simulation_result.metrics.agent_summary())
+        stage_spans = simulation_result.metrics.by_kind("stage")
+        st.markdown(
+            f"**Total wall time:** {simulation_result.wall_time:.1f}s · "
+            + " · ".join(f"**{span.name}:** {span.duration_s:.1f}s" for span in stage_spans)
+            + (f" · **Estimated cost:** ${agent_metrics['cost_usd'].sum():.4f}" if not agent_metrics.empty else "")
+        )
+        if not agent_metrics.empty:
+            prompt_tokens = agent_metrics["prompt_tokens"].sum()
+            cached_tokens = agent_metrics["cached_tokens"].sum()
+            st.caption(
+                f"Prompt cache: {cached_tokens} of {prompt_tokens} prompt tokens read from the provider's cache "
+                f"({cached_tokens / prompt_tokens if prompt_tokens else 0:.0%}), "
+                f"{prompt_tokens - cached_tokens} uncached."
+            )
+            st.dataframe(agent_metrics.sort_values("task_s", ascending=False), hide_index=True)
+            st.bar_chart(agent_metrics.set_index("agent")[["llm_s"]])
+        memory = simulation_result.memory
+        if memory is not None:
+            st.caption(
+                f"Run memory: {memory.items} of {memory.capacity} notes ({memory.index_bytes / 1024:.0f} KiB index), "
+                f"{memory.recalls} recalls added {memory.notes_recalled} notes ({memory.recalled_tokens} tokens) "
+                f"to the prompts, {memory.evictions} evictions. Avoided {memory.embedding_calls_avoided} "
+                f"embedding calls and {memory.disk_writes_avoided} vector-store writes "
+                f"({memory.disk_bytes_avoided / 1024:.0f} KiB)."
+            )
+        st.caption(f"Run {simulation_result.metrics.run_id}: spans written to {metrics_dir}/spans.jsonl.")
+
+def render_monte_carlo(monte_carlo):
+    st.markdown("## Quantitative Scenario")
+    st.markdown("---")
+    summary = monte_carlo.summary
+    st.markdown(
+        f"**Retail fill rate (median):** {summary['fill_rate_p50']:.0%} · "
+        f"**Worst 10% of trials:** {summary['fill_rate_p10']:.0%} · "
+        f"**Lost sales (median):** {summary['lost_sales_months_p50']:.2f} months of demand"
+    )
+    with st.expander(f"Monte Carlo Model: {monte_carlo.trials:,} trials in {monte_carlo.seconds:.2f}s (Click to Expand)"):
+        bands = pd.concat([
+            pd.DataFrame(monte_carlo.monthly_rows(metric)).assign(metric=metric)
+            for metric in ("fill_rate", "assembly_output", "component_supply")
+        ]).melt(id_vars=["month", "metric"], var_name="percentile")
+        st.plotly_chart(
+            px.line(
+                bands, x="month", y="value", color="percentile", facet_col="metric", markers=True,
+                labels={"value": "share of baseline demand"},
+            ),
+            use_container_width=True,
+        )
+        st.dataframe(pd.DataFrame(monte_carlo.nodes.values()), hide_index=True)
+
+def render_reuse(progress):
+    """Which stages reused memoized outputs, and how much agent time that saved."""
+    if not progress.reused:
+        return
+    stage_roles = {
+        "Crisis analysis": [progress.crisis_role],
+        "Production & logistics": progress.production_roles,
+        "Summary": [progress.summary_role],
+    }
+    lines = []
+    for stage, roles in stage_roles.items():
+        reused = [role for role in roles if role in progress.reused]
+        if reused:
+            saved = sum(progress.reused[role] for role in reused)
+            lines.append(f"- **{stage}**: {len(reused)} of {len(roles)} task(s) reused, {saved:.1f}s saved")
+    st.success(
+        f"♻️ Reused {len(progress.reused)} unchanged task output(s) from earlier runs, "
+        f"saving about {sum(progress.reused.values()):.1f}s of agent time.\n\n" + "\n".join(lines)
+    )
+
+def render_crisis_cache_hit(progress):
+    """Which earlier crisis the reused crisis analysis was written for."""
+    match = progress.crisis_cache_match
+    if match is not None:
+        st.info(
+            f"♻️ The crisis analysis was reused from a similar crisis of the same duration "
+            f"({match.similarity:.0%} similar): _{match.crisis_detail[:300]}_"
+        )
 
-# -----------------------------------------------------------------------------------
-# 6. CREW SETUP
-# -----------------------------------------------------------------------------------
-all_agents = [
-    crisis_analyst,
-    qualcomm_chipset,
-    samsung_display,
-    sony_camera,
-    lg_chem,
-    sk_hynix,
-    ibiden,
-    foxconn_assembly,
-    dhl_logistics,
-    amazon_distribution,
-    samsung_care,
-    summary_agent
-]
-
-crew = Crew(
-    agents=all_agents,
-    tasks=tasks,
-    process=Process.sequential,
-    full_output=True,
-    share_crew=False,
-)
-
-def get_task_output(task):
-    try:
-        return task.output.raw
-    except AttributeError:
-        return "No data available."
+def render_truncation(job):
+    """Which reports were cut short by the deadline of the run."""
+    truncated = job.progress.truncated
+    if truncated:
+        st.warning(
+            f"✂️ {len(truncated)} report(s) were cut short by the {job.settings.deadline_seconds:.0f}s time limit "
+            f"and show the agent's best partial answer: {', '.join(truncated)}."
+        )
+
+def render_job(job):
+    """Draw the results page of ``job`` as far as the simulation has progressed."""
+    progress = job.progress
+    st.caption(f"Simulation {job.job_id}: {job.crisis_duration} month(s) — {job.status}.")
+    if job.status == QUEUED:
+        st.info(f"⏳ Waiting for a free simulation slot (position {job_queue.queue_position(job.job_id)} in the queue).")
+        return
+    if job.status == FAILED and progress.crisis_role is None:
+        st.error(f"The simulation failed: {job.error}")
+        return
+    if progress.monte_carlo is not None:
+        render_monte_carlo(progress.monte_carlo)
+    if progress.crisis_role is None:
+        st.info("⏳ Preparing the simulation...")
+        return
+    render_reuse(progress)
+    render_crisis_cache_hit(progress)
+    render_truncation(job)
+    if job.storage_error:
+        st.warning(f"The simulation finished, but it could not be saved to the run history: {job.storage_error}")
+
+    st.markdown("## Crisis Analysis Report")
+    st.markdown("---")
+    render_job_status(job, progress.crisis_role)
+    with st.expander("Crisis Analyst Report (Click to Expand)", expanded=True):
+        render_job_report(job, progress.crisis_role)
 
-def render_agent_report(agent_role, actions, challenges, recommendations):
-    st.markdown(f"### {agent_role} Report")
-    st.markdown(f"""
-    **Actions Taken:**
-    {actions}
+    st.markdown("## Production and Logistics Reports")
+    st.markdown("---")
+    production_roles = progress.production_roles
+    completed = sum(role in progress.results for role in production_roles)
+    st.progress(completed / len(production_roles), text=f"{completed} of {len(production_roles)} agents finished")
+    for role in production_roles:
+        render_job_status(job, role)
+    if progress.contexts:
+        with st.expander("Crisis Context per Agent (Click to Expand)"):
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        "agent": c.role,
+                        "tokens_before": c.tokens_before,
+                        "tokens_after": c.tokens_after,
+                        "saved": c.saved_tokens,
+                        "sections": ", ".join(c.sections),
+                    }
+                    for c in progress.contexts.values()
+                ]),
+                hide_index=True,
+            )
+    if STAGE_PRODUCTION in progress.stage_reports:
+        render_execution_timeline(*progress.stage_reports[STAGE_PRODUCTION])
 
-    **Challenges Encountered:**
-    {challenges}
+    st.markdown("## Final Consolidated Summary")
+    st.markdown("---")
+    render_job_status(job, progress.summary_role)
+    if progress.summary_input is not None:
+        extract_tokens, raw_tokens, token_budget = progress.summary_input
+        st.caption(
+            f"Summary input: {extract_tokens} tokens of extracts (budget {token_budget}) "
+            f"instead of {raw_tokens} tokens of full reports."
+        )
+    with st.expander("Summary Agent's Output (Click to Expand)", expanded=True):
+        render_job_report(job, progress.summary_role)
 
-    **Recommendations:**
-    {recommendations}
-    """)
+    st.markdown("## All Agents' Reports")
+    relevant_roles = [progress.crisis_role] + production_roles
+    render_report_viewer(f"job_{job.job_id}", {role: job_report_markdown(job, role) for role in relevant_roles})
+
+    if job.status == FAILED:
+        st.error(f"The simulation failed: {job.error}")
+    if job.result is not None:
+        render_agent_kpis(job.result)
+        render_agent_metrics(job.result)
+    render_agent_log(job.job_id)
+
+@st.fragment
+def render_agent_log(run_id):
+    """The latest structured events of a run, loaded on demand; only this fragment reruns."""
+    from event_log import get_event_log
+
+    with st.expander("Agent Log (Click to Expand)"):
+        if not st.toggle("Show the latest agent steps and task events", key=f"{run_id}_log"):
+            return
+        event_log = get_event_log()
+        events = event_log.events(run_id)
+        log_stats = event_log.stats()
+        st.caption(
+            f"Last {len(events)} events of this run (at most {event_log.ring_events} are kept). "
+            f"Event log: {log_stats.written} written, {log_stats.sampled_out} sampled out, "
+            f"{log_stats.dropped} dropped on a full queue."
+        )
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    **event.to_dict(),
+                    "ts": datetime.fromtimestamp(event.ts).strftime("%H:%M:%S.%f")[:-3],
+                    "fields": ", ".join(f"{key}={value}" for key, value in (event.fields or {}).items()),
+                }
+                for event in reversed(events)
+            ]),
+            hide_index=True,
+        )
+        st.button("Refresh", key=f"{run_id}_log_refresh")
+
+def render_stored_run(stored_run):
+    """Draw a run loaded from the run history."""
+    st.caption(
+        f"Run {stored_run.run_id} of {stored_run.current_date}: {stored_run.crisis_duration} month(s), "
+        f"simulated in {stored_run.wall_time or 0:.1f}s."
+    )
+    st.markdown(f"**Crisis details:** {stored_run.crisis_detail}")
+    outputs = stored_run.outputs
+    *report_roles, summary_role = list(outputs)
+    with st.expander("Summary Agent's Output (Click to Expand)", expanded=True):
+        render_report_pages(outputs[summary_role], key=f"history_{stored_run.run_id}_summary_page")
+    render_report_viewer(f"history_{stored_run.run_id}", {role: outputs[role] for role in report_roles})
 
 # -----------------------------------------------------------------------------------
 # 7. SIMULATION TITLE & BUTTON (H2, CENTERED, NO EXTRA LINES)
 # -----------------------------------------------------------------------------------
+# The job id is kept in the session and in the URL, so a page refresh picks the same run up again
+if "job_id" not in st.session_state and "job" in st.query_params:
+    st.session_state.job_id = st.query_params["job"]
+# The job queue is only needed once a run exists, or when the stack is warm anyway
+job = None
+stack_loaded = st.session_state.get("job_id") is not None or stack_loader.ready
+if stack_loaded:
+    load_stack()
+    job = job_queue.get(st.session_state.get("job_id"))
+
 with st.container():
     st.markdown("""
     <div style="text-align:center;">
@@ -739,73 +471,237 @@ with st.container():
     </div>
     """, unsafe_allow_html=True)
 
+    # A crisis worded like one analysed before can reuse that analysis; the user decides
+    reuse_crisis_analysis, fresh_crisis_analysis = True, False
+    if stack_loaded and registry.crisis_cache is not None and crisis_detail.strip():
+        crisis_match = registry.crisis_cache.lookup(crisis_detail, crisis_duration, record=False)
+        if crisis_match is not None:
+            st.info(
+                f"♻️ A crisis {crisis_match.similarity:.0%} similar to this one, with the same duration, was "
+                f"analysed before: _{crisis_match.crisis_detail[:300]}_"
+            )
+            reuse_crisis_analysis = st.radio(
+                "Crisis analysis",
+                ["Reuse the cached analysis", "Run a fresh analysis"],
+                horizontal=True,
+                key="crisis_cache_choice",
+            ) == "Reuse the cached analysis"
+            fresh_crisis_analysis = not reuse_crisis_analysis
+
     c1, c2, c3 = st.columns([3.15,1,3])
     with c2:
-        run_simulation = st.button("Run Simulation", key="run_sim")
+        run_simulation = st.button("Run Simulation", key="run_sim", disabled=job is not None and not job.finished)
+    if not stack_loaded:
+        st.caption(
+            f"<div style='text-align:center;'>Agent stack loading in the background "
+            f"({time.time() - stack_loader.started_at:.0f}s so far).</div>",
+            unsafe_allow_html=True,
+        )
+    else:
+        st.caption(
+            f"<div style='text-align:center;'>Agent catalog: {len(registry.agents)} agents, built in "
+            f"{registry.timings.total_seconds:.2f}s and reused across {registry.timings.runs_served} run(s). "
+            f"Supply network {registry.network.describe()}.</div>",
+            unsafe_allow_html=True,
+        )
+        if registry.llm_cache is not None:
+            cache_stats = registry.llm_cache.stats()
+            replay_note = " · replay-only mode" if registry.llm_cache.replay_only else ""
+            st.caption(
+                f"<div style='text-align:center;'>LLM cache: {cache_stats.entries} entries "
+                f"({cache_stats.size_bytes / 1024:.0f} KiB), {cache_stats.hits} hits / {cache_stats.misses} misses "
+                f"({cache_stats.hit_rate:.0%} hit rate), {cache_stats.evictions} evictions{replay_note}.</div>",
+                unsafe_allow_html=True,
+            )
+        if registry.task_memo is not None:
+            memo_stats = registry.task_memo.stats()
+            st.caption(
+                f"<div style='text-align:center;'>Task memo: {memo_stats.entries} outputs, "
+                f"{memo_stats.hits} reused / {memo_stats.misses} run, "
+                f"{memo_stats.saved_seconds:.1f}s of agent time saved.</div>",
+                unsafe_allow_html=True,
+            )
+        if registry.crisis_cache is not None:
+            crisis_stats = registry.crisis_cache.stats()
+            similarity_note = (
+                f", {crisis_stats.mean_hit_similarity:.0%} mean similarity of hits"
+                if crisis_stats.mean_hit_similarity is not None else ""
+            )
+            st.caption(
+                f"<div style='text-align:center;'>Crisis analysis cache: {crisis_stats.entries} of "
+                f"{crisis_stats.capacity} analyses, {crisis_stats.hits} hits / {crisis_stats.misses} misses "
+                f"({crisis_stats.hit_rate:.0%} hit rate{similarity_note}, "
+                f"threshold {crisis_stats.similarity_threshold:.0%}).</div>",
+                unsafe_allow_html=True,
+            )
+        if registry.rate_limiter is not None:
+            limit_stats = registry.rate_limiter.stats()
+            st.caption(
+                f"<div style='text-align:center;'>OpenAI rate limiter: {limit_stats.requests} requests, "
+                f"{limit_stats.queued} waiting now (peak {limit_stats.max_queued}), "
+                f"{limit_stats.throttled_seconds:.1f}s throttled, {limit_stats.retries} retries "
+                f"({limit_stats.rate_limited} after 429).</div>",
+                unsafe_allow_html=True,
+            )
+        queue_stats = job_queue.stats()
+        st.caption(
+            f"<div style='text-align:center;'>Simulation queue: {queue_stats[RUNNING]} running, "
+            f"{queue_stats[QUEUED]} waiting ({job_queue.max_concurrent_jobs} at a time).</div>",
+            unsafe_allow_html=True,
+        )
+    with st.expander("Startup Profile (Click to Expand)"):
+        if stack_loader.error is not None:
+            st.error(f"The agent stack failed to load: {stack_loader.error!r}")
+        elif stack_loader.ready:
+            st.caption(f"Agent stack imported and built in {stack_loader.seconds:.2f}s on a background thread.")
+        st.dataframe(
+            pd.DataFrame([{"step": step.name, "seconds": round(step.seconds, 3)} for step in stack_loader.profile]),
+            hide_index=True,
+        )
+    if stack_loaded and registry.router is not None:
+        with st.expander("Model Routing (Click to Expand)"):
+            st.dataframe(
+                pd.DataFrame([
+                    {"agent": role, "model (fallback)": model} for role, model in registry.agent_models().items()
+                ]),
+                hide_index=True,
+            )
+            latencies = registry.router.stats()
+            if latencies:
+                st.caption(
+                    f"Calls per latency bucket. A model's calls go to its fallback while it averages "
+                    f"more than {registry.router.latency_threshold_s:.0f}s per call."
+                )
+                st.dataframe(
+                    pd.DataFrame([
+                        {
+                            "model": latency.model,
+                            "calls": latency.calls,
+                            "fallback_calls": latency.fallback_calls,
+                            "average_s": round(latency.average_s or 0.0, 2),
+                            **latency.histogram(),
+                        }
+                        for latency in latencies
+                    ]),
+                    hide_index=True,
+                )
 
 # -----------------------------------------------------------------------------------
 # 8. RUN THE SIMULATION
 # -----------------------------------------------------------------------------------
 if run_simulation:
-    # -------------------------------------------------------------------------
-    # CRISIS ANALYSIS TASK
-    # -------------------------------------------------------------------------
-    with st.spinner(""):
-        crew.tasks = [task_crisis_analysis]
-        crew.kickoff()
-    st.markdown("## Crisis Analysis Report")
-    st.markdown("---")
-
-    crisis_report = get_task_output(task_crisis_analysis)
-    with st.expander("Crisis Analyst Report (Click to Expand)"):
-        st.markdown(crisis_report)
-
-    # -------------------------------------------------------------------------
-    # PRODUCTION & LOGISTICS TASKS (EXCEPT SUMMARY)
-    # -------------------------------------------------------------------------
-    with st.spinner(""):
-        remaining_tasks = tasks[1:-1]
-        for t in remaining_tasks:
-            t.description += f"\n\nCrisis Report Details:\n{crisis_report}"
-        crew.tasks = remaining_tasks
-        crew.kickoff()
-
-    st.markdown("## Production and Logistics Reports")
-    st.markdown("---")
-
-    # -------------------------------------------------------------------------
-    # SUMMARY AGENT TASK
-    # -------------------------------------------------------------------------
-    with st.spinner(""):
-        final_text = "Below are the outputs from all agents:\n\n"
-        for t in remaining_tasks + [task_crisis_analysis]:
-            final_text += f"Agent: {t.agent.role} Output:\n"
-            final_text += get_task_output(t) + "\n\n"
-        task_summary.description += f"\n\nAll Agents' Reports:\n{final_text}"
-        crew.tasks = [task_summary]
-        crew.kickoff()
-
-    st.markdown("## Final Consolidated Summary")
+    load_stack()
+    simulation_settings = SimulationSettings(
+        max_parallel_tasks=max_parallel_tasks,
+        summary_extract_tokens=summary_extract_tokens,
+        summary_token_budget=summary_token_budget,
+        crisis_digest_tokens=crisis_digest_tokens,
+        crisis_context_tokens=crisis_context_tokens,
+        metrics_dir=metrics_dir,
+        monte_carlo_trials=monte_carlo_trials,
+        deadline_seconds=deadline_seconds,
+        memory_recall=memory_recall_items,
+        reuse_crisis_analysis=reuse_crisis_analysis,
+        fresh_crisis_analysis=fresh_crisis_analysis,
+    )
+    try:
+        job = job_queue.submit(
+            registry, crisis_detail, crisis_duration, settings=simulation_settings, current_date=current_date
+        )
+    except QueueFullError as exc:
+        st.error(str(exc))
+    else:
+        st.session_state.job_id = job.job_id
+        st.query_params["job"] = job.job_id
+
+@st.fragment(run_every=job_poll_seconds)
+def poll_job(job_id):
+    job = job_queue.get(job_id)
+    render_job(job)
+    if job.finished:
+        # Redraw the whole page once, without polling, now that the result is in
+        st.rerun()
+
+if job is not None and not job.finished:
+    poll_job(job.job_id)
+elif job is not None:
+    render_job(job)
     st.markdown("---")
+    st.markdown("## End of Simulation")
+    st.markdown("Thank you for using the **Supply Chain Simulator for Samsung Galaxy S24 Ultra**!")
 
-    final_summary_output = get_task_output(task_summary)
-    with st.expander("Summary Agent's Output (Click to Expand)"):
-        st.markdown(final_summary_output)
-
-    # -------------------------------------------------------------------------
-    # RESULTS (TABS FOR EACH AGENT EXCEPT SUMMARY)
-    # -------------------------------------------------------------------------
-    st.markdown("## All Agents' Reports")
-    relevant_tasks = [task_crisis_analysis] + remaining_tasks
-    tab_labels = [t.agent.role for t in relevant_tasks]
-    tabs = st.tabs(tab_labels)
+# -----------------------------------------------------------------------------------
+# 9. RUN HISTORY (SEE run_store.py)
+# -----------------------------------------------------------------------------------
+# Searching and opening past runs only reruns this fragment, not the whole page
+@st.fragment
+def render_run_history():
+    with st.expander(f"Run History: {run_store.count()} saved run(s) (Click to Expand)"):
+        h1, h2 = st.columns([3, 1])
+        with h1:
+            history_search = st.text_input("Search all agent reports", key="history_search")
+        with h2:
+            history_duration = st.selectbox("Crisis duration", ["All"] + list(range(1, 13)), key="history_duration")
+        duration_filter = None if history_duration == "All" else history_duration
+
+        if history_search:
+            history_hits = run_store.search(history_search, limit=50, crisis_duration=duration_filter)
+            for hit in history_hits[:10]:
+                st.markdown(f"**{hit['agent']}** · run `{hit['run_id']}` ({hit['current_date']}) — {hit['snippet']}")
+            history_runs = {hit["run_id"]: hit for hit in history_hits}
+        else:
+            history_runs = {run["run_id"]: run for run in run_store.list_runs(limit=50, crisis_duration=duration_filter)}
+
+        selected_run = st.selectbox(
+            "Open a past run",
+            [None] + list(history_runs),
+            format_func=lambda run_id: "—" if run_id is None else (
+                f"{history_runs[run_id]['current_date']} · {history_runs[run_id]['crisis_duration']} month(s) · "
+                f"{history_runs[run_id]['crisis_detail'][:80]}"
+            ),
+            key="history_run",
+        )
+        if selected_run is not None:
+            render_stored_run(run_store.load(selected_run))
 
-    for i, task_obj in enumerate(relevant_tasks):
-        with tabs[i]:
-            st.markdown(f"### {task_obj.agent.role} Report")
-            with st.expander("Click to view detailed report"):
-                st.markdown(get_task_output(task_obj))
+render_run_history()
 
-    st.markdown("---")
-    st.markdown("## End of Simulation")
-    st.markdown("Thank you for using the **Supply Chain Simulator for Samsung Galaxy S24 Ultra**!")
+# -----------------------------------------------------------------------------------
+# 10. KPI DASHBOARD (ALL SAVED RUNS)
+# -----------------------------------------------------------------------------------
+with st.expander("KPI Dashboard (Click to Expand)"):
+    kpi_df = run_store.kpi_frame()
+    if kpi_df.empty:
+        st.info("No KPI records yet: they are collected from every finished simulation.")
+    else:
+        kpi_name = st.selectbox(
+            "KPI",
+            list(KPI_FIELDS),
+            format_func=lambda name: f"{KPI_FIELDS[name][0]} ({KPI_FIELDS[name][1]})",
+            key="dashboard_kpi",
+        )
+        kpi_label = f"{KPI_FIELDS[kpi_name][0]} ({KPI_FIELDS[kpi_name][1]})"
+        reported = kpi_df.dropna(subset=[kpi_name])
+        st.caption(f"{len(reported)} reports from {reported['run_id'].nunique()} runs.")
+        if not reported.empty:
+            by_duration = reported.groupby(["agent", "crisis_duration"], as_index=False)[kpi_name].mean()
+            st.plotly_chart(
+                px.line(
+                    by_duration, x="crisis_duration", y=kpi_name, color="agent", markers=True,
+                    labels={"crisis_duration": "Crisis duration (months)", kpi_name: kpi_label},
+                    title=f"Mean {kpi_label} by crisis duration",
+                ),
+                use_container_width=True,
+            )
+            st.plotly_chart(
+                px.box(reported, x="agent", y=kpi_name, labels={kpi_name: kpi_label}, title=f"{kpi_label} by agent"),
+                use_container_width=True,
+            )
+            heatmap = reported.pivot_table(index="agent", columns="crisis_duration", values=kpi_name, aggfunc="mean")
+            st.plotly_chart(
+                px.imshow(
+                    heatmap, aspect="auto", color_continuous_scale="RdYlGn",
+                    labels={"x": "Crisis duration (months)", "y": "Agent", "color": kpi_label},
+                ),
+                use_container_width=True,
+            )
@@ -0,0 +1,250 @@
+"""
+Headless batch runner for the Supply Chain Simulator.
+
+Reads ``(crisis_detail, crisis_duration)`` scenarios from a CSV or JSONL file,
+runs them on a pool of worker processes and appends every task's output to a
+JSONL file (or one Parquet file per scenario) as soon as each scenario
+completes, so an interrupted overnight sweep keeps everything finished so far.
+Finished scenarios are also saved to the app's run history (``--run-store``)
+and appended to its columnar run archive (``--archive``). The registry is
+built from the app's Streamlit secrets file (``--secrets``), with the same LLM
+cache, task memo, crisis cache, model routing and supply network as the app.
+
+    python batch_runner.py scenarios.csv --out results.jsonl --workers 4
+    python batch_runner.py crises.jsonl --all-durations --format parquet --out results/
+
+The OpenAI API key is read from the ``OPENAI_API_KEY`` environment variable.
+"""
+import pysqlite3
+import sys
+sys.modules['sqlite3'] = pysqlite3
+
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from run_archive import DEFAULT_ARCHIVE_DIR, RunArchive
+from run_store import DEFAULT_RUN_STORE_PATH
+from scheduler import DEFAULT_MAX_WORKERS
+
+
+logger = logging.getLogger("batch_runner")
+
+DURATIONS = range(1, 13)
+DEFAULT_DURATION = 3
+DEFAULT_SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+
+# -----------------------------------------------------------------------------------
+# 1. SCENARIO INPUT
+# -----------------------------------------------------------------------------------
+def load_scenarios(path, all_durations=False):
+    """
+    Load scenarios from a ``.csv`` or ``.jsonl`` file with ``crisis_detail`` and an
+    optional ``crisis_duration`` column. With ``all_durations`` every crisis text
+    is expanded to the twelve durations the app offers.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+
+    scenarios = []
+    for i, record in enumerate(records, start=1):
+        crisis_detail = (record.get("crisis_detail") or "").strip()
+        if not crisis_detail:
+            raise ValueError(f"{path}: scenario {i} has no crisis_detail.")
+        if all_durations:
+            durations = list(DURATIONS)
+        else:
+            durations = [int(record.get("crisis_duration") or DEFAULT_DURATION)]
+        for duration in durations:
+            if duration not in DURATIONS:
+                raise ValueError(f"{path}: scenario {i} has crisis_duration {duration}, expected 1-12 months.")
+            scenarios.append({"crisis_detail": crisis_detail, "crisis_duration": duration})
+    return scenarios
+
+
+def load_secrets(path):
+    """The app's Streamlit secrets, or no settings when the file does not exist."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+# -----------------------------------------------------------------------------------
+# 2. WORKER PROCESS
+# -----------------------------------------------------------------------------------
+_worker = {}
+
+
+def _init_worker(secrets, parallel_tasks, workers, run_store_path, archive_dir):
+    from registry import get_registry, registry_settings
+    from run_store import RunStore
+    from simulation import SimulationSettings
+
+    settings = registry_settings(secrets)
+    # Every worker process has its own limiter, so the account limits are split between them
+    for limit in ("requests_per_minute", "tokens_per_minute"):
+        settings["rate_limits"][limit] /= workers
+    _worker["registry"] = get_registry(**settings)
+    _worker["run_store"] = RunStore(run_store_path) if run_store_path else None
+    # Workers only add single-run files; the parent process compacts them at the end of the batch
+    _worker["archive"] = RunArchive(archive_dir, compact_every=0) if archive_dir else None
+    _worker["settings"] = SimulationSettings(max_parallel_tasks=parallel_tasks)
+
+
+def _run_scenario(scenario_id, scenario):
+    from simulation import run_simulation
+
+    started = time.perf_counter()
+    try:
+        result = run_simulation(
+            _worker["registry"], scenario["crisis_detail"], scenario["crisis_duration"], settings=_worker["settings"]
+        )
+        rows = [{"scenario_id": scenario_id, **row} for row in result.task_rows()]
+    except Exception as exc:
+        return {"scenario_id": scenario_id, "rows": [], "error": repr(exc), "wall_time": time.perf_counter() - started}
+    # A storage error fails the scenario, but its rows are still written and the batch goes on
+    error = None
+    try:
+        if _worker["run_store"] is not None:
+            _worker["run_store"].save(result)
+        if _worker["archive"] is not None:
+            _worker["archive"].append(result)
+    except Exception as exc:
+        error = f"finished but could not be saved: {exc!r}"
+    return {"scenario_id": scenario_id, "rows": rows, "error": error, "wall_time": result.wall_time}
+
+
+# -----------------------------------------------------------------------------------
+# 3. OUTPUT WRITERS
+# -----------------------------------------------------------------------------------
+class JsonlWriter:
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, scenario_id, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, directory):
+        import pandas as pd
+
+        self.pd = pd
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, scenario_id, rows):
+        if rows:
+            path = os.path.join(self.directory, f"scenario-{scenario_id:06d}.parquet")
+            self.pd.DataFrame(rows).to_parquet(path, index=False)
+
+    def close(self):
+        pass
+
+
+# -----------------------------------------------------------------------------------
+# 4. BATCH EXECUTION
+# -----------------------------------------------------------------------------------
+def run_batch(
+    scenarios,
+    out,
+    output_format="jsonl",
+    workers=2,
+    parallel_tasks=DEFAULT_MAX_WORKERS,
+    secrets=None,
+    run_store_path=DEFAULT_RUN_STORE_PATH,
+    archive_dir=DEFAULT_ARCHIVE_DIR,
+):
+    """
+    Run ``scenarios`` on ``workers`` processes, writing results as each one completes.
+    ``secrets`` are the app's settings the registry is built from (see ``registry.registry_settings``).
+    """
+    writer = ParquetWriter(out) if output_format == "parquet" else JsonlWriter(out)
+    failed = 0
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(secrets or {}, parallel_tasks, workers, run_store_path, archive_dir)
+        ) as pool:
+            futures = [pool.submit(_run_scenario, i, scenario) for i, scenario in enumerate(scenarios, start=1)]
+            for done, future in enumerate(as_completed(futures), start=1):
+                outcome = future.result()
+                writer.write(outcome["scenario_id"], outcome["rows"])
+                if outcome["error"]:
+                    failed += 1
+                    logger.error("scenario %d failed: %s", outcome["scenario_id"], outcome["error"])
+                logger.info(
+                    "[%d/%d] scenario %d finished in %.1fs",
+                    done, len(scenarios), outcome["scenario_id"], outcome["wall_time"],
+                )
+    finally:
+        writer.close()
+        if archive_dir:
+            RunArchive(archive_dir).compact()
+    return {"scenarios": len(scenarios), "failed": failed, "wall_time": time.perf_counter() - started}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Supply Chain Simulator scenarios without the Streamlit UI.")
+    parser.add_argument("scenarios", help="CSV or JSONL file with crisis_detail and crisis_duration columns")
+    parser.add_argument("--out", required=True, help="JSONL file, or directory for --format parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--workers", type=int, default=2, help="number of scenarios simulated in parallel")
+    parser.add_argument("--parallel-tasks", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="agents running at the same time inside one scenario")
+    parser.add_argument("--all-durations", action="store_true", help="run every crisis text for 1 to 12 months")
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH,
+                        help="the app's Streamlit secrets file the registry settings are read from")
+    parser.add_argument("--llm-cache", help="SQLite LLM cache path, '' to disable (overrides LLM_CACHE_PATH)")
+    parser.add_argument("--run-store", default=DEFAULT_RUN_STORE_PATH,
+                        help="SQLite run history shared with the app, '' to disable")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR,
+                        help="Parquet run archive shared with the app's analytics page, '' to disable")
+    parser.add_argument("--rpm", type=float, help="OpenAI requests per minute (overrides OPENAI_RPM)")
+    parser.add_argument("--tpm", type=float, help="OpenAI tokens per minute (overrides OPENAI_TPM)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not os.environ.get("OPENAI_API_KEY"):
+        parser.error("OPENAI_API_KEY is not set.")
+
+    scenarios = load_scenarios(args.scenarios, args.all_durations)
+    secrets = load_secrets(args.secrets)
+    for name, value in (("LLM_CACHE_PATH", args.llm_cache), ("OPENAI_RPM", args.rpm), ("OPENAI_TPM", args.tpm)):
+        if value is not None:
+            secrets[name] = value
+    summary = run_batch(
+        scenarios,
+        args.out,
+        output_format=args.format,
+        workers=args.workers,
+        parallel_tasks=args.parallel_tasks,
+        secrets=secrets,
+        run_store_path=args.run_store,
+        archive_dir=args.archive,
+    )
+    logger.info(
+        "%d scenarios finished in %.1fs (%d failed)", summary["scenarios"], summary["wall_time"], summary["failed"]
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
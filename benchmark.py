@@ -0,0 +1,260 @@
+"""
+Offline benchmark of the simulation pipeline.
+
+Runs the full crisis analysis -> production & logistics -> summary pipeline
+against ``FakeChatModel`` (no network, no API key) and reports wall time,
+per-stage latency, peak RSS and the Python-side overhead of every task (task
+time minus the time spent inside the LLM). Results are compared with a JSON
+baseline so regressions in the simulator's own code show up.
+
+With ``--strong-latency``, the agents are routed like in production: a fast
+fake model for most agents and a slower "strong" one for the Crisis Analyst
+and the Summary Agent, which falls back to the fast one once its latency
+passes ``--fallback-latency``.
+
+    python benchmark.py --agents 10 --latency 0.2 --output-tokens 600 --repeat 3
+    python benchmark.py --strong-latency 0.5 --fallback-latency 0.3
+    python benchmark.py --save-baseline
+
+``--network-scale`` measures instead how the overhead of loading a network
+file, building its agents and tasks and scheduling its task graph (with no-op
+tasks) grows with the number of supplier nodes:
+
+    python benchmark.py --network-scale 10,100,500
+"""
+import pysqlite3
+import sys
+sys.modules['sqlite3'] = pysqlite3
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import time
+
+# CrewAI sends anonymous telemetry on every kickoff; keep the benchmark offline
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from fake_llm import FakeChatModel
+from model_routing import RoutingConfig
+from network import parse_network, synthetic_network
+from registry import AgentRegistry
+from scheduler import DEFAULT_MAX_WORKERS, DagScheduler, TaskGraph
+from simulation import SimulationSettings, run_simulation
+
+
+DEFAULT_BASELINE_PATH = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+# Counts and one-off setup time are reported but not checked against the baseline
+UNCHECKED_METRICS = ("setup_s", "llm_calls", "fallback_calls")
+BENCHMARK_CRISIS = "A six-week strike closes the main container ports of East Asia during the holiday season."
+BENCHMARK_DURATION = 3
+
+
+# -----------------------------------------------------------------------------------
+# 1. SCENARIO
+# -----------------------------------------------------------------------------------
+class BenchmarkRegistry(AgentRegistry):
+    """``AgentRegistry`` on the fake LLM, optionally limited to the first ``agents`` downstream tasks."""
+
+    def __init__(self, llm, agents=None, routing=None, llms=None, network=None):
+        super().__init__(llm=llm, routing=routing, llms=llms, network=network, verbose=False, memory=False)
+        self.max_agents = agents
+
+    def new_run(self, crisis_detail, crisis_duration):
+        run_tasks = super().new_run(crisis_detail, crisis_duration)
+        if self.max_agents is not None:
+            kept = run_tasks.remaining[: self.max_agents]
+            kept_ids = {id(t) for t in kept}
+            for t in kept:
+                t.context = [dep for dep in (t.context or []) if id(dep) in kept_ids] or None
+            run_tasks.remaining = kept
+        return run_tasks
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def measure_run(registry, settings):
+    """Run one scenario and return its measurements."""
+    result = run_simulation(registry, BENCHMARK_CRISIS, BENCHMARK_DURATION, settings=settings)
+    llm_seconds = {}
+    for span in result.metrics.by_kind("llm"):
+        llm_seconds[span.role] = llm_seconds.get(span.role, 0.0) + span.duration_s
+    overheads = [span.duration_s - llm_seconds.get(span.role, 0.0) for span in result.metrics.by_kind("task")]
+    failed = [name for name, r in result.task_results.items() if not r.ok]
+    return {
+        "wall_time_s": result.wall_time,
+        "stages": result.stage_wall_times(),
+        "task_overhead_mean_ms": 1000 * statistics.mean(overheads),
+        "task_overhead_max_ms": 1000 * max(overheads),
+        "llm_calls": len(result.metrics.by_kind("llm")),
+        "failed_tasks": failed,
+    }
+
+
+# -----------------------------------------------------------------------------------
+# 2. BENCHMARK
+# -----------------------------------------------------------------------------------
+def run_benchmark(
+    agents=None,
+    latency_s=0.05,
+    output_tokens=400,
+    tokens_per_second=0.0,
+    parallel_tasks=DEFAULT_MAX_WORKERS,
+    repeat=3,
+    seed=0,
+    strong_latency_s=None,
+    fallback_latency_s=None,
+):
+    """Run the benchmark scenario ``repeat`` times and return the median measurements."""
+    config = {
+        "agents": agents,
+        "latency_s": latency_s,
+        "output_tokens": output_tokens,
+        "tokens_per_second": tokens_per_second,
+        "parallel_tasks": parallel_tasks,
+    }
+    llm = FakeChatModel(
+        latency_s=latency_s, output_tokens=output_tokens, tokens_per_second=tokens_per_second, seed=seed
+    )
+    routing = llms = None
+    if strong_latency_s is not None:
+        config["strong_latency_s"] = strong_latency_s
+        config["fallback_latency_s"] = fallback_latency_s
+        routing = RoutingConfig(models={"fast": "fake-fast", "strong": "fake-strong"})
+        if fallback_latency_s is not None:
+            routing.latency_threshold_s = fallback_latency_s
+        llms = {
+            "fast": llm.copy(update={"model_name": "fake-fast"}),
+            "strong": llm.copy(update={"model_name": "fake-strong", "latency_s": strong_latency_s}),
+        }
+    started = time.perf_counter()
+    registry = BenchmarkRegistry(llm, agents, routing, llms)
+    setup_s = time.perf_counter() - started
+    settings = SimulationSettings(max_parallel_tasks=parallel_tasks, poll_interval=0.05)
+
+    runs = [measure_run(registry, settings) for _ in range(repeat)]
+    failed = sorted({name for run in runs for name in run["failed_tasks"]})
+    if failed:
+        raise RuntimeError(f"benchmark tasks failed: {', '.join(failed)}")
+
+    results = {"setup_s": setup_s}
+    for key in ("wall_time_s", "task_overhead_mean_ms", "task_overhead_max_ms"):
+        results[key] = statistics.median(run[key] for run in runs)
+    for stage in runs[0]["stages"]:
+        results[f"stage_{stage}_s"] = statistics.median(run["stages"][stage] for run in runs)
+    results["llm_calls"] = runs[0]["llm_calls"]
+    if registry.router is not None:
+        results["fallback_calls"] = sum(latency.fallback_calls for latency in registry.router.stats())
+    results["peak_rss_mb"] = peak_rss_mb()
+    return {"config": config, "repeat": repeat, "results": results}
+
+
+def measure_network_overhead(nodes, parallel_tasks=DEFAULT_MAX_WORKERS):
+    """Load, build and no-op scheduling times of a synthetic network of ``nodes`` suppliers."""
+    network_file = json.dumps(synthetic_network(nodes))
+    started = time.perf_counter()
+    network = parse_network(json.loads(network_file))
+    load_s = time.perf_counter() - started
+
+    registry = BenchmarkRegistry(FakeChatModel(), network=network)
+    started = time.perf_counter()
+    run_tasks = registry.new_run(BENCHMARK_CRISIS, BENCHMARK_DURATION)
+    tasks_s = time.perf_counter() - started
+
+    graph = TaskGraph()
+    for t in run_tasks.remaining:
+        graph.add(t.agent.role, lambda: None, [dep.agent.role for dep in (t.context or [])], run_tasks.stages[t.agent.role])
+    started = time.perf_counter()
+    DagScheduler(max_workers=parallel_tasks).run(graph)
+    schedule_s = time.perf_counter() - started
+    return {
+        "nodes": len(run_tasks.remaining),
+        "edges": network.edges,
+        "levels": network.depth,
+        "load_ms": 1000 * load_s,
+        "agents_ms": 1000 * registry.timings.agents_seconds,
+        "tasks_ms": 1000 * tasks_s,
+        "schedule_ms": 1000 * schedule_s,
+        "schedule_us_per_node": 1e6 * schedule_s / max(1, len(run_tasks.remaining)),
+    }
+
+
+def compare_with_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return ``(metric, baseline, current)`` for every metric more than ``tolerance`` above the baseline."""
+    if baseline.get("config") != report["config"]:
+        raise ValueError("baseline was recorded with a different configuration; re-run with --save-baseline.")
+    regressions = []
+    for metric, value in report["results"].items():
+        previous = baseline["results"].get(metric)
+        if metric not in UNCHECKED_METRICS and previous and value > previous * (1 + tolerance):
+            regressions.append((metric, previous, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation pipeline against a local fake LLM.")
+    parser.add_argument("--agents", type=int, default=None, help="downstream agents to run (1-10, default all)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each fake LLM answer")
+    parser.add_argument("--output-tokens", type=int, default=400, help="length of each fake report")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake streaming speed, 0 for instant")
+    parser.add_argument("--parallel-tasks", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strong-latency", type=float, default=None, help="route agents to a fast and a strong fake model")
+    parser.add_argument("--fallback-latency", type=float, default=None, help="latency above which the strong model falls back")
+    parser.add_argument("--network-scale", default=None, help="comma-separated supplier counts of synthetic networks")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="JSON baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args(argv)
+
+    if args.agents is not None and not 1 <= args.agents <= 10:
+        parser.error("--agents must be between 1 and 10.")
+
+    if args.network_scale:
+        rows = [measure_network_overhead(int(n), args.parallel_tasks) for n in args.network_scale.split(",")]
+        print("  ".join(f"{column:>20}" for column in rows[0]))
+        for row in rows:
+            print("  ".join(f"{value:>20.3f}" if isinstance(value, float) else f"{value:>20}" for value in row.values()))
+        return 0
+
+    report = run_benchmark(
+        agents=args.agents,
+        latency_s=args.latency,
+        output_tokens=args.output_tokens,
+        tokens_per_second=args.tokens_per_second,
+        parallel_tasks=args.parallel_tasks,
+        repeat=args.repeat,
+        seed=args.seed,
+        strong_latency_s=args.strong_latency,
+        fallback_latency_s=args.fallback_latency,
+    )
+    for metric, value in report["results"].items():
+        print(f"{metric:<40} {value:>12.3f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(report, baseline, args.tolerance)
+    for metric, previous, value in regressions:
+        print(f"REGRESSION {metric}: {previous:.3f} -> {value:.3f}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Role-specific slicing of the Crisis Analyst report.
+
+Rather than appending the whole crisis report to all ten downstream tasks, the
+report is split into its sections once, a short shared digest is taken from
+its opening, and every role only receives the sections that match its topics
+(for example logistics sections for DHL and Amazon, materials sections for LG
+Chem and Ibiden), within a per-task token limit. A report without headings is
+split at its paragraphs instead, and a report that already fits in the limit
+is passed whole.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+
+from tokens import count_tokens, truncate_to_tokens
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIGEST_TOKENS = 250
+DEFAULT_SLICE_TOKENS = 900
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_HEADING = re.compile(
+    r"^\s*(?:#{1,6}\s+(?P<md>.+?)\s*#*|\*\*(?P<bold>[^*]+?)\*\*:?|(?:\d+(?:\.\d+)*\.?\s+)(?P<num>[A-Z][^.:]{2,80}):?)\s*$"
+)
+
+
+@dataclass
+class Section:
+    title: str
+    text: str
+    tokens: int = 0
+
+
+@dataclass
+class ContextSlice:
+    role: str
+    text: str
+    sections: list = field(default_factory=list)
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def saved_tokens(self):
+        return self.tokens_before - self.tokens_after
+
+
+def split_sections(report):
+    """
+    Split a markdown report into ``Section`` objects at every heading line, or at
+    every paragraph when it has no headings.
+    """
+    sections = []
+    title, lines = "Overview", []
+    headings = 0
+    for line in report.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            headings += 1
+            if any(l.strip() for l in lines):
+                sections.append(Section(title, "\n".join(lines).strip()))
+            title = next(group for group in match.group("md", "bold", "num") if group)
+            lines = [line]
+        else:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append(Section(title, "\n".join(lines).strip()))
+    if not headings:
+        paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(report) if p.strip()]
+        sections = [Section(f"Paragraph {i}", p) for i, p in enumerate(paragraphs, start=1)]
+    for section in sections:
+        section.tokens = count_tokens(section.text)
+    return sections
+
+
+def build_digest(sections, max_tokens=DEFAULT_DIGEST_TOKENS):
+    """Short digest shared by every role: the opening of the report, within ``max_tokens``."""
+    opening = "\n\n".join(section.text for section in sections[:2])
+    return truncate_to_tokens(opening, max_tokens)
+
+
+def _score(section, topics):
+    haystack = f"{section.title} {section.title} {section.text}".lower()
+    return sum(haystack.count(topic) for topic in topics)
+
+
+def slice_for_role(role, sections, topics, digest, max_tokens=DEFAULT_SLICE_TOKENS):
+    """Pick the sections most relevant to ``topics`` (after the digest), in report order."""
+    # The first two sections already make up the digest
+    scores = [(_score(section, topics), i) for i, section in enumerate(sections) if i >= 2]
+    budget = max_tokens - count_tokens(digest)
+    picked = []
+    for score, i in sorted(scores, reverse=True):
+        if score > 0 and sections[i].tokens <= budget:
+            picked.append(i)
+            budget -= sections[i].tokens
+    chosen = [sections[i] for i in sorted(picked)]
+
+    parts = [f"Crisis digest:\n{digest}"]
+    if chosen:
+        parts.append("Sections of the crisis report relevant to your role:\n\n" + "\n\n".join(s.text for s in chosen))
+    text = "\n\n".join(parts)
+    return ContextSlice(role, text, [s.title for s in chosen], tokens_after=count_tokens(text))
+
+
+def prepare_contexts(crisis_report, role_topics, digest_tokens=DEFAULT_DIGEST_TOKENS, slice_tokens=DEFAULT_SLICE_TOKENS):
+    """
+    Build the crisis context of every role in ``role_topics`` (role -> topic keywords).
+    Roles without topics receive the full report, as before, and so does every role
+    when the report fits in ``slice_tokens``: a digest plus slices would only repeat it.
+    """
+    sections = split_sections(crisis_report)
+    digest = build_digest(sections, digest_tokens)
+    full_tokens = count_tokens(crisis_report)
+
+    contexts = {}
+    for role, topics in role_topics.items():
+        if topics and full_tokens > slice_tokens:
+            context = slice_for_role(role, sections, topics, digest, slice_tokens)
+        else:
+            context = ContextSlice(role, crisis_report, [s.title for s in sections], tokens_after=full_tokens)
+        context.tokens_before = full_tokens
+        contexts[role] = context
+        logger.info(
+            "crisis context for %s: %d -> %d input tokens (%d sections)",
+            role, context.tokens_before, context.tokens_after, len(context.sections),
+        )
+    return contexts
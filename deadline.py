@@ -0,0 +1,153 @@
+"""
+Deadline-aware task execution.
+
+A run with a time limit gets a ``Deadline``, and every task receives its share
+of the time left when it starts: the remaining time divided by the number of
+sequential task levels still ahead on its path (itself and the summary
+included). Budgets are recomputed at every start, so time saved by fast or
+reused tasks flows to the ones after them.
+
+The agent of a budgeted task gets an iteration count and an execution-time
+limit scaled to its budget. If it is still running when the budget is spent,
+the task is cancelled and its best partial answer is used instead: the final
+answer it had started streaming, or else its latest reasoning. Cancelling
+raises ``TaskCancelled`` on the task's thread at its next LLM call, streamed
+token or agent step (see ``CancellationHandler``), so an abandoned agent stops
+spending tokens and rate-limit budget right away.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+# Typical duration of one agent iteration (one streamed LLM call), used to scale max_iter
+DEFAULT_SECONDS_PER_ITERATION = 15.0
+# No task gets less than this, even when the deadline has already passed
+MIN_TASK_BUDGET = 5.0
+
+FINAL_ANSWER = "Final Answer:"
+
+
+class Deadline:
+    """Wall-clock limit of one run, started on creation."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = time.perf_counter()
+
+    def remaining(self):
+        return max(0.0, self.seconds - (time.perf_counter() - self.started))
+
+    def budget(self, levels_left):
+        """Seconds for a task with ``levels_left`` sequential levels ahead, itself included."""
+        return max(MIN_TASK_BUDGET, self.remaining() / max(1, levels_left))
+
+
+def remaining_levels(run_tasks):
+    """``{role: sequential task levels from this task to the end of the run, itself included}``."""
+    dependants = defaultdict(list)
+    for t in run_tasks.remaining:
+        for dep in t.context or []:
+            dependants[dep.agent.role].append(t.agent.role)
+
+    after = {}
+
+    def levels_after(role):
+        if role not in after:
+            after[role] = max((1 + levels_after(child) for child in dependants[role]), default=0)
+        return after[role]
+
+    # Every production task is followed by the summary
+    levels = {t.agent.role: levels_after(t.agent.role) + 2 for t in run_tasks.remaining}
+    levels[run_tasks.crisis_analysis.agent.role] = max(levels.values(), default=1) + 1
+    levels[run_tasks.summary.agent.role] = 1
+    return levels
+
+
+def iterations_for(budget, max_iter, seconds_per_iteration=DEFAULT_SECONDS_PER_ITERATION):
+    return max(1, min(max_iter, int(budget // seconds_per_iteration)))
+
+
+def partial_answer(streamed):
+    """Best answer in the text an agent streamed before its budget ran out, or ``None``."""
+    if FINAL_ANSWER in streamed:
+        answer = streamed.rsplit(FINAL_ANSWER, 1)[1]
+    else:
+        answer = streamed.rsplit("Thought:", 1)[-1]
+    return answer.strip() or None
+
+
+# -----------------------------------------------------------------------------------
+# CANCELLATION
+# -----------------------------------------------------------------------------------
+class TaskCancelled(BaseException):
+    """
+    Raised on the thread of a task whose budget is spent. A ``BaseException``, so the
+    ``except Exception`` handlers of CrewAI, LangChain and the rate limiter let it through.
+    """
+
+
+_cancel = threading.local()
+
+
+@contextmanager
+def cancel_scope(event):
+    """Make ``check_cancelled`` raise on this thread once ``event`` is set."""
+    previous = getattr(_cancel, "event", None)
+    _cancel.event = event
+    try:
+        yield
+    finally:
+        _cancel.event = previous
+
+
+def check_cancelled():
+    event = getattr(_cancel, "event", None)
+    if event is not None and event.is_set():
+        raise TaskCancelled()
+
+
+class CancellationHandler(BaseCallbackHandler):
+    """Stops the LLM calls of a cancelled task, before the call and at every streamed token."""
+
+    raise_error = True
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        check_cancelled()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        check_cancelled()
+
+    def on_llm_new_token(self, token, **kwargs):
+        check_cancelled()
+
+
+def run_with_timeout(fn, timeout):
+    """
+    Run ``fn`` on a daemon thread for at most ``timeout`` seconds and return
+    ``(finished, value)``. An unfinished call is cancelled (it stops at its next
+    ``check_cancelled``) and its result is dropped; an exception raised in time
+    is re-raised.
+    """
+    outcome = {}
+    cancelled = threading.Event()
+
+    def target():
+        try:
+            with cancel_scope(cancelled):
+                outcome["value"] = fn()
+        except BaseException as exc:
+            outcome["error"] = exc
+
+    thread = threading.Thread(target=target, name="budgeted-task", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        cancelled.set()
+        return False, None
+    if "error" in outcome:
+        raise outcome["error"]
+    return True, outcome.get("value")
@@ -0,0 +1,51 @@
+"""
+Local text embeddings.
+
+``HashingEmbedder`` maps text to a fixed-size, L2-normalised vector by feature
+hashing its words and word pairs, so similarity search needs neither an
+embeddings API call nor a model download. Vectors are stable across processes
+(CRC32 rather than Python's salted ``hash``), and the dot product of two
+vectors is their cosine similarity.
+"""
+import re
+import zlib
+
+import numpy as np
+
+
+DEFAULT_DIMENSIONS = 1024
+
+_WORD = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+
+def _features(text, bigrams=True, stop_words=frozenset()):
+    words = [word for word in _WORD.findall(text.lower()) if word not in stop_words]
+    if not bigrams:
+        return words
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class HashingEmbedder:
+    """
+    Embeds text by hashing its unigrams and bigrams into ``dimensions`` signed buckets.
+    Without ``bigrams`` word order is ignored, and ``stop_words`` are left out entirely,
+    which makes rewordings of the same short text score closer.
+    """
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS, bigrams=True, stop_words=frozenset()):
+        self.dimensions = dimensions
+        self.bigrams = bigrams
+        self.stop_words = stop_words
+
+    def embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in _features(text, self.bigrams, self.stop_words):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        # Sublinear term frequency, so repeated boilerplate does not dominate
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts):
+        return np.stack([self.embed(text) for text in texts]) if texts else np.zeros((0, self.dimensions), np.float32)
@@ -0,0 +1,216 @@
+"""
+Structured, sampled, non-blocking event log of simulation runs.
+
+With ``verbose=True`` every agent printed each of its thoughts and actions to
+stdout from the thread running it, which interleaves the output of parallel
+agents and concurrent users and blocks every agent on the terminal. Agents
+now report their steps through ``log_agent_step`` instead, and the pipeline
+logs the start and end of runs and tasks: every event carries the run id, the
+agent role, the step and its duration.
+
+``EventLog.emit`` only filters, samples and enqueues: events below ``level``
+are ignored, and events below WARNING are only written for a ``sample_rate``
+share of the runs, picked by run id so a sampled run is logged in full.
+A background thread writes the queued events as JSON lines to a file or
+stderr; when the bounded queue is full, events are dropped and counted rather
+than blocking the agents. Independently of sampling, the last
+``ring_events`` events of each of the last ``max_runs`` runs are kept in
+memory, where the app shows them on demand.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, replace
+
+from metrics import current_task_span
+
+
+DEFAULT_LEVEL = logging.INFO
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_RING_EVENTS = 200
+DEFAULT_MAX_RUNS = 100
+DEFAULT_QUEUE_SIZE = 10_000
+# Thoughts and answers are cut to this many characters in step events
+MAX_MESSAGE_CHARS = 300
+
+
+@dataclass
+class LogEvent:
+    ts: float
+    level: str
+    event: str
+    run_id: str = None
+    role: str = None
+    step: int = None
+    duration_s: float = None
+    message: str = None
+    fields: dict = None
+
+    def to_dict(self):
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+@dataclass
+class EventLogStats:
+    emitted: int = 0
+    sampled_out: int = 0
+    dropped: int = 0
+    written: int = 0
+
+
+class EventLog:
+    """Filters, samples and queues structured events; a background thread writes them."""
+
+    def __init__(
+        self,
+        level=DEFAULT_LEVEL,
+        sample_rate=DEFAULT_SAMPLE_RATE,
+        path=None,
+        ring_events=DEFAULT_RING_EVENTS,
+        max_runs=DEFAULT_MAX_RUNS,
+        queue_size=DEFAULT_QUEUE_SIZE,
+    ):
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+        self.sample_rate = sample_rate
+        self.path = path
+        self.ring_events = ring_events
+        self.max_runs = max_runs
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = EventLogStats()
+        self._writer = threading.Thread(target=self._write_events, name="event-log-writer", daemon=True)
+        self._writer.start()
+
+    def _sampled(self, run_id, level):
+        if level >= logging.WARNING or self.sample_rate >= 1:
+            return True
+        if run_id is None:
+            return random.random() < self.sample_rate
+        return zlib.crc32(run_id.encode("utf-8")) / 0xFFFFFFFF < self.sample_rate
+
+    def emit(self, event, run_id=None, role=None, step=None, duration_s=None, message=None, level=logging.INFO, **fields):
+        """Record one event; never blocks and never raises on a full queue."""
+        if level < self.level:
+            return
+        fields = {key: value for key, value in fields.items() if value is not None}
+        record = LogEvent(
+            time.time(), logging.getLevelName(level), event, run_id, role, step,
+            round(duration_s, 3) if duration_s is not None else None, message, fields or None,
+        )
+        with self._lock:
+            self._stats.emitted += 1
+            if run_id is not None:
+                ring = self._runs.get(run_id)
+                if ring is None:
+                    ring = self._runs[run_id] = deque(maxlen=self.ring_events)
+                    if len(self._runs) > self.max_runs:
+                        self._runs.popitem(last=False)
+                ring.append(record)
+            if not self._sampled(run_id, level):
+                self._stats.sampled_out += 1
+                return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._stats.dropped += 1
+
+    def events(self, run_id):
+        """The last ``ring_events`` events of a run, oldest first."""
+        with self._lock:
+            return list(self._runs.get(run_id, ()))
+
+    def stats(self):
+        with self._lock:
+            return replace(self._stats)
+
+    def _write_events(self):
+        stream = open(self.path, "a", encoding="utf-8") if self.path else sys.stderr
+        while True:
+            batch = [self._queue.get()]
+            # Everything queued meanwhile goes out with the same flush
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stream.write("".join(json.dumps(record.to_dict(), default=str) + "\n" for record in batch))
+            stream.flush()
+            with self._lock:
+                self._stats.written += len(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """Wait until every queued event is written (for scripts about to exit)."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+_event_log = None
+_event_log_lock = threading.Lock()
+
+
+def get_event_log(level=DEFAULT_LEVEL, sample_rate=DEFAULT_SAMPLE_RATE, path=None, ring_events=DEFAULT_RING_EVENTS):
+    """Return the process-wide ``EventLog``; arguments are only used by the first call."""
+    global _event_log
+    if _event_log is None:
+        with _event_log_lock:
+            if _event_log is None:
+                _event_log = EventLog(level, sample_rate, path, ring_events)
+    return _event_log
+
+
+# -----------------------------------------------------------------------------------
+# AGENT STEPS
+# -----------------------------------------------------------------------------------
+_steps = threading.local()
+
+
+def _clip(text):
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= MAX_MESSAGE_CHARS else text[: MAX_MESSAGE_CHARS - 1] + "…"
+
+
+def log_agent_step(step_output):
+    """
+    ``step_callback`` of the agents: logs each thought/action step of the task running
+    on this thread, numbered within the task and timed from the step before it.
+    """
+    span = current_task_span()
+    now = time.time()
+    # A thread's first step has no counter yet, even outside a task span
+    if not hasattr(_steps, "count") or _steps.span is not span:
+        _steps.span, _steps.count, _steps.last = span, 0, span.started_at if span is not None else now
+    _steps.count += 1
+    duration_s, _steps.last = now - _steps.last, now
+    run_id = span.run_id if span is not None else None
+    role = span.role if span is not None else None
+
+    log = get_event_log()
+    if hasattr(step_output, "return_values"):
+        log.emit(
+            "final_answer", run_id, role, _steps.count, duration_s, _clip(step_output.return_values.get("output")),
+        )
+        return
+    for agent_step in step_output if isinstance(step_output, list) else [step_output]:
+        action = getattr(agent_step, "action", agent_step)
+        tool = getattr(action, "tool", None)
+        log.emit(
+            "agent_action", run_id, role, _steps.count, duration_s, _clip(getattr(action, "log", "")),
+            # CrewAI reports parsing errors and forced answers as the "_Exception" tool
+            level=logging.WARNING if tool == "_Exception" else logging.INFO,
+            tool=tool,
+            observation=_clip(getattr(agent_step, "observation", None)) or None,
+        )
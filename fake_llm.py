@@ -0,0 +1,96 @@
+"""
+Deterministic stand-in for the OpenAI chat model, used by the benchmark.
+
+``FakeChatModel`` answers every CrewAI prompt with a "Final Answer" markdown
+report (KPIs, challenges, solutions, topic sections and a KPI JSON block) of a
+configurable length, after a configurable latency, and streams it through the callback
+handlers like ``ChatOpenAI`` does. The same role, seed and settings always
+produce the same report, so benchmark runs are comparable.
+"""
+import hashlib
+import json
+import random
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from tokens import CHARS_PER_TOKEN
+
+
+_ROLE = re.compile(r"You are ([^.\n]+)\.")
+
+_TOPICS = (
+    "semiconductor wafer supply", "display panel output", "battery material sourcing",
+    "assembly line labor", "port and shipping routes", "warehouse distribution",
+    "consumer demand", "customer repair service",
+)
+_KPIS = ("On-time delivery rate", "Inventory turnover", "Production throughput", "Order fill rate", "Lead time")
+_CHALLENGES = ("Component shortage", "Shipping delay", "Supplier risk", "Labor bottleneck", "Demand disruption")
+_SOLUTIONS = ("Dual sourcing", "Safety stock increase", "Route diversification", "Overtime shifts", "Demand shaping")
+_FILLER = (
+    "The crisis shifts capacity planning toward buffer inventory and alternative lanes.",
+    "Lead times extend while expedited freight absorbs part of the delay.",
+    "Partners share weekly forecasts to keep allocation decisions aligned.",
+    "Cost pressure rises as premium sourcing replaces contracted volumes.",
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning deterministic CrewAI-style reports without network access."""
+
+    model_name: str = "fake-llm"
+    latency_s: float = 0.05
+    output_tokens: int = 400
+    tokens_per_second: float = 0.0
+    seed: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-supply-chain"
+
+    def render_report(self, role):
+        digest = hashlib.sha256(f"{self.seed}:{role}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+        lines = [f"# {role} Report", "", "## Key Performance Indicators"]
+        lines += [f"- {kpi}: {rng.randint(40, 99)}%" for kpi in rng.sample(_KPIS, 3)]
+        lines += ["", "## Challenges"]
+        lines += [f"- {c}: {rng.randint(2, 16)} weeks of impact" for c in rng.sample(_CHALLENGES, 3)]
+        lines += ["", "## Solutions Adopted"]
+        lines += [f"- {s}: recovers {rng.randint(5, 60)}% of lost volume" for s in rng.sample(_SOLUTIONS, 3)]
+
+        budget = self.output_tokens * CHARS_PER_TOKEN
+        topics = list(_TOPICS)
+        rng.shuffle(topics)
+        i = 0
+        while sum(len(line) + 1 for line in lines) < budget:
+            lines += ["", f"## {topics[i % len(topics)].title()}", _FILLER[rng.randrange(len(_FILLER))]]
+            i += 1
+        kpis = {
+            "on_time_delivery_rate": rng.randint(40, 99),
+            "defect_rate": round(rng.uniform(0.1, 5.0), 1),
+            "inventory_turnover": round(rng.uniform(2, 12), 1),
+            "lead_time_days": rng.randint(7, 90),
+        }
+        return "\n".join(lines)[:budget] + f"\n\n```json\n{json.dumps(kpis)}\n```"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(m.content) for m in messages)
+        match = _ROLE.search(prompt)
+        report = self.render_report(match.group(1) if match else "Agent")
+        text = f"Thought: I now can give a great answer\nFinal Answer: {report}"
+
+        time.sleep(self.latency_s)
+        if run_manager is not None:
+            delay = CHARS_PER_TOKEN / self.tokens_per_second if self.tokens_per_second else 0.0
+            for start in range(0, len(text), CHARS_PER_TOKEN):
+                if delay:
+                    time.sleep(delay)
+                run_manager.on_llm_new_token(text[start:start + CHARS_PER_TOKEN])
+
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=text))],
+            llm_output={"model_name": self.model_name},
+        )
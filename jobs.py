@@ -0,0 +1,257 @@
+"""
+Background job queue for simulations.
+
+A simulation takes minutes, while Streamlit reruns the app script on every
+widget interaction and starts a new session on every page refresh. Runs
+submitted to the process-wide ``JobQueue`` execute on a bounded pool of
+background threads instead of the script thread, so reruns and refreshes
+neither cancel nor repeat them, and a burst of users queues up rather than
+holding one script thread each. The app keeps the job id in
+``st.session_state`` (and the page URL) and redraws the page from the job's
+``JobProgress`` until the result is ready. Finished runs are saved to the
+``RunStore`` and appended to the ``RunArchive`` when they are given.
+
+Every job runs its own copies of the agents (see ``AgentRegistry.new_run``),
+so concurrent jobs do not share CrewAI's per-kickoff agent state.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from simulation import NO_DATA, SimulationListener, SimulationSettings, run_simulation
+from streaming import TokenBuffer
+
+
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+DEFAULT_MAX_QUEUED_JOBS = 20
+DEFAULT_MAX_FINISHED_JOBS = 100
+
+logger = logging.getLogger("jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(RuntimeError):
+    """Raised by ``JobQueue.submit`` when ``max_queued_jobs`` runs are already waiting."""
+
+
+class JobProgress(SimulationListener):
+    """
+    Records the progress reported by ``run_simulation`` so the UI can render it at
+    any time. Hooks run on the job thread; containers are replaced or updated with
+    single operations, so readers on the script thread always see a consistent value.
+    """
+
+    def __init__(self):
+        self.crisis_role = None
+        self.summary_role = None
+        self.production_roles = []
+        self.monte_carlo = None
+        self.running = frozenset()
+        self.results = {}
+        self.reused = {}
+        self.truncated = {}
+        self.crisis_cache_match = None
+        self.contexts = {}
+        self.summary_input = None
+        self.stage_reports = {}
+
+    def on_run_start(self, run_tasks):
+        self.crisis_role = run_tasks.crisis_analysis.agent.role
+        self.summary_role = run_tasks.summary.agent.role
+        self.production_roles = [t.agent.role for t in run_tasks.remaining]
+
+    def on_monte_carlo(self, monte_carlo):
+        self.monte_carlo = monte_carlo
+
+    def on_idle(self, running_roles):
+        self.running = frozenset(running_roles)
+
+    def on_task_reused(self, role, saved_seconds):
+        self.reused[role] = saved_seconds
+
+    def on_crisis_cache_hit(self, match):
+        self.crisis_cache_match = match
+
+    def on_task_truncated(self, role, budget):
+        self.truncated[role] = budget
+
+    def on_task_complete(self, result):
+        self.results[result.name] = result
+
+    def on_contexts_prepared(self, contexts):
+        self.contexts = contexts
+
+    def on_summary_input(self, extract_tokens, raw_tokens, token_budget):
+        self.summary_input = (extract_tokens, raw_tokens, token_budget)
+
+    def on_stage_complete(self, stage, graph, report):
+        self.stage_reports[stage] = (graph, report)
+
+
+@dataclass
+class Job:
+    job_id: str
+    crisis_detail: str
+    crisis_duration: int
+    current_date: str
+    settings: SimulationSettings
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    progress: JobProgress = field(default_factory=JobProgress)
+    token_buffer: TokenBuffer = field(default_factory=TokenBuffer)
+    # Why a finished run could not be saved to the run store or the archive
+    storage_error: str = None
+    result: object = None
+    error: str = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def agent_state(self, role):
+        """``(state, detail)`` of one agent, as shown in the status lines."""
+        result = self.progress.results.get(role)
+        if result is not None:
+            if role in self.progress.reused:
+                match = self.progress.crisis_cache_match
+                if role == self.progress.crisis_role and match is not None:
+                    return "reused", f" from a similar crisis ({match.similarity:.0%} match, saved {match.duration_s:.1f}s)"
+                return "reused", f" (saved {self.progress.reused[role]:.1f}s)"
+            if result.ok and role in self.progress.truncated:
+                return "truncated", f" after its {self.progress.truncated[role]:.0f}s budget"
+            if result.ok:
+                return "done", f" in {result.duration:.1f}s"
+            if result.skipped:
+                return "skipped", ""
+            return "error", f": {result.error}"
+        if role in self.progress.running:
+            return "running", f" ({self.token_buffer.token_count(role)} tokens)"
+        return "waiting", ""
+
+    def report_text(self, role):
+        """The agent's final report, or the tokens streamed so far while it runs."""
+        result = self.progress.results.get(role)
+        if result is not None:
+            return result.output if result.ok else NO_DATA
+        return self.token_buffer.text(role)
+
+
+# -----------------------------------------------------------------------------------
+# QUEUE
+# -----------------------------------------------------------------------------------
+class JobQueue:
+    """Runs submitted simulations on at most ``max_concurrent_jobs`` background threads."""
+
+    def __init__(
+        self,
+        max_concurrent_jobs=DEFAULT_MAX_CONCURRENT_JOBS,
+        max_queued_jobs=DEFAULT_MAX_QUEUED_JOBS,
+        max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS,
+        run_store=None,
+        archive=None,
+    ):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self.run_store = run_store
+        self.archive = archive
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="simulation-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, registry, crisis_detail, crisis_duration, settings=None, current_date=None):
+        """Queue one simulation and return its ``Job`` right away."""
+        job = Job(
+            job_id=uuid.uuid4().hex[:12],
+            crisis_detail=crisis_detail,
+            crisis_duration=crisis_duration,
+            current_date=current_date,
+            settings=settings or SimulationSettings(),
+        )
+        with self._lock:
+            if sum(j.status == QUEUED for j in self._jobs.values()) >= self.max_queued_jobs:
+                raise QueueFullError(f"{self.max_queued_jobs} simulations are already waiting; try again later.")
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job, registry)
+        return job
+
+    def _run(self, job, registry):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = run_simulation(
+                registry,
+                job.crisis_detail,
+                job.crisis_duration,
+                settings=job.settings,
+                listener=job.progress,
+                token_buffer=job.token_buffer,
+                current_date=job.current_date,
+                run_id=job.job_id,
+            )
+        except Exception as exc:
+            job.error = repr(exc)
+            job.status = FAILED
+            job.finished_at = time.time()
+            return
+        # The run succeeded: a storage error is logged and shown, but the result stays available
+        persisters = []
+        if self.run_store is not None:
+            persisters.append(self.run_store.save)
+        if self.archive is not None:
+            persisters.append(self.archive.append)
+        for persist in persisters:
+            try:
+                persist(job.result)
+            except Exception as exc:
+                logger.exception("could not persist simulation %s", job.job_id)
+                job.storage_error = repr(exc)
+        job.status = DONE
+        job.finished_at = time.time()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id):
+        """1-based position of a queued job among the jobs waiting for a worker."""
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j.status == QUEUED]
+        return next((i for i, j in enumerate(queued, start=1) if j.job_id == job_id), 0)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(
+    max_concurrent_jobs=DEFAULT_MAX_CONCURRENT_JOBS, max_queued_jobs=DEFAULT_MAX_QUEUED_JOBS, run_store=None, archive=None
+):
+    """Return the process-wide ``JobQueue``; arguments are only used by the first call."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(max_concurrent_jobs, max_queued_jobs, run_store=run_store, archive=archive)
+    return _queue
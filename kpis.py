@@ -0,0 +1,86 @@
+"""
+Structured KPI records returned by the production & logistics agents.
+
+Every production & logistics task asks its agent to end the report with a
+fenced JSON block holding the KPIs of ``KPIRecord``. The block is parsed and
+validated locally when the task finishes (no second LLM call), removed from
+the narrative report, and stored as one typed row per agent, so KPIs of
+thousands of runs can be aggregated column-wise with pandas.
+"""
+import json
+import re
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+
+# name -> (label, unit)
+KPI_FIELDS = {
+    "on_time_delivery_rate": ("On-time delivery rate", "%"),
+    "defect_rate": ("Defect rate", "%"),
+    "inventory_turnover": ("Inventory turnover", "turns/year"),
+    "lead_time_days": ("Lead time", "days"),
+    "capacity_utilization": ("Capacity utilization", "%"),
+    "cost_impact_pct": ("Cost impact", "% vs. plan"),
+    "customer_satisfaction": ("Customer satisfaction", "%"),
+}
+
+_KPI_BLOCK = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
+
+
+class KPIRecord(BaseModel):
+    """KPIs reported by one agent; ``None`` when the agent did not report a value."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    on_time_delivery_rate: Optional[float] = Field(None, ge=0, le=100)
+    defect_rate: Optional[float] = Field(None, ge=0, le=100)
+    inventory_turnover: Optional[float] = Field(None, ge=0, le=365)
+    lead_time_days: Optional[float] = Field(None, ge=0, le=730)
+    capacity_utilization: Optional[float] = Field(None, ge=0, le=200)
+    cost_impact_pct: Optional[float] = Field(None, ge=-100, le=1000)
+    customer_satisfaction: Optional[float] = Field(None, ge=0, le=100)
+
+    def reported(self):
+        return {name: value for name, value in self.model_dump().items() if value is not None}
+
+
+KPI_INSTRUCTIONS = (
+    "\n    End the report with a fenced ```json block holding these KPIs as plain numbers "
+    "(use null for any KPI you cannot estimate):\n    "
+    + json.dumps({name: f"<{unit}>" for name, (_, unit) in KPI_FIELDS.items()})
+    + "\n    "
+)
+
+
+def _validated(data):
+    """Validate ``data``, dropping only the fields that fail so one bad value keeps the rest."""
+    data = {key: value for key, value in data.items() if key in KPI_FIELDS}
+    while True:
+        try:
+            return KPIRecord.model_validate(data)
+        except ValidationError as exc:
+            invalid = {error["loc"][0] for error in exc.errors() if error["loc"]}
+            if not invalid & data.keys():
+                return KPIRecord()
+            for key in invalid:
+                data.pop(key, None)
+
+
+def parse_kpis(text):
+    """
+    Split an agent's output into ``(report, KPIRecord or None)``: the narrative
+    without its KPI block, and the validated KPIs of the last JSON block.
+    """
+    matches = list(_KPI_BLOCK.finditer(text))
+    if not matches:
+        return text, None
+    match = matches[-1]
+    try:
+        data = json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return text, None
+    if not isinstance(data, dict):
+        return text, None
+    report = (text[: match.start()] + text[match.end():]).strip()
+    return report, _validated(data)
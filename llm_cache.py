@@ -0,0 +1,219 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+
+Responses are stored in SQLite keyed on the model name, the sampling
+temperature and a SHA-256 hash of the normalized prompt, so re-running a
+scenario that was already simulated replays every agent answer from disk
+instead of calling the provider again. Entries expire after ``ttl_seconds``
+and the least recently used ones are evicted once ``max_entries`` or
+``max_bytes`` is exceeded.
+
+``LLMResponseCache.view(model, temperature)`` returns a LangChain ``BaseCache``
+that can be passed as ``cache=`` to a chat model.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+_WHITESPACE = re.compile(r"\s+")
+
+_thread = threading.local()
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay-only mode when a prompt has no cached response."""
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so cosmetic formatting changes hit the same entry."""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def thread_cache_hits():
+    """Cache hits served on the calling thread so far, to tell a cached call from a provider call."""
+    return getattr(_thread, "hits", 0)
+
+
+def cache_key(model, temperature, prompt):
+    prompt_hash = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{model}\x00{temperature!r}\x00{prompt_hash}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# -----------------------------------------------------------------------------------
+# SQLITE STORE
+# -----------------------------------------------------------------------------------
+class LLMResponseCache:
+    """SQLite-backed response store shared by every model view."""
+
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        max_bytes=None,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+        replay_only=False,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.replay_only = replay_only
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    temperature REAL,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used_at)"
+            )
+
+    def view(self, model, temperature):
+        """Return a LangChain cache bound to one model and temperature."""
+        return ModelCacheView(self, model, temperature)
+
+    def get(self, model, temperature, prompt):
+        key = cache_key(model, temperature, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._stats.evictions += 1
+                row = None
+            if row is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+                _thread.hits = thread_cache_hits() + 1
+                with self._conn:
+                    self._conn.execute("UPDATE llm_responses SET last_used_at = ? WHERE key = ?", (now, key))
+
+        if row is None:
+            if self.replay_only:
+                raise CacheMissError(f"No cached response for model '{model}' in replay-only mode.")
+            return None
+        return loads(row[0])
+
+    def put(self, model, temperature, prompt, generations):
+        if self.replay_only:
+            return
+        payload = dumps(generations)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_responses
+                    (key, model, temperature, response, size_bytes, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (cache_key(model, temperature, prompt), model, temperature, payload, len(payload), now, now),
+            )
+            self._evict(now)
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until within size limits."""
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self._stats.evictions += max(cursor.rowcount, 0)
+
+        entries, size_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_responses"
+        ).fetchone()
+        while (self.max_entries and entries > self.max_entries) or (self.max_bytes and size_bytes > self.max_bytes):
+            row = self._conn.execute(
+                "SELECT key, size_bytes FROM llm_responses ORDER BY last_used_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (row[0],))
+            entries -= 1
+            size_bytes -= row[1]
+            self._stats.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            entries, size_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_responses"
+            ).fetchone()
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=entries,
+                size_bytes=size_bytes,
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_responses")
+
+
+# -----------------------------------------------------------------------------------
+# LANGCHAIN ADAPTER
+# -----------------------------------------------------------------------------------
+class ModelCacheView(BaseCache):
+    """``BaseCache`` implementation that forwards to an ``LLMResponseCache``."""
+
+    def __init__(self, store, model, temperature):
+        self.store = store
+        self.model = model
+        self.temperature = temperature
+
+    def lookup(self, prompt, llm_string):
+        return self.store.get(self.model, self.temperature, prompt)
+
+    def update(self, prompt, llm_string, return_val):
+        self.store.put(self.model, self.temperature, prompt, return_val)
+
+    def clear(self, **kwargs):
+        self.store.clear()
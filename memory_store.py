@@ -0,0 +1,139 @@
+"""
+Shared in-process memory of a simulation run.
+
+CrewAI's own memory embeds every saved task output and every lookup with the
+OpenAI embeddings API and persists them in an on-disk vector store per crew,
+which is a lot of machinery for a run of a few minutes. ``RunMemory`` keeps
+the sections of the agents' reports in a bounded NumPy matrix instead,
+embedded locally by ``HashingEmbedder`` and searched by cosine similarity, and
+evicts the least recently used notes when it is full. One memory is shared by
+all agents of a run and discarded with it.
+
+``MemoryStats`` counts what CrewAI's memory would have cost for the same
+saves and lookups: one embedding call per save and per lookup, and one write
+of the text and its 1536-dimension embedding to disk per save. It also counts
+the notes recalled into prompts and their tokens, which is what the memory
+adds to the cost of a run.
+"""
+import threading
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from context_slicing import split_sections
+from embeddings import HashingEmbedder
+from tokens import count_tokens, truncate_to_tokens
+
+
+DEFAULT_MEMORY_ITEMS = 256
+DEFAULT_RECALL_ITEMS = 3
+DEFAULT_MIN_SIMILARITY = 0.1
+DEFAULT_NOTE_TOKENS = 200
+
+# One item of CrewAI's vector store: a text-embedding-3/ada-002 vector of 1536 float32
+EMBEDDING_BYTES = 1536 * 4
+
+
+@dataclass
+class MemoryStats:
+    items: int = 0
+    capacity: int = 0
+    saves: int = 0
+    recalls: int = 0
+    evictions: int = 0
+    index_bytes: int = 0
+    embedding_calls_avoided: int = 0
+    disk_writes_avoided: int = 0
+    disk_bytes_avoided: int = 0
+    # Notes added to the prompts of the agents, and their tokens
+    notes_recalled: int = 0
+    recalled_tokens: int = 0
+
+
+class MemoryBackend:
+    """Interface of a run memory. This base remembers nothing; ``RunMemory`` is the real store."""
+
+    def save(self, role, text):
+        pass
+
+    def recall(self, query, roles=None, exclude_text="", k=DEFAULT_RECALL_ITEMS):
+        """Up to ``k`` ``(role, note, similarity)`` tuples, most similar first."""
+        return []
+
+    def stats(self):
+        return MemoryStats()
+
+
+class RunMemory(MemoryBackend):
+    """Bounded store of report sections with a cosine-similarity index, least recently used evicted first."""
+
+    def __init__(
+        self,
+        capacity=DEFAULT_MEMORY_ITEMS,
+        embedder=None,
+        min_similarity=DEFAULT_MIN_SIMILARITY,
+        note_tokens=DEFAULT_NOTE_TOKENS,
+    ):
+        self.capacity = capacity
+        self.embedder = embedder or HashingEmbedder()
+        self.min_similarity = min_similarity
+        self.note_tokens = note_tokens
+        self._vectors = np.zeros((capacity, self.embedder.dimensions), dtype=np.float32)
+        self._notes = [None] * capacity
+        self._roles = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = MemoryStats(capacity=capacity)
+
+    def save(self, role, text):
+        """Store the sections of one agent's report as separate notes."""
+        notes = [truncate_to_tokens(section.text, self.note_tokens) for section in split_sections(text)]
+        vectors = self.embedder.embed_many(notes)
+        with self._lock:
+            for note, vector in zip(notes, vectors):
+                if self._size < self.capacity:
+                    slot = self._size
+                    self._size += 1
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self._stats.evictions += 1
+                self._clock += 1
+                self._vectors[slot] = vector
+                self._notes[slot] = note
+                self._roles[slot] = role
+                self._last_used[slot] = self._clock
+            self._stats.saves += 1
+            self._stats.embedding_calls_avoided += 1
+            self._stats.disk_writes_avoided += 1
+            self._stats.disk_bytes_avoided += len(text.encode("utf-8")) + EMBEDDING_BYTES
+
+    def recall(self, query, roles=None, exclude_text="", k=DEFAULT_RECALL_ITEMS):
+        """
+        Notes of ``roles`` (all roles when ``None``) most similar to ``query``; notes
+        already contained in ``exclude_text`` are skipped.
+        """
+        query_vector = self.embedder.embed(query)
+        with self._lock:
+            self._stats.recalls += 1
+            self._stats.embedding_calls_avoided += 1
+            scores = self._vectors[: self._size] @ query_vector
+            recalled = []
+            for slot in np.argsort(-scores, kind="stable"):
+                if len(recalled) == k or scores[slot] < self.min_similarity:
+                    break
+                if roles is not None and self._roles[slot] not in roles:
+                    continue
+                if self._notes[slot] in exclude_text:
+                    continue
+                self._clock += 1
+                self._last_used[slot] = self._clock
+                recalled.append((self._roles[slot], self._notes[slot], float(scores[slot])))
+            self._stats.notes_recalled += len(recalled)
+            self._stats.recalled_tokens += sum(count_tokens(note) for _, note, _ in recalled)
+        return recalled
+
+    def stats(self):
+        with self._lock:
+            return replace(self._stats, items=self._size, index_bytes=self._vectors.nbytes)
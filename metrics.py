@@ -0,0 +1,320 @@
+"""
+Latency, token and cost instrumentation of a simulation run.
+
+A ``MetricsRecorder`` collects timing spans for every stage, every task and
+every LLM call of one run. LLM calls are captured by ``MetricsCallbackHandler``
+on the shared LLM client and attributed to the task running on the current
+thread (see ``task_scope``), tagged with the agent role, the iteration number
+against the agent's ``max_iter``, prompt/completion tokens, the prompt tokens
+served from the provider's prompt cache, and cost. Calls answered from the
+local LLM cache (see llm_cache.py) cost nothing and are tagged ``cache_hit``.
+
+Spans are written as JSON lines, and process-wide per-agent totals and
+per-model latency histograms are exported in the Prometheus text format so a
+textfile collector can scrape them.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from llm_cache import thread_cache_hits
+from tokens import count_tokens
+
+
+DEFAULT_METRICS_DIR = os.path.join(".cache", "metrics")
+
+# USD per one million tokens: (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+# Share of the prompt price billed for prompt tokens read from the provider's cache
+CACHED_PROMPT_PRICE_RATIO = 0.5
+# Upper bounds of the buckets of the per-model LLM latency histogram, in seconds
+LLM_LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 45, 60, 90, 120)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    uncached_tokens = prompt_tokens - cached_tokens
+    prompt_cost = (uncached_tokens + cached_tokens * CACHED_PROMPT_PRICE_RATIO) * prompt_price
+    return (prompt_cost + completion_tokens * completion_price) / 1_000_000
+
+
+@dataclass
+class Span:
+    kind: str
+    name: str
+    run_id: str
+    started_at: float
+    duration_s: float = 0.0
+    role: str = None
+    stage: str = None
+    model: str = None
+    iteration: int = None
+    max_iter: int = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    estimated_tokens: bool = False
+    cache_hit: bool = False
+    cost_usd: float = 0.0
+    error: str = None
+
+    def to_dict(self):
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+# -----------------------------------------------------------------------------------
+# PER-RUN RECORDER
+# -----------------------------------------------------------------------------------
+class MetricsRecorder:
+    """Thread-safe collection of the spans of one simulation run."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+        _totals.add(span)
+
+    @contextmanager
+    def span(self, kind, name, **tags):
+        span = Span(kind, name, self.run_id, time.time(), **tags)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as exc:
+            span.error = repr(exc)
+            raise
+        finally:
+            span.duration_s = time.perf_counter() - started
+            self.add(span)
+
+    def by_kind(self, kind):
+        with self._lock:
+            return [s for s in self.spans if s.kind == kind]
+
+    def agent_summary(self):
+        """One row per agent role: task wall time, LLM calls/iterations, tokens and cost."""
+        rows = {}
+        for span in self.by_kind("task"):
+            rows[span.role] = {
+                "agent": span.role,
+                "stage": span.stage,
+                "task_s": round(span.duration_s, 2),
+                "llm_calls": 0,
+                "iterations": f"0/{span.max_iter}",
+                "llm_s": 0.0,
+                "prompt_tokens": 0,
+                "cached_tokens": 0,
+                "completion_tokens": 0,
+                "cost_usd": 0.0,
+                "models": "",
+            }
+        for span in self.by_kind("llm"):
+            row = rows.get(span.role)
+            if row is None:
+                continue
+            row["llm_calls"] += 1
+            row["iterations"] = f"{row['llm_calls']}/{span.max_iter}"
+            row["llm_s"] = round(row["llm_s"] + span.duration_s, 2)
+            row["prompt_tokens"] += span.prompt_tokens
+            row["cached_tokens"] += span.cached_tokens
+            row["completion_tokens"] += span.completion_tokens
+            row["cost_usd"] = round(row["cost_usd"] + span.cost_usd, 6)
+            if span.model and span.model not in row["models"].split(", "):
+                row["models"] = ", ".join(filter(None, [row["models"], span.model]))
+        return list(rows.values())
+
+    def write_jsonl(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock, open(path, "a", encoding="utf-8") as f:
+            for span in self.spans:
+                f.write(json.dumps(span.to_dict()) + "\n")
+
+
+# -----------------------------------------------------------------------------------
+# TASK ATTRIBUTION
+# -----------------------------------------------------------------------------------
+_local = threading.local()
+
+
+@contextmanager
+def task_scope(recorder, role, stage=None, max_iter=None):
+    """Time the task running on this thread and attribute its LLM calls to ``role``."""
+    previous = getattr(_local, "scope", None)
+    with recorder.span("task", role, role=role, stage=stage, max_iter=max_iter) as span:
+        _local.scope = {"recorder": recorder, "span": span, "calls": 0}
+        try:
+            yield span
+        finally:
+            _local.scope = previous
+
+
+def current_task_span():
+    """The ``task`` span of the task running on this thread, or ``None`` outside a ``task_scope``."""
+    scope = getattr(_local, "scope", None)
+    return scope["span"] if scope is not None else None
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records one ``llm`` span per LLM call made inside a ``task_scope``."""
+
+    def __init__(self, model):
+        self.model = model
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, prompt_text):
+        scope = getattr(_local, "scope", None)
+        if scope is None:
+            return
+        scope["calls"] += 1
+        with self._lock:
+            self._calls[run_id] = (
+                scope, scope["calls"], time.time(), time.perf_counter(), prompt_text, thread_cache_hits(),
+            )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "\n".join(prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "\n".join(str(m.content) for batch in messages for m in batch))
+
+    def _finish(self, run_id, response=None, error=None):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        scope, iteration, started_at, started, prompt_text, cache_hits = call
+        task_span = scope["span"]
+        # A routed model reports which of its models answered the call
+        model = (getattr(response, "llm_output", None) or {}).get("model_name") or self.model
+        span = Span(
+            "llm", f"{task_span.role} #{iteration}", scope["recorder"].run_id, started_at,
+            duration_s=time.perf_counter() - started,
+            role=task_span.role, stage=task_span.stage, model=model,
+            iteration=iteration, max_iter=task_span.max_iter,
+            # LangChain looks the cache up on the thread that started the call
+            cache_hit=thread_cache_hits() != cache_hits,
+        )
+        if response is not None and not span.cache_hit:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            if usage:
+                span.prompt_tokens = usage.get("prompt_tokens", 0)
+                span.completion_tokens = usage.get("completion_tokens", 0)
+                span.cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+            else:
+                # Streaming responses carry no usage block, so the tokens are counted locally
+                completion = "".join(g.text for generations in response.generations for g in generations)
+                span.prompt_tokens = count_tokens(prompt_text, model)
+                span.completion_tokens = count_tokens(completion, model)
+                span.estimated_tokens = True
+            span.cost_usd = estimate_cost(model, span.prompt_tokens, span.completion_tokens, span.cached_tokens)
+        if error is not None:
+            span.error = repr(error)
+        scope["recorder"].add(span)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, response=response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=error)
+
+
+# -----------------------------------------------------------------------------------
+# PROCESS-WIDE TOTALS (PROMETHEUS TEXT EXPOSITION)
+# -----------------------------------------------------------------------------------
+class _Totals:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = defaultdict(float)
+        self.histograms = set()
+
+    def add(self, span):
+        with self._lock:
+            if span.kind == "llm":
+                labels = (("role", span.role), ("model", span.model))
+                self.values[("simulator_llm_calls_total", labels)] += 1
+                self.values[("simulator_llm_seconds_total", labels)] += span.duration_s
+                self.values[("simulator_prompt_tokens_total", labels)] += span.prompt_tokens
+                self.values[("simulator_cached_prompt_tokens_total", labels)] += span.cached_tokens
+                self.values[("simulator_completion_tokens_total", labels)] += span.completion_tokens
+                self.values[("simulator_cost_usd_total", labels)] += span.cost_usd
+                if span.error:
+                    self.values[("simulator_llm_errors_total", labels)] += 1
+                if span.cache_hit:
+                    # A cached answer says nothing about how fast the model is
+                    self.values[("simulator_llm_cache_hits_total", labels)] += 1
+                else:
+                    self._observe("simulator_llm_latency_seconds", (("model", span.model),), span.duration_s)
+            elif span.kind in ("task", "stage"):
+                labels = (("name", span.name),)
+                self.values[(f"simulator_{span.kind}_seconds_total", labels)] += span.duration_s
+                self.values[(f"simulator_{span.kind}_runs_total", labels)] += 1
+
+    def _observe(self, histogram, labels, value):
+        """Add ``value`` to the cumulative buckets, sum and count of a Prometheus histogram."""
+        self.histograms.add(histogram)
+        for bound in LLM_LATENCY_BUCKETS + (float("inf"),):
+            if value <= bound:
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                self.values[(f"{histogram}_bucket", labels + (("le", le),))] += 1
+        self.values[(f"{histogram}_sum", labels)] += value
+        self.values[(f"{histogram}_count", labels)] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted(self.values.items())
+        lines = []
+        typed = set()
+        for (metric, labels), value in items:
+            # The _bucket, _sum and _count series of a histogram share one TYPE line
+            base = metric.rsplit("_", 1)[0]
+            family = base if base in self.histograms else metric
+            if family not in typed:
+                typed.add(family)
+                lines.append(f"# TYPE {family} {'histogram' if family in self.histograms else 'counter'}")
+            label_text = ",".join(f'{key}="{value_}"' for key, value_ in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:g}")
+        return "".join(line + "\n" for line in lines)
+
+
+_totals = _Totals()
+_gauge_providers = []
+
+
+def register_gauges(provider):
+    """Export the ``{metric: value}`` dict returned by ``provider()`` as gauges."""
+    _gauge_providers.append(provider)
+
+
+def render_prometheus():
+    """Process-wide per-agent totals in the Prometheus text exposition format."""
+    lines = [_totals.render()]
+    for provider in _gauge_providers:
+        for metric, value in provider().items():
+            lines.append(f"# TYPE {metric} gauge\n{metric} {value:g}\n")
+    return "".join(lines)
+
+
+def write_prometheus(path):
+    """Write ``render_prometheus()`` atomically, as expected by textfile collectors."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
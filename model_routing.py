@@ -0,0 +1,168 @@
+"""
+Per-agent model routing with latency-based fallback.
+
+Agents are assigned to model tiers by ``RoutingConfig``: the component
+suppliers and the logistics agents run on a fast, small model, while the
+Crisis Analyst and the Summary Agent, whose reports everything else builds
+on, run on a stronger one. Every tier is served by a ``RoutedChatModel`` that
+sends calls to the tier's model, or to its fallback tier while that model is
+too slow: when the moving average latency of a model passes
+``latency_threshold_s``, its calls go to the fallback for ``cooldown_s``, after
+which the next call probes it again.
+
+``LatencyRouter`` keeps a latency histogram per model, shared by all tiers, and
+the routed models stream tokens and report usage under the name of the model
+that actually answered, so the metrics attribute every call correctly.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from llm_cache import thread_cache_hits
+from metrics import LLM_LATENCY_BUCKETS, register_gauges
+
+
+DEFAULT_MODELS = {"fast": "gpt-4o-mini", "strong": "gpt-4o"}
+# Agents of AGENT_SPECS outside this map use the default tier
+DEFAULT_ROUTES = {"crisis_analyst": "strong", "summary_agent": "strong"}
+DEFAULT_FALLBACKS = {"strong": "fast"}
+DEFAULT_LATENCY_THRESHOLD_S = 45.0
+DEFAULT_COOLDOWN_S = 120.0
+# Weight of the newest call in the moving average latency
+LATENCY_SMOOTHING = 0.3
+
+
+@dataclass
+class RoutingConfig:
+    models: dict = field(default_factory=lambda: dict(DEFAULT_MODELS))
+    routes: dict = field(default_factory=lambda: dict(DEFAULT_ROUTES))
+    fallbacks: dict = field(default_factory=lambda: dict(DEFAULT_FALLBACKS))
+    default_tier: str = "fast"
+    latency_threshold_s: float = DEFAULT_LATENCY_THRESHOLD_S
+    cooldown_s: float = DEFAULT_COOLDOWN_S
+
+    def tier_for(self, agent_key):
+        return self.routes.get(agent_key, self.default_tier)
+
+
+@dataclass
+class ModelLatency:
+    model: str
+    calls: int = 0
+    fallback_calls: int = 0
+    total_s: float = 0.0
+    average_s: float = None
+    degraded_until: float = 0.0
+    buckets: list = field(default_factory=lambda: [0] * (len(LLM_LATENCY_BUCKETS) + 1))
+
+    def record(self, seconds):
+        self.calls += 1
+        self.total_s += seconds
+        self.buckets[sum(seconds > bound for bound in LLM_LATENCY_BUCKETS)] += 1
+        if self.average_s is None:
+            self.average_s = seconds
+        else:
+            self.average_s += LATENCY_SMOOTHING * (seconds - self.average_s)
+
+    def histogram(self):
+        """``{bucket label: calls}``, the last bucket holding the calls above the largest bound."""
+        labels = [f"≤{bound}s" for bound in LLM_LATENCY_BUCKETS] + [f">{LLM_LATENCY_BUCKETS[-1]}s"]
+        return dict(zip(labels, self.buckets))
+
+
+class LatencyRouter:
+    """Tracks the latency of every model and decides when a model's calls go to its fallback."""
+
+    def __init__(self, latency_threshold_s=DEFAULT_LATENCY_THRESHOLD_S, cooldown_s=DEFAULT_COOLDOWN_S):
+        self.latency_threshold_s = latency_threshold_s
+        self.cooldown_s = cooldown_s
+        self._models = {}
+        self._lock = threading.Lock()
+        register_gauges(self.gauges)
+
+    def _latency(self, model):
+        if model not in self._models:
+            self._models[model] = ModelLatency(model)
+        return self._models[model]
+
+    def choose(self, primary, fallback):
+        """The model the next call of a tier goes to."""
+        if fallback is None:
+            return primary
+        with self._lock:
+            latency = self._latency(primary.model_name)
+            if time.monotonic() < latency.degraded_until:
+                latency.fallback_calls += 1
+                return fallback
+            if latency.degraded_until:
+                # Cooldown over: the next call probes the model with a fresh average
+                latency.degraded_until = 0.0
+                latency.average_s = None
+            return primary
+
+    def record(self, model, seconds):
+        with self._lock:
+            latency = self._latency(model)
+            latency.record(seconds)
+            if latency.average_s > self.latency_threshold_s:
+                latency.degraded_until = time.monotonic() + self.cooldown_s
+
+    def degraded(self, model):
+        with self._lock:
+            return time.monotonic() < self._latency(model).degraded_until
+
+    def stats(self):
+        """One ``ModelLatency`` snapshot per model that was called or routed around."""
+        with self._lock:
+            return [
+                ModelLatency(**{**vars(latency), "buckets": list(latency.buckets)})
+                for latency in self._models.values()
+            ]
+
+    def gauges(self):
+        stats = self.stats()
+        return {
+            "simulator_llm_fallback_calls": sum(latency.fallback_calls for latency in stats),
+            "simulator_llm_degraded_models": sum(time.monotonic() < latency.degraded_until for latency in stats),
+        }
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model of one tier: answers with ``primary``, or with ``fallback`` while ``primary`` is slow."""
+
+    primary: Any
+    fallback: Any = None
+    router: Any = None
+    # Caching is left to the primary and fallback models, whose caches are keyed on their own model
+    cache: Any = False
+
+    @property
+    def _llm_type(self):
+        return "routed"
+
+    @property
+    def model_name(self):
+        return self.primary.model_name
+
+    @property
+    def temperature(self):
+        return getattr(self.primary, "temperature", None)
+
+    @property
+    def _identifying_params(self):
+        fallback = self.fallback.model_name if self.fallback is not None else None
+        return {"primary": self.primary.model_name, "fallback": fallback}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        model = self.router.choose(self.primary, self.fallback)
+        hits = thread_cache_hits()
+        started = time.perf_counter()
+        result = model._generate_with_cache(messages, stop=stop, run_manager=run_manager, **kwargs)
+        # A cached answer says nothing about how fast the model is
+        if thread_cache_hits() == hits:
+            self.router.record(model.model_name, time.perf_counter() - started)
+        result.llm_output = {**(result.llm_output or {}), "model_name": model.model_name}
+        return result
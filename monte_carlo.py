@@ -0,0 +1,260 @@
+"""
+Vectorized Monte Carlo model of the Galaxy S24 Ultra supply chain.
+
+The network mirrors the agent catalog: six component suppliers (chipset,
+OLED, camera sensor, battery, memory, PCB) feed Foxconn assembly, whose output
+moves through DHL logistics to Amazon distribution, with Samsung Care serving
+the installed base. Every node has a monthly capacity (relative to baseline
+demand), a lead time, a safety stock and a base disruption risk. The crisis
+text raises the risk of the nodes whose topics it mentions.
+
+Each trial draws which nodes are hit, when, how hard and how fast they
+recover; the model then steps month by month over the crisis and its
+aftermath, with all trials advanced together as NumPy arrays. The results
+are percentiles per month and per node, rendered as grounding numbers for
+the agents' prompts.
+"""
+import hashlib
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+DEFAULT_TRIALS = 10_000
+# Months simulated after the crisis ends, so late ripple effects are visible
+AFTERMATH_MONTHS = 3
+
+
+@dataclass
+class NodeSpec:
+    label: str
+    capacity: float
+    lead_time: int = 0
+    safety_stock: float = 0.0
+    base_risk: float = 0.1
+
+
+# Keyed like the agent catalog; capacities and stocks are in months of baseline demand
+COMPONENTS = {
+    "qualcomm_chipset": NodeSpec("Snapdragon chipset", 1.15, lead_time=3, safety_stock=1.0, base_risk=0.12),
+    "samsung_display": NodeSpec("OLED panel", 1.20, lead_time=2, safety_stock=0.75, base_risk=0.08),
+    "sony_camera": NodeSpec("Camera sensor", 1.15, lead_time=2, safety_stock=0.75, base_risk=0.08),
+    "lg_chem": NodeSpec("Battery", 1.25, lead_time=1, safety_stock=0.5, base_risk=0.10),
+    "sk_hynix": NodeSpec("Memory", 1.20, lead_time=2, safety_stock=0.75, base_risk=0.10),
+    "ibiden": NodeSpec("PCB substrate", 1.20, lead_time=1, safety_stock=0.5, base_risk=0.08),
+}
+ASSEMBLY = ("foxconn_assembly", NodeSpec("Assembly", 1.10, safety_stock=0.25, base_risk=0.10))
+LOGISTICS = ("dhl_logistics", NodeSpec("Logistics", 1.15, lead_time=1, base_risk=0.12))
+DISTRIBUTION = ("amazon_distribution", NodeSpec("Distribution", 1.20, safety_stock=0.5, base_risk=0.06))
+AFTER_SALES = ("samsung_care", NodeSpec("After-sales service", 1.10, base_risk=0.05))
+# Monthly repair requests as a share of monthly sales, and the spare parts they consume
+REPAIR_RATE = 0.04
+
+
+def _nodes():
+    return [*COMPONENTS.items(), ASSEMBLY, LOGISTICS, DISTRIBUTION, AFTER_SALES]
+
+
+def scenario_seed(crisis_detail, crisis_duration):
+    """Seed derived from the scenario, so re-running it renders the same grounding (and hits the LLM cache)."""
+    digest = hashlib.sha256(f"{crisis_duration}\x00{crisis_detail}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def crisis_exposure(crisis_detail, node_topics):
+    """Exposure (0-1) of every node to the crisis, from the node's topics mentioned in the text."""
+    text = crisis_detail.lower()
+    return {key: min(1.0, sum(topic in text for topic in topics) / 2) for key, topics in node_topics.items()}
+
+
+@dataclass
+class MonteCarloResult:
+    trials: int
+    crisis_duration: int
+    months: int
+    seconds: float
+    exposure: dict
+    # metric -> array of shape (3, months) with the P10, P50 and P90 of every month
+    monthly: dict = field(default_factory=dict)
+    # node key -> {"hit_probability", "capacity_p50", "capacity_p10", "bottleneck_share"}
+    nodes: dict = field(default_factory=dict)
+    summary: dict = field(default_factory=dict)
+
+    def monthly_rows(self, metric):
+        p10, p50, p90 = self.monthly[metric]
+        return [
+            {"month": m + 1, "p10": float(p10[m]), "p50": float(p50[m]), "p90": float(p90[m])}
+            for m in range(self.months)
+        ]
+
+
+# -----------------------------------------------------------------------------------
+# SIMULATION
+# -----------------------------------------------------------------------------------
+def _draw_disruptions(rng, trials, keys, specs, exposure, crisis_duration, months):
+    """Capacity lost by every node in every month, shape (trials, nodes, months)."""
+    n = len(keys)
+    risk = np.array([min(0.95, spec.base_risk + 0.8 * exposure.get(key, 0.0)) for key, spec in zip(keys, specs)])
+    scale = np.array([0.4 + 0.6 * exposure.get(key, 0.0) for key in keys])
+
+    hit = rng.random((trials, n)) < risk
+    severity = rng.beta(2.0, 3.0, (trials, n)) * scale
+    onset = rng.integers(0, max(1, min(3, crisis_duration)), (trials, n))
+    # Share of the lost capacity that comes back every month once the crisis is over
+    recovery = rng.uniform(0.3, 0.7, (trials, n))
+
+    month = np.arange(months)
+    active = (month >= onset[..., None]) & (month < crisis_duration)
+    after = np.clip(month - crisis_duration + 1, 0, None)
+    residual = np.where(month >= crisis_duration, (1 - recovery[..., None]) ** after, 1.0)
+    started = month >= onset[..., None]
+    loss = severity[..., None] * np.where(active, 1.0, residual * started)
+    return np.where(hit[..., None], loss, 0.0), hit
+
+
+def run_monte_carlo(crisis_detail, crisis_duration, node_topics=None, trials=DEFAULT_TRIALS, seed=None):
+    """Simulate ``trials`` scenarios of the crisis and return their ``MonteCarloResult``."""
+    started = time.perf_counter()
+    rng = np.random.default_rng(scenario_seed(crisis_detail, crisis_duration) if seed is None else seed)
+    exposure = crisis_exposure(crisis_detail, node_topics or {})
+    nodes = _nodes()
+    keys = [key for key, _ in nodes]
+    specs = [spec for _, spec in nodes]
+    n_components = len(COMPONENTS)
+    max_lead = max(spec.lead_time for spec in specs)
+    months = crisis_duration + AFTERMATH_MONTHS + max_lead
+
+    loss, hit = _draw_disruptions(rng, trials, keys, specs, exposure, crisis_duration, months)
+    capacity = np.array([spec.capacity for spec in specs])[None, :, None] * (1 - loss)
+    demand = rng.normal(1.0, 0.05, (trials, months)).clip(0.7, 1.3)
+
+    comp_specs = specs[:n_components]
+    lead = np.array([spec.lead_time for spec in comp_specs])
+    safety_stock = np.array([spec.safety_stock for spec in comp_specs])
+    component_stock = np.tile(safety_stock, (trials, 1))
+    # Components already in transit when the crisis starts arrive at the baseline rate
+    pipeline = np.ones((trials, n_components, max_lead + 1))
+    assembly_i, logistics_i, distribution_i, service_i = range(n_components, n_components + 4)
+    transit = np.ones((trials, LOGISTICS[1].lead_time + 1))
+    dock = np.zeros(trials)
+    retail_stock = np.full(trials, DISTRIBUTION[1].safety_stock)
+    backlog = np.zeros(trials)
+    repair_backlog = np.zeros(trials)
+    bottleneck_counts = np.zeros(n_components)
+
+    series = {name: np.zeros((trials, months)) for name in (
+        "component_supply", "assembly_output", "shipped", "fill_rate", "lost_sales", "repair_backlog")}
+    for m in range(months):
+        # Suppliers produce to forecast, plus catch-up towards the safety stock, within their remaining capacity
+        catch_up = np.clip(safety_stock - component_stock, 0, 0.5)
+        produced = np.minimum(capacity[:, :n_components, m], 1.0 + catch_up)
+        slot = (m + lead) % pipeline.shape[2]
+        pipeline[np.arange(trials)[:, None], np.arange(n_components), slot] = produced
+        arrived = pipeline[:, :, m % pipeline.shape[2]]
+        available = component_stock + arrived
+
+        # One of each component per phone: the scarcest component caps assembly
+        assembly_target = np.minimum(capacity[:, assembly_i, m], demand[:, m] + backlog)
+        short = available.min(axis=1) < assembly_target
+        bottleneck_counts += np.bincount(available[short].argmin(axis=1), minlength=n_components)
+        assembled = np.minimum(available.min(axis=1), assembly_target)
+        component_stock = available - assembled[:, None]
+
+        # Logistics moves assembled phones with a one-month transit; what it cannot take waits at the dock
+        to_ship = assembled + dock
+        shipped = np.minimum(to_ship, capacity[:, logistics_i, m])
+        dock = to_ship - shipped
+        transit[:, m % transit.shape[1]] = shipped
+        delivered = transit[:, (m + 1) % transit.shape[1]]
+
+        # Distribution serves demand and open orders from delivered units and retail stock
+        on_hand = retail_stock + delivered
+        wanted = demand[:, m] + backlog
+        sold = np.minimum(np.minimum(on_hand, wanted), capacity[:, distribution_i, m])
+        retail_stock = on_hand - sold
+        # Half of the unserved customers wait, the rest are lost sales
+        unserved = wanted - sold
+        lost = 0.5 * unserved
+        backlog = unserved - lost
+
+        # After-sales: repairs need spare parts, which are short when components are
+        spare_parts = np.clip(available.min(axis=1), 0, 1)
+        repairs = REPAIR_RATE * sold + repair_backlog
+        served = np.minimum(repairs, REPAIR_RATE * capacity[:, service_i, m] * spare_parts)
+        repair_backlog = repairs - served
+
+        series["component_supply"][:, m] = available.min(axis=1)
+        series["assembly_output"][:, m] = assembled
+        series["shipped"][:, m] = shipped
+        series["fill_rate"][:, m] = np.where(wanted > 0, sold / wanted, 1.0)
+        series["lost_sales"][:, m] = lost
+        series["repair_backlog"][:, m] = repair_backlog / REPAIR_RATE
+
+    result = MonteCarloResult(trials, crisis_duration, months, 0.0, exposure)
+    for name, values in series.items():
+        result.monthly[name] = np.percentile(values, [10, 50, 90], axis=0)
+
+    for i, (key, spec) in enumerate(nodes):
+        crisis_capacity = capacity[:, i, :crisis_duration].mean(axis=1) / spec.capacity
+        result.nodes[key] = {
+            "label": spec.label,
+            "hit_probability": float(hit[:, i].mean()),
+            "capacity_p50": float(np.percentile(crisis_capacity, 50)),
+            "capacity_p10": float(np.percentile(crisis_capacity, 10)),
+        }
+    for i, key in enumerate(COMPONENTS):
+        result.nodes[key]["bottleneck_share"] = float(bottleneck_counts[i] / (trials * months))
+
+    lost_total = series["lost_sales"].sum(axis=1)
+    crisis_fill = series["fill_rate"][:, :crisis_duration + max_lead].mean(axis=1)
+    result.summary = {
+        "lost_sales_months_p50": float(np.percentile(lost_total, 50)),
+        "lost_sales_months_p90": float(np.percentile(lost_total, 90)),
+        "fill_rate_p50": float(np.percentile(crisis_fill, 50)),
+        "fill_rate_p10": float(np.percentile(crisis_fill, 10)),
+        "prob_fill_rate_below_90": float((crisis_fill < 0.9).mean()),
+        "worst_month_p50": int(np.median(series["fill_rate"].argmin(axis=1))) + 1,
+    }
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+# -----------------------------------------------------------------------------------
+# PROMPT GROUNDING
+# -----------------------------------------------------------------------------------
+def _pct(value):
+    return f"{100 * value:.0f}%"
+
+
+def grounding_text(result, node_key=None):
+    """Numbers of the simulation relevant to one agent (``node_key``), or the overview."""
+    s = result.summary
+    lines = [
+        f"Quantitative grounding from {result.trials:,} Monte Carlo trials of a {result.crisis_duration}-month crisis "
+        "(use these figures, do not contradict them):",
+        f"- Retail fill rate during the crisis: median {_pct(s['fill_rate_p50'])}, worst 10% of trials "
+        f"{_pct(s['fill_rate_p10'])}; probability of falling below 90%: {_pct(s['prob_fill_rate_below_90'])}.",
+        f"- Lost sales: median {s['lost_sales_months_p50']:.2f} months of demand (90th percentile "
+        f"{s['lost_sales_months_p90']:.2f}); the worst month is typically month {s['worst_month_p50']}.",
+    ]
+    node = result.nodes.get(node_key)
+    if node is not None:
+        lines.append(
+            f"- {node['label']}: disrupted in {_pct(node['hit_probability'])} of trials; capacity available during "
+            f"the crisis median {_pct(node['capacity_p50'])}, worst 10% {_pct(node['capacity_p10'])}."
+        )
+        if "bottleneck_share" in node:
+            lines.append(f"- {node['label']} is the assembly bottleneck in {_pct(node['bottleneck_share'])} of trial-months.")
+    else:
+        bottlenecks = sorted(
+            (n for n in result.nodes.values() if "bottleneck_share" in n), key=lambda n: -n["bottleneck_share"]
+        )[:3]
+        lines.append("- Most frequent bottlenecks: " + ", ".join(
+            f"{n['label']} ({_pct(n['bottleneck_share'])})" for n in bottlenecks
+        ) + ".")
+        most_hit = sorted(result.nodes.values(), key=lambda n: -n["hit_probability"])[:3]
+        lines.append("- Most exposed nodes: " + ", ".join(
+            f"{n['label']} ({_pct(n['hit_probability'])} disrupted)" for n in most_hit
+        ) + ".")
+    return "\n".join(lines)
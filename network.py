@@ -0,0 +1,327 @@
+"""
+Declarative supply networks.
+
+A network is the set of agents and tasks of a simulation, in the same spec
+format as ``AGENT_SPECS`` and ``TASK_SPECS``, with the dependency edges of the
+tasks in their ``context``. The built-in Galaxy S24 Ultra network is
+``default_network()``; larger, multi-tier and multi-product networks are
+loaded from a JSON file:
+
+    {
+      "name": "Two-product network",
+      "templates": {
+        "supplier": {
+          "agent": {"role": "{name}", "goal": "Supply {component} for the {product}.",
+                    "backstory": "{name} makes {component} in {location}."},
+          "task": {"description": "{name} must keep {component} flowing ...",
+                   "expected_output": "{name} Report ...", "stage": "Tier {tier} Suppliers",
+                   "topics": ["{component}"], "kpis": true}
+        }
+      },
+      "nodes": [
+        {"key": "acme_cells", "template": "supplier", "depends_on": ["lithium_mine"],
+         "vars": {"name": "Acme Cells", "component": "battery cells", "product": "Phone X",
+                  "location": "Poland", "tier": 1}}
+      ],
+      "agents": {},
+      "tasks": {}
+    }
+
+Every node becomes one agent and one task, both keyed like the node, whose
+specs are the node's template with ``{placeholders}`` filled from ``vars``;
+the node's own ``stage``, ``topics`` and ``kpis`` override the template's, and
+``depends_on`` lists the nodes whose reports it receives. Literal ``agents``
+and ``tasks`` specs can be given as well. The Crisis Analyst, the Summary
+Agent and their tasks are taken from the built-in network unless the file
+defines them.
+
+``compile_network`` validates the specs (unknown agents and dependencies,
+duplicate roles, cycles) and computes the level of every task: the length of
+the longest dependency chain before it. The tasks of a compiled network are
+in dependency order, whatever their order in the file. The tiers of a network, its stages,
+are ordered by the first level they appear at.
+"""
+import json
+import sys
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+from agents import AGENT_SPECS
+from tasks import CRISIS_TASK, SUMMARY_TASK, TASK_SPECS
+
+
+NODE_OVERRIDES = ("stage", "topics", "kpis")
+
+
+class NetworkError(ValueError):
+    """Raised when a network file or spec is invalid."""
+
+
+@dataclass
+class SupplyNetwork:
+    name: str
+    agents: dict
+    tasks: dict
+    # {task key: length of the longest dependency chain before it}, the crisis task excluded
+    levels: dict = field(default_factory=dict)
+    compile_seconds: float = 0.0
+
+    @property
+    def edges(self):
+        return sum(len(spec.get("context", [])) for spec in self.tasks.values())
+
+    @property
+    def depth(self):
+        return max(self.levels.values(), default=-1) + 1
+
+    def tiers(self):
+        """``{stage: [task keys]}`` of the production tasks, ordered by the level each stage starts at."""
+        tiers = defaultdict(list)
+        for key in sorted(self.levels, key=self.levels.get):
+            tiers[self.tasks[key]["stage"]].append(key)
+        return dict(tiers)
+
+    def describe(self):
+        return (
+            f"{self.name}: {len(self.agents)} agents, {len(self.tasks)} tasks, {self.edges} dependencies, "
+            f"{self.depth} levels, {len(self.tiers())} tiers"
+        )
+
+
+def default_network():
+    """The built-in Galaxy S24 Ultra network of agents.py and tasks.py."""
+    return compile_network("Galaxy S24 Ultra", AGENT_SPECS, TASK_SPECS)
+
+
+# -----------------------------------------------------------------------------------
+# COMPILATION
+# -----------------------------------------------------------------------------------
+def task_levels(tasks):
+    """
+    Level of every task in ``tasks`` (``{key: spec}``), in topological order: tasks
+    without dependencies are level 0, every other task is one level after its
+    latest dependency.
+    """
+    dependants = defaultdict(list)
+    pending = {}
+    for key, spec in tasks.items():
+        deps = spec.get("context", [])
+        for dep in deps:
+            if dep not in tasks:
+                raise NetworkError(f"Task '{key}' depends on unknown task '{dep}'.")
+            dependants[dep].append(key)
+        pending[key] = len(deps)
+
+    levels = {}
+    ready = deque(key for key, count in pending.items() if count == 0)
+    for key in ready:
+        levels[key] = 0
+    while ready:
+        key = ready.popleft()
+        for child in dependants[key]:
+            levels[child] = max(levels.get(child, 0), levels[key] + 1)
+            pending[child] -= 1
+            if pending[child] == 0:
+                ready.append(child)
+    if len(levels) < len(tasks) or any(pending.values()):
+        cyclic = sorted(key for key, count in pending.items() if count)
+        raise NetworkError(f"Dependency cycle between tasks: {', '.join(cyclic)}")
+    return {key: levels[key] for key in sorted(levels, key=levels.get)}
+
+
+def compile_network(name, agents, tasks):
+    """Validate agent and task specs and return the ``SupplyNetwork`` they describe."""
+    started = time.perf_counter()
+    for key in (CRISIS_TASK, SUMMARY_TASK):
+        if key not in tasks:
+            raise NetworkError(f"The network has no '{key}' task.")
+    roles = {}
+    for key, spec in agents.items():
+        for required in ("role", "goal", "backstory"):
+            if not spec.get(required):
+                raise NetworkError(f"Agent '{key}' has no {required}.")
+        if spec["role"] in roles:
+            raise NetworkError(f"Agents '{roles[spec['role']]}' and '{key}' have the same role '{spec['role']}'.")
+        roles[spec["role"]] = key
+    used = set()
+    for key, spec in tasks.items():
+        for required in ("description", "expected_output", "agent", "stage"):
+            if not spec.get(required):
+                raise NetworkError(f"Task '{key}' has no {required}.")
+        if spec["agent"] not in agents:
+            raise NetworkError(f"Task '{key}' is assigned to unknown agent '{spec['agent']}'.")
+        if spec["agent"] in used:
+            raise NetworkError(f"Agent '{spec['agent']}' is assigned to more than one task.")
+        used.add(spec["agent"])
+        if key in (CRISIS_TASK, SUMMARY_TASK) and spec.get("context"):
+            raise NetworkError(f"Task '{key}' cannot depend on other tasks.")
+
+    production = {key: spec for key, spec in tasks.items() if key not in (CRISIS_TASK, SUMMARY_TASK)}
+    levels = task_levels(production)
+    # Tasks are built in this order, so every task comes after the tasks it depends on, and the
+    # summary after every production task
+    tasks = {
+        CRISIS_TASK: tasks[CRISIS_TASK],
+        **{key: production[key] for key in levels},
+        SUMMARY_TASK: tasks[SUMMARY_TASK],
+    }
+    network = SupplyNetwork(name, agents, tasks, levels=levels)
+    network.compile_seconds = time.perf_counter() - started
+    return network
+
+
+# -----------------------------------------------------------------------------------
+# NETWORK FILES
+# -----------------------------------------------------------------------------------
+def _fill(value, variables, node):
+    """Format every string of a template value with the node's variables."""
+    if isinstance(value, str):
+        try:
+            return value.format_map(variables)
+        except KeyError as exc:
+            raise NetworkError(f"Node '{node}' has no value for {exc} in its template.") from None
+    if isinstance(value, list):
+        return [_fill(item, variables, node) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, variables, node) for key, item in value.items()}
+    return value
+
+
+def expand_nodes(data):
+    """``(agents, tasks)`` specs of the ``nodes`` of a network file, rendered from their templates."""
+    templates = data.get("templates", {})
+    agents, tasks = {}, {}
+    for node in data.get("nodes", []):
+        key = node.get("key")
+        if not key:
+            raise NetworkError("Every node needs a 'key'.")
+        if key in agents:
+            raise NetworkError(f"Duplicate node '{key}'.")
+        template = templates.get(node.get("template"))
+        if template is None:
+            raise NetworkError(f"Node '{key}' uses unknown template '{node.get('template')}'.")
+        variables = {"key": key, **node.get("vars", {})}
+        agents[key] = _fill(template.get("agent", {}), variables, key)
+        task = _fill(template.get("task", {}), variables, key)
+        task.update({name: node[name] for name in NODE_OVERRIDES if name in node})
+        task["agent"] = key
+        if node.get("depends_on"):
+            task["context"] = list(node["depends_on"])
+        tasks[key] = task
+    return agents, tasks
+
+
+def parse_network(data):
+    """Compile the dict of a network file into a ``SupplyNetwork``."""
+    node_agents, node_tasks = expand_nodes(data)
+    agents = {
+        key: spec for key, spec in AGENT_SPECS.items()
+        if key in (TASK_SPECS[CRISIS_TASK]["agent"], TASK_SPECS[SUMMARY_TASK]["agent"])
+    }
+    tasks = {CRISIS_TASK: TASK_SPECS[CRISIS_TASK]}
+    agents.update(data.get("agents", {}))
+    agents.update(node_agents)
+    tasks.update(data.get("tasks", {}))
+    tasks.update(node_tasks)
+    tasks.setdefault(SUMMARY_TASK, TASK_SPECS[SUMMARY_TASK])
+    return compile_network(data.get("name", "Supply network"), agents, tasks)
+
+
+def load_network(path):
+    """Load and compile a JSON network file."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as exc:
+        raise NetworkError(f"{path}: {exc}") from None
+    return parse_network(data)
+
+
+# -----------------------------------------------------------------------------------
+# SYNTHETIC NETWORKS (BENCHMARKS AND EXAMPLES)
+# -----------------------------------------------------------------------------------
+SYNTHETIC_TEMPLATE = {
+    "agent": {
+        "role": "{name}",
+        "goal": "Supply {component} for the {product}.",
+        "backstory": "{name} is a tier {tier} supplier of {component} for the {product}, based in {location}.",
+    },
+    "task": {
+        "description": (
+            "{name} must keep its {component} flowing to the {product} line during the crisis.\n\n"
+            "- Assess the current crisis context based on the report provided by crisis_analyst.\n"
+            "- Review the reports of its own suppliers and report shortages, delays and the solutions adopted."
+        ),
+        "expected_output": (
+            "{name} Report – {product}\n\n"
+            "- Key KPIs, challenges encountered and solutions adopted."
+        ),
+        "stage": "Tier {tier} Suppliers",
+        "topics": ["{component}", "{location}"],
+        "kpis": True,
+    },
+}
+
+_COMPONENTS = ("chipset", "display", "battery", "memory", "camera", "pcb", "casing", "glass", "modem", "speaker")
+_LOCATIONS = ("Taiwan", "Korea", "Japan", "Vietnam", "China", "Germany", "Mexico", "India")
+
+
+def synthetic_network(nodes, products=2, tiers=3, fan_in=3):
+    """
+    Network file dict of ``nodes`` suppliers split over ``products`` and ``tiers``;
+    every supplier of a tier above the raw-material tier depends on ``fan_in``
+    suppliers of the tier below it for the same product.
+    """
+    per_product = max(1, nodes // products)
+    data = {"name": f"Synthetic network of {nodes} suppliers", "templates": {"supplier": SYNTHETIC_TEMPLATE}, "nodes": []}
+    for p in range(products):
+        product = f"Product {p + 1}"
+        count = per_product if p < products - 1 else nodes - per_product * (products - 1)
+        # Tier `tiers` (raw materials) is the largest, tier 1 (final component suppliers) the smallest
+        sizes = [max(1, count * (t + 1) // sum(range(1, tiers + 1))) for t in range(tiers)]
+        sizes[-1] += count - sum(sizes)
+        previous = []
+        for t in range(tiers, 0, -1):
+            current = []
+            for i in range(sizes[t - 1]):
+                key = f"p{p + 1}_t{t}_{i}"
+                node = {
+                    "key": key,
+                    "template": "supplier",
+                    "vars": {
+                        "name": f"{product} Tier {t} Supplier {i + 1}",
+                        "component": _COMPONENTS[i % len(_COMPONENTS)],
+                        "product": product,
+                        "location": _LOCATIONS[(i + t) % len(_LOCATIONS)],
+                        "tier": t,
+                    },
+                }
+                if previous:
+                    node["depends_on"] = [previous[(i * fan_in + j) % len(previous)] for j in range(min(fan_in, len(previous)))]
+                data["nodes"].append(node)
+                current.append(key)
+            previous = current
+    return data
+
+
+def main(argv=None):
+    """``python network.py validate PATH`` or ``python network.py synthetic NODES PATH``."""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 2 and argv[0] == "validate":
+        network = load_network(argv[1])
+        print(network.describe())
+        for stage, keys in network.tiers().items():
+            print(f"  {stage}: {len(keys)} task(s)")
+        return 0
+    if len(argv) == 3 and argv[0] == "synthetic":
+        with open(argv[2], "w", encoding="utf-8") as f:
+            json.dump(synthetic_network(int(argv[1])), f, indent=2)
+        print(parse_network(synthetic_network(int(argv[1]))).describe())
+        return 0
+    print(main.__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import streamlit as st
+import time
+import plotly.express as px
+from kpis import KPI_FIELDS
+from run_archive import DEFAULT_ARCHIVE_DIR, get_run_archive
+
+
+# -----------------------------------------------------------------------------------
+# 1. PAGE CONFIGURATION
+# -----------------------------------------------------------------------------------
+st.set_page_config(page_title="Run Analytics", layout="wide")
+
+# Same archive as the simulator page (see run_archive.py)
+archive_dir = st.secrets.get("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+st.markdown("<h1 style='text-align:center; color:#4A90E2;'>📊 Run Analytics</h1>", unsafe_allow_html=True)
+
+if not archive_dir:
+    st.info("The run archive is disabled: set ARCHIVE_DIR in the Streamlit secrets to collect finished runs.")
+    st.stop()
+
+run_archive = get_run_archive(archive_dir)
+
+# -----------------------------------------------------------------------------------
+# 2. FILTERS
+# -----------------------------------------------------------------------------------
+col_durations, col_dates, col_kpi = st.columns([2, 1, 1])
+with col_durations:
+    durations = st.multiselect("Crisis durations (months)", list(range(1, 13)), placeholder="All durations")
+with col_dates:
+    dates = st.date_input("Run dates", value=())
+with col_kpi:
+    kpi_name = st.selectbox(
+        "KPI",
+        list(KPI_FIELDS),
+        format_func=lambda name: f"{KPI_FIELDS[name][0]} ({KPI_FIELDS[name][1]})",
+    )
+kpi_label = f"{KPI_FIELDS[kpi_name][0]} ({KPI_FIELDS[kpi_name][1]})"
+
+# -----------------------------------------------------------------------------------
+# 3. LOAD (ONLY THE COLUMNS THE CHARTS USE)
+# -----------------------------------------------------------------------------------
+# Durations and dates are partition columns, so filtering on them skips whole directories,
+# and the agents' reports are never read.
+columns = ["run_id", "run_date", "crisis_duration", "wall_time", "agent", "duration_s", "status", kpi_name]
+started = time.perf_counter()
+df = run_archive.load(
+    columns,
+    crisis_durations=durations or None,
+    since=dates[0] if len(dates) > 0 else None,
+    until=dates[-1] if len(dates) > 1 else None,
+)
+load_seconds = time.perf_counter() - started
+
+if df.empty:
+    st.info("No archived runs match these filters: every finished simulation is appended to the archive.")
+    st.stop()
+
+runs = df.drop_duplicates("run_id")
+stats = run_archive.stats()
+st.caption(
+    f"{len(runs)} runs, {len(df)} task rows, {len(columns)} columns loaded in {1000 * load_seconds:.0f} ms "
+    f"from {stats['files']} files ({stats['bytes'] / 1e6:.1f} MB) in {stats['partitions']} partitions."
+)
+
+# -----------------------------------------------------------------------------------
+# 4. RUNS
+# -----------------------------------------------------------------------------------
+col_left, col_right = st.columns(2)
+with col_left:
+    per_day = runs.groupby(["run_date", "crisis_duration"], as_index=False).size()
+    st.plotly_chart(
+        px.bar(
+            per_day, x="run_date", y="size", color="crisis_duration",
+            labels={"run_date": "Run date", "size": "Runs", "crisis_duration": "Crisis duration (months)"},
+            title="Runs per day",
+        ),
+        use_container_width=True,
+    )
+with col_right:
+    st.plotly_chart(
+        px.box(
+            runs, x="crisis_duration", y="wall_time",
+            labels={"crisis_duration": "Crisis duration (months)", "wall_time": "Wall time (s)"},
+            title="Run wall time by crisis duration",
+        ),
+        use_container_width=True,
+    )
+
+# -----------------------------------------------------------------------------------
+# 5. AGENTS
+# -----------------------------------------------------------------------------------
+col_left, col_right = st.columns(2)
+with col_left:
+    st.plotly_chart(
+        px.box(
+            df, x="agent", y="duration_s",
+            labels={"agent": "Agent", "duration_s": "Task duration (s)"},
+            title="Task duration by agent",
+        ),
+        use_container_width=True,
+    )
+with col_right:
+    st.plotly_chart(
+        px.histogram(
+            df, x="agent", color="status", labels={"agent": "Agent"}, title="Task status by agent",
+        ),
+        use_container_width=True,
+    )
+
+# -----------------------------------------------------------------------------------
+# 6. KPI TRENDS
+# -----------------------------------------------------------------------------------
+reported = df.dropna(subset=[kpi_name])
+if reported.empty:
+    st.info(f"No {kpi_label} figures in the selected runs.")
+else:
+    trend = reported.groupby(["run_date", "agent"], as_index=False)[kpi_name].mean()
+    st.plotly_chart(
+        px.line(
+            trend, x="run_date", y=kpi_name, color="agent", markers=True,
+            labels={"run_date": "Run date", kpi_name: kpi_label},
+            title=f"Mean {kpi_label} per day",
+        ),
+        use_container_width=True,
+    )
+    by_duration = reported.groupby(["agent", "crisis_duration"], as_index=False)[kpi_name].mean()
+    heatmap = by_duration.pivot_table(index="agent", columns="crisis_duration", values=kpi_name)
+    st.plotly_chart(
+        px.imshow(
+            heatmap, aspect="auto", color_continuous_scale="RdYlGn",
+            labels={"x": "Crisis duration (months)", "y": "Agent", "color": kpi_label},
+        ),
+        use_container_width=True,
+    )
@@ -0,0 +1,47 @@
+"""
+Stable-prefix prompt assembly.
+
+Providers with prompt caching (OpenAI caches prompts of 1024 tokens and more)
+only reuse the longest prefix that is byte-identical to an earlier request.
+CrewAI opens every prompt with the agent's static content (role, dedented
+backstory, goal and answer format), so the task text is laid out to extend
+that prefix: the static description and expected output of each template are
+compiled once into a fixed string, and everything that changes between runs
+(the crisis inputs, the Monte Carlo figures, the crisis context and the
+summary extracts) is appended after it, followed by CrewAI's own context
+section.
+"""
+from functools import lru_cache
+
+from crewai import Task
+from crewai.utilities import I18N
+
+
+RUN_INPUTS_TEMPLATE = """Run Inputs:
+- Crisis Details: '{crisis_detail}'
+- Crisis Duration: {crisis_duration} months"""
+
+
+@lru_cache(maxsize=None)
+def compile_prefix(description, expected_output):
+    """The static part of a task prompt, identical byte for byte on every run."""
+    expected = I18N().slice("expected_output").format(expected_output=expected_output)
+    return f"{description}\n{expected}"
+
+
+def run_inputs(crisis_detail, crisis_duration):
+    return RUN_INPUTS_TEMPLATE.format(crisis_detail=crisis_detail, crisis_duration=crisis_duration)
+
+
+class CompiledTask(Task):
+    """``Task`` whose prompt is its compiled static prefix followed by the run-specific inputs."""
+
+    prefix: str = ""
+    inputs: str = ""
+
+    def add_input(self, title, text):
+        """Append a run-specific section after everything added so far."""
+        self.inputs += f"\n\n{title}:\n{text}" if title else f"\n\n{text}"
+
+    def prompt(self):
+        return self.prefix + self.inputs
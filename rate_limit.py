@@ -0,0 +1,264 @@
+"""
+Provider rate limiting for the shared OpenAI client.
+
+Every agent of every session goes through the one ``ChatOpenAI`` client owned
+by the registry. ``RateLimiter`` puts shared backpressure in front of it: two
+token buckets (requests per minute and tokens per minute) that calls wait on
+before they are sent, and retries with jittered exponential backoff on 429
+and 5xx responses. A 429 empties the request bucket, so every waiting caller
+slows down together instead of hammering the provider with retries.
+
+``RateLimitedChatOpenAI`` is the ``ChatOpenAI`` subclass that routes its calls
+through the limiter over a pooled keep-alive HTTP connection. It also asks
+for the usage block of streamed responses, so the limiter and the metrics see
+the actual token counts, including the prompt tokens served from the
+provider's prompt cache.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import openai
+from langchain.chat_models import ChatOpenAI
+
+from metrics import register_gauges
+from tokens import count_tokens
+
+
+# gpt-4o-mini limits of a tier 1 OpenAI account
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_MAX_RETRIES = 6
+# Completion tokens reserved per request until the actual usage is known
+DEFAULT_COMPLETION_RESERVE = 800
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate`` units per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount):
+        """Take ``amount`` units and return how long the caller must wait before using them."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def drain(self, seconds=0.0):
+        """Empty the bucket and push it ``seconds`` into debt (used when the provider answers 429)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+@dataclass
+class RateLimitStats:
+    requests: int = 0
+    queued: int = 0
+    max_queued: int = 0
+    throttled_seconds: float = 0.0
+    retries: int = 0
+    rate_limited: int = 0
+    failures: int = 0
+
+
+def retry_after(exc):
+    """Seconds requested by the provider's ``Retry-After`` header, if any."""
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc):
+    if isinstance(exc, openai.APIConnectionError):
+        return True
+    return getattr(exc, "status_code", None) in RETRY_STATUS_CODES
+
+
+# -----------------------------------------------------------------------------------
+# RATE LIMITER
+# -----------------------------------------------------------------------------------
+class RateLimiter:
+    """Shared requests/tokens-per-minute throttle with retries for every LLM call."""
+
+    def __init__(
+        self,
+        requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+        max_retries=DEFAULT_MAX_RETRIES,
+        base_delay=1.0,
+        max_delay=60.0,
+        completion_reserve=DEFAULT_COMPLETION_RESERVE,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+    ):
+        self.requests = TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 60.0))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 6.0)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_reserve = completion_reserve
+        self.max_connections = max_connections
+        self._stats = RateLimitStats()
+        self._lock = threading.Lock()
+        register_gauges(self.gauges)
+
+    def backoff(self, attempt, exc):
+        """Full-jitter exponential backoff, never shorter than the provider's ``Retry-After``."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after(exc) or 0.0)
+
+    def _wait(self, token_estimate):
+        wait = max(self.requests.reserve(1), self.tokens.reserve(token_estimate))
+        if wait <= 0:
+            return
+        with self._lock:
+            self._stats.queued += 1
+            self._stats.max_queued = max(self._stats.max_queued, self._stats.queued)
+            self._stats.throttled_seconds += wait
+        try:
+            time.sleep(wait)
+        finally:
+            with self._lock:
+                self._stats.queued -= 1
+
+    def call(self, fn, prompt_tokens):
+        """Run ``fn`` (one provider request for ``prompt_tokens`` prompt tokens) within the limits."""
+        token_estimate = prompt_tokens + self.completion_reserve
+        for attempt in range(self.max_retries + 1):
+            self._wait(token_estimate)
+            with self._lock:
+                self._stats.requests += 1
+            try:
+                result = fn()
+            except Exception as exc:
+                # A rejected request consumed no tokens
+                self.tokens.refund(token_estimate)
+                if not is_retryable(exc) or attempt == self.max_retries:
+                    with self._lock:
+                        self._stats.failures += 1
+                    raise
+                delay = self.backoff(attempt, exc)
+                with self._lock:
+                    self._stats.retries += 1
+                    if getattr(exc, "status_code", None) == 429:
+                        self._stats.rate_limited += 1
+                if getattr(exc, "status_code", None) == 429:
+                    self.requests.drain(delay)
+                time.sleep(delay)
+                continue
+            usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+            if usage.get("total_tokens"):
+                # Give back (or take) the difference between the reservation and the actual usage
+                self.tokens.refund(token_estimate - usage["total_tokens"])
+            return result
+
+    def stats(self):
+        with self._lock:
+            return RateLimitStats(**vars(self._stats))
+
+    def gauges(self):
+        stats = self.stats()
+        return {
+            "simulator_llm_queue_depth": stats.queued,
+            "simulator_llm_max_queue_depth": stats.max_queued,
+            "simulator_llm_throttled_seconds": stats.throttled_seconds,
+            "simulator_llm_retries": stats.retries,
+            "simulator_llm_rate_limited": stats.rate_limited,
+        }
+
+
+# -----------------------------------------------------------------------------------
+# CHAT MODEL
+# -----------------------------------------------------------------------------------
+_stream_usage = threading.local()
+
+
+def pooled_http_client(max_connections=DEFAULT_MAX_CONNECTIONS, timeout=120.0):
+    """Keep-alive HTTP client shared by every request of the LLM client."""
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.Client(limits=limits, timeout=timeout)
+
+
+class RateLimitedChatOpenAI(ChatOpenAI):
+    """``ChatOpenAI`` whose requests wait for ``request_limiter`` and are retried by it."""
+
+    # Not ``rate_limiter``: LangChain's own field of that name expects a ``BaseRateLimiter``
+    # and is acquired before every uncached call
+    request_limiter: Any = None
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.request_limiter is None:
+            return self._generate_with_usage(messages, stop, run_manager, **kwargs)
+        prompt_tokens = sum(count_tokens(str(m.content), self.model_name) for m in messages)
+        return self.request_limiter.call(
+            lambda: self._generate_with_usage(messages, stop, run_manager, **kwargs),
+            prompt_tokens,
+        )
+
+    def _generate_with_usage(self, messages, stop, run_manager, **kwargs):
+        _stream_usage.value = None
+        result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        # Streamed results have no llm_output; fill it in from the usage chunk
+        if not result.llm_output and _stream_usage.value:
+            result.llm_output = {"token_usage": _stream_usage.value, "model_name": self.model_name}
+        return result
+
+    def completion_with_retry(self, run_manager=None, **kwargs):
+        if not kwargs.get("stream"):
+            return super().completion_with_retry(run_manager=run_manager, **kwargs)
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        return _recording_usage(super().completion_with_retry(run_manager=run_manager, **kwargs))
+
+
+def _recording_usage(chunks):
+    """Pass the stream through, keeping the usage of its final chunk for ``_generate_with_usage``."""
+    for chunk in chunks:
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            _stream_usage.value = usage.model_dump() if hasattr(usage, "model_dump") else dict(usage)
+        yield chunk
+
+
+def build_rate_limited_llm(model, temperature, rate_limiter, **kwargs):
+    """Build the shared chat model; the limiter owns retries, so the OpenAI client's own are disabled."""
+    # The pooled client is given to the synchronous OpenAI client only: passed as ``http_client``,
+    # LangChain would also hand it to the asynchronous client, which rejects it
+    client = openai.OpenAI(
+        api_key=kwargs.get("openai_api_key"),
+        base_url=kwargs.get("openai_api_base"),
+        http_client=pooled_http_client(rate_limiter.max_connections),
+        max_retries=0,
+    )
+    return RateLimitedChatOpenAI(
+        model_name=model,
+        temperature=temperature,
+        request_limiter=rate_limiter,
+        client=client.chat.completions,
+        max_retries=0,
+        **kwargs,
+    )
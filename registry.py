@@ -0,0 +1,271 @@
+"""
+Process-wide registry of the LLM client and the agent catalog.
+
+Streamlit re-executes the app script on every widget interaction, but imported
+modules stay loaded for the lifetime of the server process. The registry keeps
+the ``ChatOpenAI`` clients and the ``Agent`` objects of the supply network
+here (the twelve built-in agents unless a network file is loaded, see
+network.py), builds them once on first use, and hands every run its own
+freshly rendered tasks. With a ``RoutingConfig``, each agent uses the model of
+its tier (see model_routing.py).
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+from langchain.chat_models import ChatOpenAI
+
+from agents import build_agents
+from deadline import CancellationHandler
+from llm_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, LLMResponseCache
+from metrics import MetricsCallbackHandler
+from model_routing import (
+    DEFAULT_COOLDOWN_S, DEFAULT_LATENCY_THRESHOLD_S, DEFAULT_MODELS, LatencyRouter, RoutedChatModel, RoutingConfig,
+)
+from network import default_network, load_network
+from rate_limit import (
+    DEFAULT_MAX_CONNECTIONS, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, RateLimiter, build_rate_limited_llm,
+)
+from semantic_cache import DEFAULT_CRISIS_CACHE_PATH, DEFAULT_SIMILARITY_THRESHOLD, CrisisAnalysisCache
+from semantic_cache import DEFAULT_MAX_ENTRIES as DEFAULT_CRISIS_CACHE_ENTRIES
+from streaming import TokenStreamHandler
+from task_memo import DEFAULT_TASK_MEMO_PATH, TaskMemo
+from tasks import build_tasks
+
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.7
+
+
+@dataclass
+class SetupTimings:
+    llm_seconds: float = 0.0
+    agents_seconds: float = 0.0
+    built_at: float = field(default_factory=time.time)
+    runs_served: int = 0
+    last_tasks_seconds: float = 0.0
+    network_seconds: float = 0.0
+
+    @property
+    def total_seconds(self):
+        return self.network_seconds + self.llm_seconds + self.agents_seconds
+
+
+class AgentRegistry:
+    """Owns the shared LLM clients and agent catalog; renders per-run tasks."""
+
+    def __init__(
+        self,
+        model=DEFAULT_MODEL,
+        temperature=DEFAULT_TEMPERATURE,
+        llm_cache=None,
+        rate_limiter=None,
+        task_memo=None,
+        llm=None,
+        routing=None,
+        llms=None,
+        network=None,
+        crisis_cache=None,
+        **agent_overrides,
+    ):
+        """
+        ``llm`` replaces the OpenAI client (the benchmark passes a ``FakeChatModel``);
+        the streaming and metrics handlers are attached to it either way.
+        With a ``routing`` config, every agent uses the model of its tier instead, falling
+        back to another tier while that model is slow; ``llms`` replaces the OpenAI clients
+        of the tiers it names (``{tier: chat model}``).
+        ``network`` is the ``SupplyNetwork`` to simulate (the built-in one by default).
+        ``task_memo`` lets runs reuse task outputs whose inputs are unchanged, and
+        ``crisis_cache`` the crisis analyses of similarly worded crises.
+        ``agent_overrides`` are forwarded to ``build_agents``.
+        """
+        self.timings = SetupTimings()
+        self.llm_cache = llm_cache
+        self.rate_limiter = rate_limiter
+        self.task_memo = task_memo
+        self.crisis_cache = crisis_cache
+        self.temperature = temperature
+        self.routing = routing
+        self.router = None
+        self.network = network or default_network()
+        self.timings.network_seconds = self.network.compile_seconds
+
+        started = time.perf_counter()
+        agent_llms = {}
+        if routing is None:
+            self.llm = self._instrument(llm or self._openai_client(model))
+        else:
+            clients = {
+                tier: (llms or {}).get(tier) or self._openai_client(tier_model)
+                for tier, tier_model in routing.models.items()
+            }
+            self.router = LatencyRouter(routing.latency_threshold_s, routing.cooldown_s)
+            tier_llms = {
+                tier: self._instrument(RoutedChatModel(
+                    primary=client,
+                    fallback=clients.get(routing.fallbacks.get(tier)),
+                    router=self.router,
+                ))
+                for tier, client in clients.items()
+            }
+            self.llm = tier_llms[routing.default_tier]
+            agent_llms = {key: tier_llms[routing.tier_for(key)] for key in self.network.agents}
+        self.timings.llm_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.agents = build_agents(self.llm, agent_llms, self.network.agents, **agent_overrides)
+        self.timings.agents_seconds = time.perf_counter() - started
+
+    def _openai_client(self, model):
+        llm_settings = dict(
+            cache=self.llm_cache.view(model, self.temperature) if self.llm_cache is not None else None,
+            streaming=True,
+        )
+        if self.rate_limiter is not None:
+            return build_rate_limited_llm(model, self.temperature, self.rate_limiter, **llm_settings)
+        return ChatOpenAI(model_name=model, temperature=self.temperature, **llm_settings)
+
+    def _instrument(self, llm):
+        """Attach the token streaming, metrics and cancellation handlers to a client the agents call."""
+        model = getattr(llm, "model_name", DEFAULT_MODEL)
+        llm.callbacks = list(llm.callbacks or []) + [
+            TokenStreamHandler(), MetricsCallbackHandler(model), CancellationHandler(),
+        ]
+        return llm
+
+    def agent_models(self):
+        """``{role: model name}`` of every agent, the fallback model in parentheses when it has one."""
+        models = {}
+        for agent in self.agents.values():
+            llm = agent.llm
+            fallback = getattr(llm, "fallback", None)
+            name = getattr(llm, "model_name", type(llm).__name__)
+            models[agent.role] = f"{name} ({fallback.model_name})" if fallback is not None else name
+        return models
+
+    def new_run(self, crisis_detail, crisis_duration):
+        """Return fresh ``SimulationTasks`` for one run, bound to copies of the shared agents."""
+        started = time.perf_counter()
+        # CrewAI sets an agent's crew and executor on every kickoff, so runs executing at the same
+        # time must not share agent objects; the copies still share the LLM clients
+        agents = {key: agent.model_copy() for key, agent in self.agents.items()}
+        run_tasks = build_tasks(agents, crisis_detail, crisis_duration, self.network.tasks, self.network.levels)
+        self.timings.last_tasks_seconds = time.perf_counter() - started
+        self.timings.runs_served += 1
+        return run_tasks
+
+
+def registry_settings(secrets):
+    """
+    ``get_registry`` arguments from the app's Streamlit secrets (any mapping), so the
+    app and the batch runner build the same registry.
+    """
+    # Persistent LLM response cache. Set LLM_CACHE_PATH to "" to disable it, or
+    # LLM_CACHE_REPLAY_ONLY to fail on any prompt that has not been cached before.
+    llm_cache_path = secrets.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+    llm_cache_settings = dict(
+        max_entries=int(secrets.get("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        ttl_seconds=float(secrets.get("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        replay_only=bool(secrets.get("LLM_CACHE_REPLAY_ONLY", False)),
+    )
+
+    # Provider limits shared by every agent of every session: calls wait for their share of
+    # OPENAI_RPM / OPENAI_TPM and are retried with backoff on 429 and 5xx responses.
+    rate_limits = dict(
+        requests_per_minute=float(secrets.get("OPENAI_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+        tokens_per_minute=float(secrets.get("OPENAI_TPM", DEFAULT_TOKENS_PER_MINUTE)),
+        max_connections=int(secrets.get("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+    )
+
+    # Task outputs are memoized in TASK_MEMO_PATH by their exact inputs, so re-running a scenario
+    # only runs the agents whose inputs changed. Set TASK_MEMO_PATH to "" to disable it.
+    task_memo_path = secrets.get("TASK_MEMO_PATH", DEFAULT_TASK_MEMO_PATH)
+
+    # Crisis analyses are also kept in CRISIS_CACHE_PATH, keyed by the wording of the crisis:
+    # a crisis of the same duration at least CRISIS_CACHE_SIMILARITY similar (0-1) to one analysed
+    # before can reuse its analysis. At most CRISIS_CACHE_MAX_ENTRIES analyses are kept, least
+    # recently used evicted first. Set CRISIS_CACHE_PATH to "" to disable it.
+    crisis_cache_path = secrets.get("CRISIS_CACHE_PATH", DEFAULT_CRISIS_CACHE_PATH)
+    crisis_cache_settings = None
+    if crisis_cache_path:
+        crisis_cache_settings = dict(
+            path=crisis_cache_path,
+            similarity_threshold=float(secrets.get("CRISIS_CACHE_SIMILARITY", DEFAULT_SIMILARITY_THRESHOLD)),
+            max_entries=int(secrets.get("CRISIS_CACHE_MAX_ENTRIES", DEFAULT_CRISIS_CACHE_ENTRIES)),
+        )
+
+    # The suppliers and logistics agents run on MODEL_FAST, the Crisis Analyst and the Summary
+    # Agent on MODEL_STRONG. While MODEL_STRONG averages more than MODEL_FALLBACK_LATENCY_S per
+    # call, its calls go to MODEL_FAST for MODEL_FALLBACK_COOLDOWN_S. Set MODEL_ROUTING to false
+    # to run every agent on MODEL_FAST.
+    routing = None
+    if secrets.get("MODEL_ROUTING", True):
+        routing = RoutingConfig(
+            models={
+                "fast": secrets.get("MODEL_FAST", DEFAULT_MODELS["fast"]),
+                "strong": secrets.get("MODEL_STRONG", DEFAULT_MODELS["strong"]),
+            },
+            latency_threshold_s=float(secrets.get("MODEL_FALLBACK_LATENCY_S", DEFAULT_LATENCY_THRESHOLD_S)),
+            cooldown_s=float(secrets.get("MODEL_FALLBACK_COOLDOWN_S", DEFAULT_COOLDOWN_S)),
+        )
+
+    # NETWORK_PATH is a JSON supply network file (see network.py) to simulate instead of the
+    # built-in Galaxy S24 Ultra network.
+    network_path = secrets.get("NETWORK_PATH")
+
+    return dict(
+        llm_cache_path=llm_cache_path,
+        rate_limits=rate_limits,
+        task_memo_path=task_memo_path,
+        routing=routing,
+        network_path=network_path,
+        crisis_cache_settings=crisis_cache_settings,
+        **llm_cache_settings,
+    )
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(
+    llm_cache_path=None,
+    rate_limits=None,
+    task_memo_path=None,
+    routing=None,
+    network_path=None,
+    crisis_cache_settings=None,
+    **cache_settings,
+):
+    """
+    Return the process-wide ``AgentRegistry``, building it on first call.
+
+    When ``llm_cache_path`` is given, every LLM response is cached in that
+    SQLite file; ``cache_settings`` are forwarded to ``LLMResponseCache``.
+    ``rate_limits`` are forwarded to the ``RateLimiter`` shared by every call
+    (``None`` disables it). When ``task_memo_path`` is given, task outputs are
+    memoized there for incremental re-simulation. ``routing`` is a
+    ``RoutingConfig`` assigning models to agents (``None`` runs every agent on
+    the default model). ``network_path`` is a network file to simulate instead
+    of the built-in network. ``crisis_cache_settings`` are forwarded to the
+    ``CrisisAnalysisCache`` of crisis analyses (``None`` disables it). Arguments
+    are only used by the call that builds the registry.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                llm_cache = LLMResponseCache(llm_cache_path, **cache_settings) if llm_cache_path else None
+                rate_limiter = RateLimiter(**rate_limits) if rate_limits is not None else None
+                task_memo = TaskMemo(task_memo_path) if task_memo_path else None
+                network = load_network(network_path) if network_path else None
+                crisis_cache = CrisisAnalysisCache(**crisis_cache_settings) if crisis_cache_settings is not None else None
+                _registry = AgentRegistry(
+                    llm_cache=llm_cache,
+                    rate_limiter=rate_limiter,
+                    task_memo=task_memo,
+                    routing=routing,
+                    network=network,
+                    crisis_cache=crisis_cache,
+                )
+    return _registry
@@ -0,0 +1,322 @@
+"""
+Columnar archive of finished simulation runs for analytics.
+
+The ``RunStore`` keeps runs row by row for reopening them one at a time; the
+archive keeps the same runs as Parquet files, one row per task with the run's
+inputs and timings, the task's output and its KPI figures as columns, hive-
+partitioned by run date and crisis duration:
+
+    .cache/archive/run_date=2026-10-17/crisis_duration=3/run-<run id>.parquet
+
+Each finished run is appended as its own file, and once a partition holds
+``compact_every`` of them they are merged into one larger file, so opening an
+archive of thousands of runs touches a few files per partition. ``load`` reads
+the archive memory-mapped and only decodes the columns it is asked for, with
+filters on the partition columns skipping whole directories: analytics over
+durations and KPIs never read the agents' reports.
+
+    python run_archive.py synthetic 10000 /tmp/archive   # build a test archive
+    python run_archive.py open /tmp/archive              # time opening it
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from functools import partial
+
+from kpis import KPI_FIELDS
+
+
+DEFAULT_ARCHIVE_DIR = os.path.join(".cache", "archive")
+# A partition's single-run files are merged into one file once there are this many
+DEFAULT_COMPACT_EVERY = 64
+
+PARTITION_COLUMNS = ("run_date", "crisis_duration")
+TASK_COLUMNS = ("position", "agent", "stage", "output", "duration_s", "stage_wall_s", "status", "reused", "error")
+RUN_FRAME_COLUMNS = ("run_id", "created_at", "wall_time", "summary_input_tokens", "raw_report_tokens", *PARTITION_COLUMNS)
+# What the analytics page reads by default: everything but the texts
+ANALYTICS_COLUMNS = (
+    "run_id", "created_at", "wall_time", "agent", "stage", "duration_s", "stage_wall_s", "status", "reused",
+    *KPI_FIELDS, *PARTITION_COLUMNS,
+)
+
+RUN_FILE_PREFIX = "run-"
+COMPACTED_FILE_PREFIX = "part-"
+
+
+def file_schema():
+    """Arrow schema of the archive files; the partition columns live in the directory names."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("run_id", pa.string()),
+            ("created_at", pa.float64()),
+            ("crisis_detail", pa.string()),
+            ("wall_time", pa.float64()),
+            ("summary_input_tokens", pa.int64()),
+            ("raw_report_tokens", pa.int64()),
+            ("position", pa.int32()),
+            ("agent", pa.string()),
+            ("stage", pa.string()),
+            ("output", pa.string()),
+            ("duration_s", pa.float64()),
+            ("stage_wall_s", pa.float64()),
+            ("status", pa.string()),
+            ("reused", pa.bool_()),
+            ("error", pa.string()),
+        ]
+        + [(name, pa.float64()) for name in KPI_FIELDS]
+    )
+
+
+def partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([("run_date", pa.string()), ("crisis_duration", pa.int32())]), flavor="hive")
+
+
+def _write_table(table, path):
+    """Write ``table`` to ``path`` atomically: readers skip the hidden temporary file until it is renamed."""
+    import pyarrow.parquet as pq
+
+    directory, name = os.path.split(path)
+    temporary = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(table, temporary)
+    os.replace(temporary, path)
+
+
+def run_rows(result, created_at=None):
+    """Archive rows of a ``SimulationResult``: one per task, partition columns included."""
+    stage_times = result.stage_wall_times()
+    run = {
+        "run_id": result.metrics.run_id,
+        "created_at": created_at or time.time(),
+        "crisis_detail": result.crisis_detail,
+        "wall_time": result.wall_time,
+        "summary_input_tokens": result.summary_input_tokens,
+        "raw_report_tokens": result.raw_report_tokens,
+        "run_date": result.current_date,
+        "crisis_duration": result.crisis_duration,
+    }
+    rows = []
+    for position, row in enumerate(result.task_rows()):
+        rows.append({
+            **run,
+            **{name: row[name] for name in TASK_COLUMNS if name in row},
+            "position": position,
+            "stage_wall_s": stage_times.get(row["stage"]),
+            **{name: row[name] for name in KPI_FIELDS},
+        })
+    return rows
+
+
+class RunArchive:
+    """Hive-partitioned Parquet archive of finished runs under ``root``."""
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, compact_every=DEFAULT_COMPACT_EVERY):
+        self.root = root
+        # 0 leaves compaction to explicit ``compact()`` calls, e.g. when several processes append
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+
+    def partition_dir(self, run_date, crisis_duration):
+        return os.path.join(self.root, f"run_date={run_date}", f"crisis_duration={int(crisis_duration)}")
+
+    def append(self, result):
+        """Append a ``SimulationResult`` and return the path of its file."""
+        return self.append_rows(result.metrics.run_id, run_rows(result))
+
+    def append_rows(self, run_id, rows):
+        """Append the rows of one run (see ``run_rows``), which share a date and a crisis duration."""
+        import pyarrow as pa
+
+        directory = self.partition_dir(rows[0]["run_date"], rows[0]["crisis_duration"])
+        table = pa.Table.from_pylist(rows, schema=file_schema())
+        path = os.path.join(directory, f"{RUN_FILE_PREFIX}{run_id}.parquet")
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            _write_table(table, path)
+            if self.compact_every and len(self._run_files(directory)) >= self.compact_every:
+                self._compact_partition(directory)
+        return path
+
+    def _run_files(self, directory):
+        return sorted(
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.startswith(RUN_FILE_PREFIX) and name.endswith(".parquet")
+        )
+
+    def _partition_dirs(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [
+            os.path.join(self.root, date_dir, duration_dir)
+            for date_dir in sorted(os.listdir(self.root)) if date_dir.startswith("run_date=")
+            for duration_dir in sorted(os.listdir(os.path.join(self.root, date_dir)))
+            if duration_dir.startswith("crisis_duration=")
+        ]
+
+    def _compact_partition(self, directory):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        files = self._run_files(directory)
+        if len(files) < 2:
+            return 0
+        schema = file_schema()
+        table = pa.concat_tables(pq.read_table(path, schema=schema) for path in files)
+        _write_table(table, os.path.join(directory, f"{COMPACTED_FILE_PREFIX}{uuid.uuid4().hex[:12]}.parquet"))
+        for merged in files:
+            os.remove(merged)
+        return len(files)
+
+    def compact(self):
+        """Merge the single-run files of every partition; returns the number of files merged."""
+        with self._lock:
+            return sum(self._compact_partition(directory) for directory in self._partition_dirs())
+
+    def files(self):
+        return [
+            os.path.join(directory, name)
+            for directory in self._partition_dirs()
+            for name in sorted(os.listdir(directory))
+            if name.endswith(".parquet")
+        ]
+
+    def load(self, columns=ANALYTICS_COLUMNS, crisis_durations=None, since=None, until=None):
+        """
+        Rows of the archived runs as a pandas DataFrame with only ``columns``
+        (``None`` for all of them), optionally limited to some crisis durations
+        and to run dates between ``since`` and ``until`` (``YYYY-MM-DD``, inclusive).
+        """
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        columns = list(columns) if columns is not None else None
+        filters = []
+        if crisis_durations is not None:
+            filters.append(("crisis_duration", "in", [int(d) for d in crisis_durations]))
+        if since is not None:
+            filters.append(("run_date", ">=", str(since)))
+        if until is not None:
+            filters.append(("run_date", "<=", str(until)))
+        if not self.files():
+            return pd.DataFrame(columns=columns or [*file_schema().names, *PARTITION_COLUMNS])
+        read = partial(
+            pq.read_table, self.root, columns=columns, filters=filters or None, memory_map=True, partitioning=partitioning()
+        )
+        try:
+            table = read()
+        except FileNotFoundError:
+            # A partition was compacted between listing its files and reading them
+            table = read()
+        return table.to_pandas()
+
+    def run_frame(self, columns=RUN_FRAME_COLUMNS, **filters):
+        """One row per run with the run-level ``columns``, taken from each run's first task."""
+        df = self.load([*columns, "position"], **filters)
+        return df[df["position"] == 0].drop(columns="position").reset_index(drop=True)
+
+    def stats(self):
+        files = self.files()
+        return {
+            "files": len(files),
+            "partitions": len(self._partition_dirs()),
+            "bytes": sum(os.path.getsize(path) for path in files),
+        }
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_run_archive(root=DEFAULT_ARCHIVE_DIR):
+    """Return the process-wide ``RunArchive``; the root is only used by the first call."""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = RunArchive(root)
+    return _archive
+
+
+# -----------------------------------------------------------------------------------
+# SYNTHETIC ARCHIVES (BENCHMARKS)
+# -----------------------------------------------------------------------------------
+_SYNTHETIC_AGENTS = (
+    ("Crisis Analyst", "Crisis Analysis"),
+    *((f"Supplier {i}", "Production & Logistics") for i in range(1, 11)),
+    ("Summary Agent", "Summary"),
+)
+
+
+def synthetic_archive(root, runs, days=30, output_chars=2000, seed=0):
+    """Fill ``root`` with ``runs`` fake runs of twelve tasks spread over ``days`` dates."""
+    import datetime
+    import random
+
+    rng = random.Random(seed)
+    archive = RunArchive(root)
+    start = datetime.date(2026, 1, 1)
+    text = ("Shortages of components delayed deliveries; alternative suppliers were qualified. " * 40)[:output_chars]
+    for i in range(runs):
+        run_date = (start + datetime.timedelta(days=i % days)).isoformat()
+        duration = rng.randint(1, 12)
+        run = {
+            "run_id": f"synthetic{i:08d}",
+            "created_at": time.time(),
+            "crisis_detail": "A six-week strike closes the main container ports of East Asia.",
+            "wall_time": rng.uniform(60, 240),
+            "summary_input_tokens": rng.randint(2000, 6000),
+            "raw_report_tokens": rng.randint(6000, 12000),
+            "run_date": run_date,
+            "crisis_duration": duration,
+        }
+        rows = [
+            {
+                **run,
+                "position": position,
+                "agent": agent,
+                "stage": stage,
+                "output": text,
+                "duration_s": rng.uniform(5, 60),
+                "stage_wall_s": rng.uniform(30, 120),
+                "status": "ok",
+                "reused": rng.random() < 0.2,
+                "error": None,
+                **{name: rng.uniform(0, 100) for name in KPI_FIELDS},
+            }
+            for position, (agent, stage) in enumerate(_SYNTHETIC_AGENTS)
+        ]
+        archive.append_rows(run["run_id"], rows)
+    archive.compact()
+    return archive
+
+
+def main(argv=None):
+    """``python run_archive.py synthetic RUNS ROOT`` or ``python run_archive.py open ROOT``."""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 3 and argv[0] == "synthetic":
+        archive = synthetic_archive(argv[2], int(argv[1]))
+        print(f"{argv[1]} runs written to {argv[2]}: {archive.stats()}")
+        return 0
+    if len(argv) == 2 and argv[0] == "open":
+        archive = RunArchive(argv[1])
+        started = time.perf_counter()
+        df = archive.load()
+        print(f"analytics columns: {len(df)} rows of {df['run_id'].nunique()} runs in {time.perf_counter() - started:.3f}s")
+        started = time.perf_counter()
+        df = archive.load(columns=None)
+        print(f"all columns: {len(df)} rows in {time.perf_counter() - started:.3f}s")
+        print(archive.stats())
+        return 0
+    print(main.__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
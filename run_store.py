@@ -0,0 +1,271 @@
+"""
+Persistent store of finished simulation runs.
+
+Every run is saved to SQLite with its inputs, its timings and the raw output of
+every task, so past scenarios can be reopened without simulating them again.
+Runs are indexed by crisis duration and date, and the agents' reports are
+indexed in an FTS5 table so all of them can be searched at once. The agents'
+KPI records go to a table with one column per KPI, which ``kpi_frame`` loads
+as a pandas DataFrame for cross-run analytics.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from kpis import KPI_FIELDS
+
+
+DEFAULT_RUN_STORE_PATH = os.path.join(".cache", "runs.sqlite3")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        crisis_detail TEXT NOT NULL,
+        crisis_duration INTEGER NOT NULL,
+        run_date TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        wall_time REAL,
+        stage_times TEXT,
+        summary_input_tokens INTEGER,
+        raw_report_tokens INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_runs_duration ON runs (crisis_duration, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_date ON runs (run_date, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS task_outputs (
+        id INTEGER PRIMARY KEY,
+        run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        agent TEXT NOT NULL,
+        stage TEXT,
+        output TEXT NOT NULL,
+        duration_s REAL,
+        status TEXT,
+        error TEXT,
+        UNIQUE (run_id, agent)
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5 (
+        agent, output, content='task_outputs', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS kpis (
+        run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+        agent TEXT NOT NULL,
+        crisis_duration INTEGER NOT NULL,
+        run_date TEXT NOT NULL,
+        {", ".join(f"{name} REAL" for name in KPI_FIELDS)},
+        PRIMARY KEY (run_id, agent)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_kpis_agent_duration ON kpis (agent, crisis_duration)",
+    """
+    CREATE TRIGGER IF NOT EXISTS task_outputs_ai AFTER INSERT ON task_outputs BEGIN
+        INSERT INTO reports_fts (rowid, agent, output) VALUES (new.id, new.agent, new.output);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_outputs_ad AFTER DELETE ON task_outputs BEGIN
+        INSERT INTO reports_fts (reports_fts, rowid, agent, output) VALUES ('delete', old.id, old.agent, old.output);
+    END
+    """,
+)
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching every word, so user input is never a syntax error."""
+    return " ".join(f'"{word}"' for word in _WORD.findall(text))
+
+
+@dataclass
+class StoredRun:
+    run_id: str
+    crisis_detail: str
+    crisis_duration: int
+    current_date: str
+    created_at: float
+    wall_time: float = None
+    stage_times: dict = field(default_factory=dict)
+    summary_input_tokens: int = None
+    raw_report_tokens: int = None
+    tasks: list = field(default_factory=list)
+
+    @property
+    def outputs(self):
+        return {task["agent"]: task["output"] for task in self.tasks}
+
+
+# -----------------------------------------------------------------------------------
+# SQLITE STORE
+# -----------------------------------------------------------------------------------
+class RunStore:
+    """SQLite-backed history of simulation runs with full-text search over reports."""
+
+    def __init__(self, path=DEFAULT_RUN_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Batch worker processes write to the same file, so wait for their locks
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def save(self, result):
+        """Store a ``SimulationResult`` and return its run id."""
+        run_id = result.metrics.run_id
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO runs
+                    (run_id, crisis_detail, crisis_duration, run_date, created_at,
+                     wall_time, stage_times, summary_input_tokens, raw_report_tokens)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    run_id,
+                    result.crisis_detail,
+                    result.crisis_duration,
+                    result.current_date,
+                    time.time(),
+                    result.wall_time,
+                    json.dumps(result.stage_wall_times()),
+                    result.summary_input_tokens,
+                    result.raw_report_tokens,
+                ),
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO task_outputs (run_id, position, agent, stage, output, duration_s, status, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (run_id, i, row["agent"], row["stage"], row["output"], row["duration_s"], row["status"], row["error"])
+                    for i, row in enumerate(result.task_rows())
+                ],
+            )
+            self._conn.executemany(
+                f"""
+                INSERT INTO kpis (run_id, agent, crisis_duration, run_date, {", ".join(KPI_FIELDS)})
+                VALUES (?, ?, ?, ?, {", ".join("?" for _ in KPI_FIELDS)})
+                """,
+                [
+                    (run_id, role, result.crisis_duration, result.current_date, *result.kpi_values(role).values())
+                    for role in result.kpis
+                ],
+            )
+        return run_id
+
+    def kpi_frame(self, crisis_duration=None):
+        """KPIs of every stored run as a DataFrame: one row per run and agent, one column per KPI."""
+        import pandas as pd
+
+        where = "WHERE crisis_duration = ?" if crisis_duration is not None else ""
+        params = (crisis_duration,) if crisis_duration is not None else ()
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT run_id, agent, crisis_duration, run_date, {', '.join(KPI_FIELDS)} FROM kpis {where}",
+                self._conn,
+                params=params,
+            )
+
+    def list_runs(self, limit=50, crisis_duration=None, current_date=None):
+        """Most recent runs first, optionally filtered on duration and date."""
+        clauses, params = [], []
+        if crisis_duration is not None:
+            clauses.append("crisis_duration = ?")
+            params.append(crisis_duration)
+        if current_date is not None:
+            clauses.append("run_date = ?")
+            params.append(current_date)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT run_id, crisis_detail, crisis_duration, run_date AS current_date, created_at, wall_time
+                FROM runs {where} ORDER BY created_at DESC LIMIT ?
+                """,
+                (*params, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load(self, run_id):
+        """Return the ``StoredRun`` with every task output, or ``None``."""
+        with self._lock:
+            run = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if run is None:
+                return None
+            tasks = self._conn.execute(
+                """
+                SELECT agent, stage, output, duration_s, status, error
+                FROM task_outputs WHERE run_id = ? ORDER BY position
+                """,
+                (run_id,),
+            ).fetchall()
+        run = dict(run)
+        run["current_date"] = run.pop("run_date")
+        run["stage_times"] = json.loads(run["stage_times"] or "{}")
+        return StoredRun(**run, tasks=[dict(task) for task in tasks])
+
+    def search(self, text, limit=50, crisis_duration=None):
+        """Reports matching every word of ``text``, best matches first, with a highlighted snippet."""
+        query = fts_query(text)
+        if not query:
+            return []
+        duration_clause = "AND r.crisis_duration = ?" if crisis_duration is not None else ""
+        params = (query, crisis_duration, limit) if crisis_duration is not None else (query, limit)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT t.run_id, t.agent, r.crisis_detail, r.crisis_duration, r.run_date AS current_date,
+                       snippet(reports_fts, 1, '**', '**', ' … ', 24) AS snippet
+                FROM reports_fts
+                JOIN task_outputs t ON t.id = reports_fts.rowid
+                JOIN runs r ON r.run_id = t.run_id
+                WHERE reports_fts MATCH ? {duration_clause}
+                ORDER BY bm25(reports_fts)
+                LIMIT ?
+                """,
+                params,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, run_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM kpis WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM task_outputs WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_run_store(path=DEFAULT_RUN_STORE_PATH):
+    """Return the process-wide ``RunStore``; the path is only used by the first call."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RunStore(path)
+    return _store
@@ -0,0 +1,269 @@
+"""
+Dependency-aware parallel scheduler used by the Supply Chain Simulator.
+
+Each node of a ``TaskGraph`` is a zero-argument callable together with the
+names of the nodes it depends on. ``DagScheduler`` starts every node as soon as
+all of its dependencies have finished, keeping at most ``max_workers`` nodes in
+flight, so the end-to-end time is bounded by the critical path of the graph
+rather than by the sum of all node durations. Ready nodes start in level
+order (a node's level is the length of the longest dependency chain before
+it), and scheduling a node costs O(log n), so graphs of hundreds of nodes
+add no noticeable overhead.
+"""
+import heapq
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+
+DEFAULT_MAX_WORKERS = 4
+
+
+# -----------------------------------------------------------------------------------
+# GRAPH DEFINITION
+# -----------------------------------------------------------------------------------
+@dataclass
+class GraphNode:
+    name: str
+    fn: object
+    depends_on: tuple = ()
+    stage: str = None
+
+
+class TaskGraph:
+    """A set of named callables and the dependency edges between them."""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, fn, depends_on=(), stage=None):
+        if name in self.nodes:
+            raise ValueError(f"Duplicate node '{name}' in task graph.")
+        self.nodes[name] = GraphNode(name, fn, tuple(depends_on), stage or name)
+        return self
+
+    def levels(self):
+        """
+        ``{name: level}`` in level order, rejecting unknown deps and cycles. Nodes
+        without dependencies are level 0; every other node is one level after its
+        latest dependency.
+        """
+        dependants = {name: [] for name in self.nodes}
+        pending = {}
+        for node in self.nodes.values():
+            for dep in node.depends_on:
+                if dep not in self.nodes:
+                    raise ValueError(f"Node '{node.name}' depends on unknown node '{dep}'.")
+                dependants[dep].append(node.name)
+            pending[node.name] = len(node.depends_on)
+
+        levels = {name: 0 for name, count in pending.items() if count == 0}
+        ready = deque(levels)
+        while ready:
+            name = ready.popleft()
+            for child in dependants[name]:
+                levels[child] = max(levels.get(child, 0), levels[name] + 1)
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+        if any(pending.values()):
+            raise ValueError(f"Dependency cycle in task graph: {self._find_cycle(pending)}")
+        return {name: levels[name] for name in sorted(levels, key=levels.get)}
+
+    def _find_cycle(self, pending):
+        """``a -> b -> a`` path of one cycle among the nodes still ``pending``."""
+        path, seen = [], {}
+        name = next(name for name, count in pending.items() if count)
+        while name not in seen:
+            seen[name] = len(path)
+            path.append(name)
+            name = next(dep for dep in self.nodes[name].depends_on if pending[dep])
+        return " -> ".join(path[seen[name]:] + [name])
+
+    def topological_order(self):
+        """Return node names in dependency order (level by level), rejecting unknown deps and cycles."""
+        return list(self.levels())
+
+
+# -----------------------------------------------------------------------------------
+# RESULTS
+# -----------------------------------------------------------------------------------
+@dataclass
+class NodeResult:
+    name: str
+    stage: str
+    started: float = 0.0
+    finished: float = 0.0
+    output: object = None
+    error: BaseException = None
+    skipped: bool = False
+
+    @property
+    def duration(self):
+        return max(0.0, self.finished - self.started)
+
+    @property
+    def ok(self):
+        return self.error is None and not self.skipped
+
+
+@dataclass
+class ScheduleReport:
+    results: dict = field(default_factory=dict)
+    started: float = 0.0
+    finished: float = 0.0
+    max_workers: int = DEFAULT_MAX_WORKERS
+
+    @property
+    def wall_time(self):
+        return max(0.0, self.finished - self.started)
+
+    @property
+    def sequential_time(self):
+        """Time the same nodes would have taken back to back."""
+        return sum(r.duration for r in self.results.values())
+
+    @property
+    def errors(self):
+        return {name: r.error for name, r in self.results.items() if r.error is not None}
+
+    def stage_times(self):
+        """Wall time per stage: first node start to last node finish, in seconds."""
+        spans = {}
+        for r in self.results.values():
+            if r.skipped:
+                continue
+            first, last = spans.get(r.stage, (r.started, r.finished))
+            spans[r.stage] = (min(first, r.started), max(last, r.finished))
+        return {stage: last - first for stage, (first, last) in spans.items()}
+
+    def critical_path(self, graph):
+        """Longest dependency chain by measured duration, as (names, seconds)."""
+        best = {}
+        for name in graph.topological_order():
+            node = graph.nodes[name]
+            prev_names, prev_time = [], 0.0
+            for dep in node.depends_on:
+                if best[dep][1] > prev_time:
+                    prev_names, prev_time = best[dep]
+            duration = self.results[name].duration if name in self.results else 0.0
+            best[name] = (prev_names + [name], prev_time + duration)
+        if not best:
+            return [], 0.0
+        return max(best.values(), key=lambda item: item[1])
+
+    def timeline(self):
+        """One row per node with offsets relative to the start of the run."""
+        rows = []
+        for r in sorted(self.results.values(), key=lambda r: (r.started, r.name)):
+            rows.append({
+                "node": r.name,
+                "stage": r.stage,
+                "start_s": round(r.started - self.started, 3) if not r.skipped else None,
+                "duration_s": round(r.duration, 3),
+                "status": "skipped" if r.skipped else ("error" if r.error else "ok"),
+            })
+        return rows
+
+
+# -----------------------------------------------------------------------------------
+# SCHEDULER
+# -----------------------------------------------------------------------------------
+class DagScheduler:
+    """Runs a ``TaskGraph`` on a bounded thread pool in dependency order."""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        self.max_workers = max_workers
+
+    def iter_run(self, graph, report=None, poll_interval=None, on_idle=None):
+        """
+        Run ``graph`` and yield each ``NodeResult`` in the calling thread as soon
+        as its node finishes. Nodes whose dependencies failed are skipped and
+        yielded as well, so every node is reported exactly once.
+
+        When ``on_idle`` is given it is called in the calling thread with the
+        names of the running nodes at least every ``poll_interval`` seconds,
+        which lets a UI refresh progress while it waits for completions.
+        """
+        order = graph.topological_order()
+        report = report if report is not None else ScheduleReport(max_workers=self.max_workers)
+        report.started = time.perf_counter()
+
+        position = {name: i for i, name in enumerate(order)}
+        pending = {name: set(graph.nodes[name].depends_on) for name in order}
+        dependants = {name: [] for name in order}
+        for name in order:
+            for dep in graph.nodes[name].depends_on:
+                dependants[dep].append(name)
+        # Ready nodes by their position in the level order
+        ready = [position[name] for name in order if not pending[name]]
+
+        running = {}
+
+        def execute(node):
+            result = NodeResult(node.name, node.stage)
+            result.started = time.perf_counter()
+            try:
+                result.output = node.fn()
+            except Exception as exc:
+                result.error = exc
+            result.finished = time.perf_counter()
+            return result
+
+        def skip_dependants(name):
+            skipped = []
+            stack = list(dependants[name])
+            while stack:
+                child = stack.pop()
+                if child in report.results or child not in pending:
+                    continue
+                pending.pop(child)
+                now = time.perf_counter()
+                result = NodeResult(child, graph.nodes[child].stage, now, now, skipped=True)
+                report.results[child] = result
+                skipped.append(result)
+                stack.extend(dependants[child])
+            return skipped
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def submit_ready():
+                while ready and len(running) < self.max_workers:
+                    name = order[heapq.heappop(ready)]
+                    if name not in pending:
+                        continue
+                    pending.pop(name)
+                    running[pool.submit(execute, graph.nodes[name])] = name
+
+            submit_ready()
+            while running:
+                if on_idle is not None:
+                    on_idle(sorted(running.values()))
+                done, _ = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = future.result()
+                    report.results[name] = result
+                    yield result
+                    if result.error is not None:
+                        for skipped in skip_dependants(name):
+                            yield skipped
+                        continue
+                    for child in dependants[name]:
+                        if child in pending:
+                            pending[child].discard(name)
+                            if not pending[child]:
+                                heapq.heappush(ready, position[child])
+                submit_ready()
+
+        report.finished = time.perf_counter()
+
+    def run(self, graph, on_complete=None, poll_interval=None, on_idle=None):
+        """Run ``graph`` to completion and return a ``ScheduleReport``."""
+        report = ScheduleReport(max_workers=self.max_workers)
+        for result in self.iter_run(graph, report, poll_interval=poll_interval, on_idle=on_idle):
+            if on_complete is not None:
+                on_complete(result)
+        return report
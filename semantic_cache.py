@@ -0,0 +1,419 @@
+"""
+Semantic cache of crisis analyses.
+
+The task memo only reuses a Crisis Analyst report when the crisis text is
+identical, but users often resubmit the same crisis in other words
+("semiconductor shortage and port strikes" / "port strikes plus chip
+shortage"). ``CrisisAnalysisCache`` keys analyses on an embedding of the
+crisis text plus the exact crisis duration instead: a lookup returns the
+stored analysis of the most similar crisis of the same duration when its
+cosine similarity reaches ``similarity_threshold``.
+
+Word overlap alone is not meaning, so the default ``CrisisEmbedder`` first
+reduces a crisis to its terms: plurals are folded, synonyms mapped to one
+word ("chip" and "semiconductor"), stop words dropped, and words under a
+negation ("no port strike; only a chip shortage") kept apart from the same
+words asserted. On top of the similarity, two crises only match when they
+state the same numbers ("a 10% tariff" is not "a 60% tariff"), kinds of
+crisis and disrupted products, and name the same companies and places, and
+never when one asserts a term the other negates.
+
+Analyses are stored in SQLite and indexed in memory in a NumPy matrix of
+their vectors, rebuilt from the stored texts on start. The least recently
+used analysis is evicted once ``max_entries`` are stored.
+Hits, misses and the similarity of every lookup are counted, and the app
+lets the user accept a cached analysis or force a fresh one.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from embeddings import DEFAULT_DIMENSIONS, HashingEmbedder
+from metrics import register_gauges
+
+
+DEFAULT_CRISIS_CACHE_PATH = os.path.join(".cache", "crisis_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 500
+# Calibrated on paragraph-length crisis reports (see tests/test_semantic_cache.py): rewordings score
+# 0.77 and above, different crises stating the same numbers, names, events and products 0.63 and below
+DEFAULT_SIMILARITY_THRESHOLD = 0.7
+# A crisis at least this similar to a stored one replaces its analysis instead of adding another
+DUPLICATE_SIMILARITY = 0.999
+
+# Words that carry no meaning of their own in a crisis description
+STOP_WORDS = frozenset(
+    "a an and are as at be been by due during for from has have in into is it its of on or over plus "
+    "the their there this that these those to was were which while with".split()
+    # Common words of any text
+    + "also all any because before can cannot could expected including it's just may might more most must now "
+    "other others own several so some still such than then they until up what when where will would".split()
+    # Generic words of crisis descriptions that do not tell two crises apart
+    + "new main major global worldwide after lasting caused causing cause hit affect affecting impact "
+    "imposed maker makers industry crisis keep remain face".split()
+)
+# Words negating the terms after them, up to the end of the clause
+NEGATIONS = frozenset("no not without never none nor neither".split())
+# Words ending a negated clause besides punctuation ("no strike, only a shortage")
+NEGATION_BREAKS = frozenset("and plus but only instead yet although though while whereas with except".split())
+# {word: the word its synonyms are mapped to}, after plurals are folded
+SYNONYMS = {
+    "chip": "semiconductor", "microchip": "semiconductor", "wafer": "semiconductor",
+    "walkout": "strike", "stoppage": "strike",
+    "scarcity": "shortage", "lack": "shortage", "deficit": "shortage",
+    "harbor": "port", "harbour": "port",
+    "quake": "earthquake",
+    "flooding": "flood", "flooded": "flood",
+    "typhoon": "storm", "hurricane": "storm", "cyclone": "storm",
+    "shutdown": "closure", "closed": "closure", "shut": "closure",
+    "delayed": "delay",
+    "war": "conflict",
+    "ransomware": "cyberattack", "hack": "cyberattack", "hacker": "cyberattack",
+    "blaze": "fire", "wildfire": "fire",
+    "outbreak": "pandemic", "epidemic": "pandemic",
+    "close": "closure", "halt": "closure", "halted": "closure", "halting": "closure",
+    "taiwanese": "taiwan", "chinese": "china", "japanese": "japan", "korean": "korea",
+    "vietnamese": "vietnam", "german": "germany", "mexican": "mexico", "indian": "india",
+    "american": "us", "usa": "us",
+}
+# Places and supply chain companies, taken for names even where they start a sentence, after
+# plurals are folded and synonyms mapped. Any other capitalised word is only a name mid-sentence.
+KNOWN_NAMES = frozenset(
+    "africa america asia australia brazil canada chile china europe germany india indonesia israel japan "
+    "korea malaysia mexico netherlands philippines russia singapore taiwan thailand turkey uk ukraine us "
+    "vietnam busan hsinchu rotterdam shanghai shenzhen suez panama "
+    "amazon apple corning dhl foxconn ibiden intel lg maersk micron nvidia qualcomm samsung sk sony tsmc".split()
+)
+# Kinds of crisis, after synonyms are mapped: a flood is not a fire, whatever else they share
+EVENTS = frozenset(
+    "strike flood storm earthquake fire drought cyberattack tariff sanction embargo blockade pandemic outage "
+    "shortage conflict explosion lockdown".split()
+)
+# What a crisis disrupts, after synonyms are mapped: a memory shortage is not a display shortage
+PRODUCTS = frozenset(
+    "semiconductor memory display panel screen oled battery cell lithium cobalt nickel camera sensor lens "
+    "glass board pcb chipset processor modem steel aluminium copper plastic photoresist neon".split()
+)
+# Directions, names of a region in any case ("northern Japan" is not "southern Japan")
+DIRECTIONS = frozenset(
+    "north south east west northern southern eastern western central northeast northwest southeast "
+    "southwest".split()
+)
+# Spelled-out numbers, as their value ("a six-week strike" states 6)
+NUMBER_WORDS = dict(
+    two=2, three=3, four=4, five=5, six=6, seven=7, eight=8, nine=9, ten=10, eleven=11, twelve=12,
+    twenty=20, thirty=30, forty=40, fifty=50, sixty=60, seventy=70, eighty=80, ninety=90, hundred=100,
+)
+
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)*|[a-z0-9]+(?:'[a-z0-9]+)*|[.,;:!?()]", re.IGNORECASE)
+_SENTENCE_END = frozenset(".!?:")
+_UNSTEMMED = frozenset(SYNONYMS.values()) | EVENTS | PRODUCTS | KNOWN_NAMES | DIRECTIONS
+
+
+@dataclass
+class CrisisTerms:
+    # Canonical terms, asserted or under a negation
+    asserted: list
+    negated: list
+    # Numbers the crisis states
+    numbers: frozenset
+    # Its kinds of crisis (``EVENTS``) and what they disrupt (``PRODUCTS``)
+    events: frozenset
+    products: frozenset
+    # Canonical terms of the companies and places it names
+    names: frozenset
+
+
+@dataclass
+class CacheMatch:
+    entry_id: int
+    crisis_detail: str
+    crisis_duration: int
+    output: str
+    duration_s: float
+    similarity: float
+
+
+@dataclass
+class SemanticCacheStats:
+    entries: int = 0
+    capacity: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD
+    # Similarity of the best candidate of the latest lookup, hit or miss
+    last_similarity: float = None
+    hit_similarity_total: float = 0.0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def mean_hit_similarity(self):
+        return self.hit_similarity_total / self.hits if self.hits else None
+
+
+# -----------------------------------------------------------------------------------
+# CRISIS TERMS
+# -----------------------------------------------------------------------------------
+def _fold(word):
+    """Singular of a plural or possessive word, roughly (``shortages`` -> ``shortage``)."""
+    if word.endswith("'s"):
+        word = word[:-2]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def _stem(word):
+    """Stem of a verb form, roughly (``damaged`` and ``damaging`` -> ``damag``)."""
+    for suffix in ("ing", "ed", "e"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            word = word[: -len(suffix)]
+            # shipped -> ship
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouls":
+                word = word[:-1]
+            return word
+    return word
+
+
+def _number(token):
+    try:
+        return float(token.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def crisis_terms(text):
+    """
+    The ``CrisisTerms`` of a crisis description. Capitalised words and acronyms other
+    than events and products are names, but a word starting a sentence only when it is
+    in ``KNOWN_NAMES``.
+    """
+    asserted, negated, numbers, names = [], [], set(), set()
+    negating = False
+    sentence_start = True
+    for token in _TOKEN.findall(text):
+        lowered = token.lower()
+        number = NUMBER_WORDS.get(lowered, _number(lowered) if lowered[0].isdigit() else None)
+        if number is not None:
+            numbers.add(float(number))
+        if lowered in NEGATIONS or lowered.endswith("n't"):
+            negating = True
+        elif not token[0].isalnum() or lowered in NEGATION_BREAKS:
+            negating = False
+        elif lowered not in STOP_WORDS:
+            word = _fold(lowered)
+            if number is not None:
+                term = f"{number:g}"
+            else:
+                term = SYNONYMS.get(word, word)
+                if term not in _UNSTEMMED:
+                    term = _stem(term)
+            (negated if negating else asserted).append(term)
+            if term in DIRECTIONS or token[0].isupper() and term not in EVENTS and term not in PRODUCTS and (
+                not sentence_start or term in KNOWN_NAMES or (len(token) > 1 and token.isupper())
+            ):
+                names.add(term)
+        sentence_start = token in _SENTENCE_END
+    events, products = frozenset(EVENTS.intersection(asserted)), frozenset(PRODUCTS.intersection(asserted))
+    return CrisisTerms(asserted, negated, frozenset(numbers), events, products, frozenset(names))
+
+
+def contradicts(terms, other_terms):
+    """Whether one crisis asserts a term the other negates."""
+    return bool(
+        set(terms.asserted) & set(other_terms.negated) or set(terms.negated) & set(other_terms.asserted)
+    )
+
+
+def same_identifiers(terms, other_terms):
+    """
+    Whether two crises state the same numbers, kinds of crisis and disrupted products,
+    and each names every company and place the other names.
+    """
+    if (terms.numbers, terms.events, terms.products) != (other_terms.numbers, other_terms.events, other_terms.products):
+        return False
+    mentioned = {*terms.asserted, *terms.negated}
+    other_mentioned = {*other_terms.asserted, *other_terms.negated}
+    return terms.names <= other_mentioned and other_terms.names <= mentioned
+
+
+def conflicts(terms, other_terms):
+    """Whether two crises can never share an analysis, however similar their wording."""
+    return contradicts(terms, other_terms) or not same_identifiers(terms, other_terms)
+
+
+class CrisisEmbedder:
+    """Embeds the ``crisis_terms`` of a text, negated terms as distinct features."""
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        self._embedder = HashingEmbedder(dimensions, bigrams=False)
+
+    def embed(self, text):
+        terms = crisis_terms(text)
+        return self._embedder.embed(" ".join([*terms.asserted, *(f"not-{term}" for term in terms.negated)]))
+
+
+class CrisisAnalysisCache:
+    """Crisis analyses keyed by crisis text similarity and exact duration, least recently used evicted first."""
+
+    def __init__(
+        self,
+        path=DEFAULT_CRISIS_CACHE_PATH,
+        similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        embedder=None,
+    ):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.embedder = embedder or CrisisEmbedder()
+        self._vectors = np.zeros((max_entries, self.embedder.dimensions), dtype=np.float32)
+        self._durations = np.zeros(max_entries, dtype=np.int64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._ids = [None] * max_entries
+        self._terms = [None] * max_entries
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = SemanticCacheStats(capacity=max_entries, similarity_threshold=similarity_threshold)
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS crisis_cache (
+                    id INTEGER PRIMARY KEY,
+                    crisis_detail TEXT NOT NULL,
+                    crisis_duration INTEGER NOT NULL,
+                    output TEXT NOT NULL,
+                    duration_s REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+                """
+            )
+        self._load()
+        register_gauges(self.gauges)
+
+    def _load(self):
+        """Index the most recently used stored analyses, dropping any beyond ``max_entries``."""
+        rows = self._conn.execute(
+            "SELECT id, crisis_detail, crisis_duration, last_used_at FROM crisis_cache ORDER BY last_used_at DESC"
+        ).fetchall()
+        with self._conn:
+            self._conn.executemany("DELETE FROM crisis_cache WHERE id = ?", [(row[0],) for row in rows[self.max_entries:]])
+        for entry_id, crisis_detail, crisis_duration, last_used_at in rows[: self.max_entries]:
+            self._index(self._size, entry_id, crisis_detail, crisis_duration, last_used_at)
+            self._size += 1
+
+    def _index(self, slot, entry_id, crisis_detail, crisis_duration, last_used_at, vector=None):
+        self._vectors[slot] = self.embedder.embed(crisis_detail) if vector is None else vector
+        self._terms[slot] = crisis_terms(crisis_detail)
+        self._durations[slot] = crisis_duration
+        self._last_used[slot] = last_used_at
+        self._ids[slot] = entry_id
+
+    def _best(self, vector, crisis_duration, terms):
+        """
+        ``(slot, similarity)`` of the most similar stored crisis of the same duration that
+        does not conflict with ``terms``, or ``(None, None)``.
+        """
+        candidates = np.flatnonzero(self._durations[: self._size] == crisis_duration)
+        candidates = candidates[np.array([not conflicts(terms, self._terms[slot]) for slot in candidates], dtype=bool)]
+        if not len(candidates):
+            return None, None
+        scores = self._vectors[candidates] @ vector
+        best = int(np.argmax(scores))
+        return int(candidates[best]), float(scores[best])
+
+    def lookup(self, crisis_detail, crisis_duration, record=True):
+        """
+        The ``CacheMatch`` of the most similar analysed crisis of the same duration, or
+        ``None`` below the threshold. With ``record=False`` the lookup is a preview that
+        neither counts in the statistics nor refreshes the entry.
+        """
+        vector = self.embedder.embed(crisis_detail)
+        terms = crisis_terms(crisis_detail)
+        with self._lock:
+            slot, similarity = self._best(vector, crisis_duration, terms)
+            hit = slot is not None and similarity >= self.similarity_threshold
+            if record:
+                self._stats.last_similarity = similarity
+                if hit:
+                    self._stats.hits += 1
+                    self._stats.hit_similarity_total += similarity
+                else:
+                    self._stats.misses += 1
+            if not hit:
+                return None
+            entry_id = self._ids[slot]
+            row = self._conn.execute(
+                "SELECT crisis_detail, crisis_duration, output, duration_s FROM crisis_cache WHERE id = ?", (entry_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if record:
+                now = time.time()
+                self._last_used[slot] = now
+                with self._conn:
+                    self._conn.execute("UPDATE crisis_cache SET last_used_at = ? WHERE id = ?", (now, entry_id))
+        return CacheMatch(entry_id, *row, similarity=similarity)
+
+    def put(self, crisis_detail, crisis_duration, output, duration_s):
+        """Store the analysis of a crisis, replacing the analysis of a crisis with the same terms."""
+        vector = self.embedder.embed(crisis_detail)
+        terms = crisis_terms(crisis_detail)
+        now = time.time()
+        with self._lock, self._conn:
+            slot, similarity = self._best(vector, crisis_duration, terms)
+            if slot is not None and similarity >= DUPLICATE_SIMILARITY:
+                self._conn.execute("DELETE FROM crisis_cache WHERE id = ?", (self._ids[slot],))
+            elif self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used[: self._size]))
+                self._conn.execute("DELETE FROM crisis_cache WHERE id = ?", (self._ids[slot],))
+                self._stats.evictions += 1
+            entry_id = self._conn.execute(
+                """
+                INSERT INTO crisis_cache (crisis_detail, crisis_duration, output, duration_s, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (crisis_detail, crisis_duration, output, duration_s, now, now),
+            ).lastrowid
+            self._index(slot, entry_id, crisis_detail, crisis_duration, now, vector)
+
+    def stats(self):
+        with self._lock:
+            return replace(self._stats, entries=self._size)
+
+    def gauges(self):
+        stats = self.stats()
+        return {
+            "simulator_crisis_cache_hits": stats.hits,
+            "simulator_crisis_cache_misses": stats.misses,
+            "simulator_crisis_cache_entries": stats.entries,
+            "simulator_crisis_cache_mean_hit_similarity": stats.mean_hit_similarity or 0.0,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM crisis_cache")
+            self._size = 0
+            self._ids = [None] * self.max_entries
+            self._terms = [None] * self.max_entries
@@ -0,0 +1,584 @@
+"""
+Headless simulation pipeline of the Supply Chain Simulator.
+
+``run_simulation`` runs the three stages of a scenario (crisis analysis, the
+production & logistics tasks on the dependency-aware scheduler, and the
+map-reduce summary) without touching Streamlit. The app, the batch runner
+and the benchmark drive it and observe progress through a ``SimulationListener``.
+When the registry has a ``TaskMemo``, tasks whose inputs match a previous run
+reuse its output instead of running their agent again, and with a
+``CrisisAnalysisCache`` the crisis analysis of a similarly worded crisis of
+the same duration is reused unless a fresh one is asked for. The agents of a run
+share a ``RunMemory`` of the reports finished before them. With a deadline,
+every task runs within its share of the remaining time and contributes its
+best partial answer when that runs out.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from crewai import Crew, Process
+from crewai.tasks.task_output import TaskOutput
+from langchain_core.agents import AgentFinish
+
+from context_slicing import DEFAULT_DIGEST_TOKENS, DEFAULT_SLICE_TOKENS, prepare_contexts
+from deadline import (
+    DEFAULT_SECONDS_PER_ITERATION,
+    Deadline,
+    check_cancelled,
+    iterations_for,
+    partial_answer,
+    remaining_levels,
+    run_with_timeout,
+)
+from event_log import get_event_log
+from kpis import KPI_FIELDS, parse_kpis
+from memory_store import DEFAULT_MEMORY_ITEMS, DEFAULT_RECALL_ITEMS, RunMemory
+from metrics import MetricsRecorder, task_scope, write_prometheus
+from monte_carlo import DEFAULT_TRIALS, grounding_text, run_monte_carlo
+from scheduler import DEFAULT_MAX_WORKERS, DagScheduler, TaskGraph
+from streaming import token_sink
+from summarization import (
+    DEFAULT_EXTRACT_TOKENS,
+    DEFAULT_SUMMARY_TOKEN_BUDGET,
+    build_tiered_summary_context,
+    extract_report,
+)
+from task_memo import answered_by_fallback, task_key
+from tokens import count_tokens
+
+
+STAGE_CRISIS = "crisis_analysis"
+STAGE_PRODUCTION = "production"
+STAGE_SUMMARY = "summary"
+
+NO_DATA = "No data available."
+
+# Level of the task events of the event log, by task status
+TASK_LOG_LEVELS = {"truncated": logging.WARNING, "skipped": logging.WARNING, "error": logging.ERROR}
+
+
+@dataclass
+class SimulationSettings:
+    max_parallel_tasks: int = DEFAULT_MAX_WORKERS
+    summary_extract_tokens: int = DEFAULT_EXTRACT_TOKENS
+    summary_token_budget: int = DEFAULT_SUMMARY_TOKEN_BUDGET
+    crisis_digest_tokens: int = DEFAULT_DIGEST_TOKENS
+    crisis_context_tokens: int = DEFAULT_SLICE_TOKENS
+    poll_interval: float = 0.5
+    metrics_dir: str = None
+    monte_carlo_trials: int = DEFAULT_TRIALS
+    monte_carlo_seed: int = None
+    memory_items: int = DEFAULT_MEMORY_ITEMS
+    # Notes of its upstream suppliers recalled into each production prompt; 0 leaves prompts unchanged
+    memory_recall: int = 0
+    # Time limit of the whole run in seconds; None runs every task to completion
+    deadline_seconds: float = None
+    seconds_per_iteration: float = DEFAULT_SECONDS_PER_ITERATION
+    # Reuse the analysis of a similarly worded crisis (see semantic_cache.py); only the app turns
+    # it on, where the user sees every similar crisis and chooses
+    reuse_crisis_analysis: bool = False
+    # Run a fresh crisis analysis, bypassing the task memo as well
+    fresh_crisis_analysis: bool = False
+
+
+class SimulationListener:
+    """Progress hooks of ``run_simulation``; all of them run on the calling thread."""
+
+    def on_run_start(self, run_tasks):
+        pass
+
+    def on_monte_carlo(self, monte_carlo):
+        pass
+
+    def on_stage_start(self, stage, roles):
+        pass
+
+    def on_idle(self, running_roles):
+        pass
+
+    def on_task_reused(self, role, saved_seconds):
+        pass
+
+    def on_crisis_cache_hit(self, match):
+        pass
+
+    def on_task_truncated(self, role, budget):
+        pass
+
+    def on_task_complete(self, result):
+        pass
+
+    def on_contexts_prepared(self, contexts):
+        pass
+
+    def on_summary_input(self, extract_tokens, raw_tokens, token_budget):
+        pass
+
+    def on_stage_complete(self, stage, graph, report):
+        pass
+
+
+@dataclass
+class SimulationResult:
+    crisis_detail: str
+    crisis_duration: int
+    current_date: str
+    roles: list = field(default_factory=list)
+    stages: dict = field(default_factory=dict)
+    outputs: dict = field(default_factory=dict)
+    task_results: dict = field(default_factory=dict)
+    stage_reports: dict = field(default_factory=dict)
+    crisis_contexts: dict = field(default_factory=dict)
+    extracts: dict = field(default_factory=dict)
+    kpis: dict = field(default_factory=dict)
+    reused: dict = field(default_factory=dict)
+    truncated: dict = field(default_factory=dict)
+    # CacheMatch of the similar crisis whose analysis was reused, if any
+    crisis_cache_match: object = None
+    monte_carlo: object = None
+    memory: object = None
+    summary_input_tokens: int = 0
+    raw_report_tokens: int = 0
+    wall_time: float = 0.0
+    metrics: MetricsRecorder = None
+
+    @property
+    def summary_role(self):
+        return self.roles[-1]
+
+    @property
+    def saved_seconds(self):
+        """Agent time saved by reusing memoized outputs (their original durations)."""
+        return sum(self.reused.values())
+
+    def reused_stages(self):
+        """``{stage: [roles]}`` of the tasks that reused a memoized output."""
+        stages = {}
+        for role in self.roles:
+            if role in self.reused:
+                stages.setdefault(self.stages.get(role), []).append(role)
+        return stages
+
+    def stage_wall_times(self):
+        return {stage: report.wall_time for stage, (_, report) in self.stage_reports.items()}
+
+    def task_rows(self):
+        """One flat record per task, suitable for JSONL/Parquet export."""
+        rows = []
+        for role in self.roles:
+            result = self.task_results.get(role)
+            rows.append({
+                "crisis_detail": self.crisis_detail,
+                "crisis_duration": self.crisis_duration,
+                "current_date": self.current_date,
+                "agent": role,
+                "stage": self.stages.get(role),
+                "output": self.outputs.get(role, NO_DATA),
+                "duration_s": round(result.duration, 3) if result else None,
+                "status": self.task_status(role),
+                "reused": role in self.reused,
+                "error": repr(result.error) if result and result.error else None,
+                **self.kpi_values(role),
+            })
+        return rows
+
+    def task_status(self, role):
+        result = self.task_results.get(role)
+        if result and result.ok:
+            return "truncated" if role in self.truncated else "ok"
+        return "skipped" if result and result.skipped else "error"
+
+    def kpi_values(self, role):
+        """``{kpi: value or None}`` for every field of ``KPIRecord``."""
+        record = self.kpis.get(role)
+        return {name: getattr(record, name) if record else None for name in KPI_FIELDS}
+
+
+# -----------------------------------------------------------------------------------
+# TASK EXECUTION HELPERS
+# -----------------------------------------------------------------------------------
+def get_task_output(task):
+    try:
+        return task.output.raw
+    except AttributeError:
+        return NO_DATA
+
+
+def kickoff_single_task(task):
+    single_crew = Crew(
+        agents=[task.agent],
+        tasks=[task],
+        process=Process.sequential,
+        share_crew=False,
+    )
+    single_crew.kickoff()
+    return get_task_output(task)
+
+
+def run_single_task(task, token_buffer=None, recorder=None, stage=None):
+    with ExitStack() as scopes:
+        if token_buffer is not None:
+            scopes.enter_context(token_sink(token_buffer.sink_for(task.agent.role)))
+        if recorder is not None:
+            scopes.enter_context(task_scope(recorder, task.agent.role, stage, task.agent.max_iter))
+        return kickoff_single_task(task)
+
+
+def run_budgeted_task(
+    task,
+    budget,
+    token_buffer=None,
+    recorder=None,
+    stage=None,
+    seconds_per_iteration=DEFAULT_SECONDS_PER_ITERATION,
+):
+    """
+    Run ``task`` within ``budget`` seconds and return ``(output, truncated)``. The
+    agent's iterations and execution time are scaled to the budget, and if it is
+    still running when the budget is spent, the task is abandoned and ``output``
+    is the best partial answer it streamed. So is the output of an agent stopped
+    by its iteration or time limit.
+    """
+    role = task.agent.role
+    log_step = task.agent.step_callback
+    answered = threading.Event()
+
+    def step_callback(step_output):
+        if log_step is not None:
+            log_step(step_output)
+        # The executor only reports an AgentFinish when the agent gave its answer, not when
+        # it was stopped at max_iter or max_execution_time
+        if isinstance(step_output, AgentFinish):
+            answered.set()
+        check_cancelled()
+
+    agent = task.agent.model_copy(update={
+        "max_iter": iterations_for(budget, task.agent.max_iter, seconds_per_iteration),
+        "max_execution_time": max(1, int(budget)),
+        "step_callback": step_callback,
+    })
+    # The crew runs a copy of the task, so an abandoned run cannot overwrite the partial answer later
+    budgeted_task = task.model_copy(update={"agent": agent})
+    streamed = []
+
+    def sink(token):
+        streamed.append(token)
+        if token_buffer is not None:
+            token_buffer.append(role, token)
+
+    # The sink and the metrics scope are thread-local, so they are entered on the kickoff thread
+    def kickoff():
+        with ExitStack() as scopes:
+            scopes.enter_context(token_sink(sink))
+            if recorder is not None:
+                scopes.enter_context(task_scope(recorder, role, stage, agent.max_iter))
+            return kickoff_single_task(budgeted_task)
+
+    finished, output = run_with_timeout(kickoff, budget)
+    if finished and answered.is_set():
+        task.output = budgeted_task.output
+        return output, False
+
+    output = partial_answer("".join(streamed)) or NO_DATA
+    task.output = TaskOutput(description=task.description, raw=output, agent=role)
+    return output, True
+
+
+@dataclass
+class TaskExecution:
+    """How the tasks of one run are executed, and what their execution recorded."""
+
+    token_buffer: object = None
+    recorder: MetricsRecorder = None
+    memo: object = None
+    memory: object = None
+    recall_items: int = 0
+    deadline: Deadline = None
+    # {role: sequential task levels left from that task on}, used to split the deadline
+    levels: dict = field(default_factory=dict)
+    seconds_per_iteration: float = DEFAULT_SECONDS_PER_ITERATION
+    reused: dict = field(default_factory=dict)
+    truncated: dict = field(default_factory=dict)
+    # {role: CacheMatch} of tasks answered from the crisis analysis cache
+    cached: dict = field(default_factory=dict)
+    # Roles that must run even when the task memo has their output
+    fresh: frozenset = frozenset()
+
+    def run(self, task, stage):
+        """Run ``task`` on its agent, within its share of the deadline when there is one."""
+        if self.deadline is None:
+            return run_single_task(task, self.token_buffer, self.recorder, stage)
+
+        budget = self.deadline.budget(self.levels.get(task.agent.role, 1))
+        output, truncated = run_budgeted_task(
+            task, budget, self.token_buffer, self.recorder, stage, self.seconds_per_iteration
+        )
+        if truncated:
+            self.truncated[task.agent.role] = budget
+        return output
+
+
+def reuse_output(task, output, saved_seconds, execution):
+    """Complete ``task`` with a stored ``output`` instead of running its agent."""
+    # Downstream tasks read their context from `task.output`, as if the agent had run
+    task.output = TaskOutput(description=task.description, raw=output, agent=task.agent.role)
+    execution.reused[task.agent.role] = saved_seconds
+    return output
+
+
+def run_memoized_task(task, execution, stage=None):
+    """
+    Return the memoized output of ``task`` when its inputs match a previous run, else
+    run it and memoize the output. The key is computed when the task is about to
+    run, so it covers the outputs of the tasks it depends on. Truncated outputs and
+    outputs the agent's fallback model answered are not memoized.
+    """
+    memo = execution.memo
+    key = task_key(task, [get_task_output(dep) for dep in (task.context or [])])
+    entry = memo.get(key)
+    if entry is not None:
+        return reuse_output(task, entry.output, entry.duration_s, execution)
+
+    started = time.perf_counter()
+    output = execution.run(task, stage)
+    memoizable = task.agent.role not in execution.truncated and not answered_by_fallback(task, execution.recorder)
+    if output != NO_DATA and memoizable:
+        memo.put(key, task.agent.role, output, time.perf_counter() - started)
+    return output
+
+
+def upstream_roles(task):
+    """Roles of every task ``task`` depends on, directly or through its context."""
+    roles, pending = set(), list(task.context or [])
+    while pending:
+        dep = pending.pop()
+        if dep.agent.role not in roles:
+            roles.add(dep.agent.role)
+            pending.extend(dep.context or [])
+    return roles
+
+
+def recall_notes(task, memory, roles, k=DEFAULT_RECALL_ITEMS):
+    """
+    Add the notes of ``roles`` most relevant to ``task`` to its inputs. Only reports
+    that are certain to be finished are searched, so the prompt does not depend on
+    which parallel task happened to finish first.
+    """
+    notes = memory.recall(f"{task.agent.goal} {task.description}", roles, exclude_text=task.inputs, k=k)
+    if notes:
+        task.add_input("Relevant Notes From Other Agents", "\n\n".join(f"[{role}] {note}" for role, note, _ in notes))
+
+
+# Dependencies between the production & logistics tasks come from their `context`, so the
+# six component suppliers run in parallel, followed by Foxconn, DHL and Amazon, while
+# Samsung Care runs beside them. With a `memory` and `recall_items`, each task first recalls
+# notes from the reports of its indirect dependencies, its own supply chain: the reports of its
+# direct dependencies are already in its prompt as context, and the crisis report reaches it
+# only through its role-specific slice.
+def build_task_graph(task_list, stages, execution=None):
+    execution = execution or TaskExecution()
+    memory = execution.memory
+
+    def run_node(t, stage):
+        if memory is not None and execution.recall_items:
+            roles = upstream_roles(t) - {dep.agent.role for dep in (t.context or [])}
+            if roles:
+                recall_notes(t, memory, roles, execution.recall_items)
+        if t.agent.role in execution.cached:
+            match = execution.cached[t.agent.role]
+            output = reuse_output(t, match.output, match.duration_s, execution)
+        elif execution.memo is not None and t.agent.role not in execution.fresh:
+            output = run_memoized_task(t, execution, stage)
+        else:
+            output = execution.run(t, stage)
+        if memory is not None and output != NO_DATA:
+            memory.save(t.agent.role, parse_kpis(output)[0])
+        return output
+
+    graph = TaskGraph()
+    for t in task_list:
+        stage = stages.get(t.agent.role, t.agent.role)
+        graph.add(
+            t.agent.role,
+            lambda t=t, stage=stage: run_node(t, stage),
+            depends_on=[dep.agent.role for dep in (t.context or [])],
+            stage=stage,
+        )
+    return graph
+
+
+# -----------------------------------------------------------------------------------
+# PIPELINE
+# -----------------------------------------------------------------------------------
+def run_simulation(
+    registry, crisis_detail, crisis_duration, settings=None, listener=None, token_buffer=None, current_date=None, run_id=None
+):
+    """Run one scenario end to end and return a ``SimulationResult``; ``run_id`` names its spans and log events."""
+    settings = settings or SimulationSettings()
+    listener = listener or SimulationListener()
+    event_log = get_event_log()
+    memory = RunMemory(settings.memory_items) if settings.memory_items else None
+    started = time.perf_counter()
+
+    run_tasks = registry.new_run(crisis_detail, crisis_duration)
+    task_crisis_analysis = run_tasks.crisis_analysis
+    task_summary = run_tasks.summary
+    remaining_tasks = run_tasks.remaining
+
+    result = SimulationResult(
+        crisis_detail=crisis_detail,
+        crisis_duration=crisis_duration,
+        current_date=current_date or datetime.now().strftime("%Y-%m-%d"),
+        roles=[t.agent.role for t in run_tasks.all],
+        stages=run_tasks.stages,
+        metrics=MetricsRecorder(run_id),
+    )
+    run_id = result.metrics.run_id
+    event_log.emit("run_start", run_id, crisis_duration=crisis_duration, tasks=len(run_tasks.all))
+    execution = TaskExecution(
+        token_buffer=token_buffer,
+        recorder=result.metrics,
+        memo=registry.task_memo,
+        memory=memory,
+        recall_items=settings.memory_recall,
+        seconds_per_iteration=settings.seconds_per_iteration,
+        reused=result.reused,
+        truncated=result.truncated,
+    )
+    if settings.deadline_seconds:
+        execution.deadline = Deadline(settings.deadline_seconds)
+        execution.levels = remaining_levels(run_tasks)
+    listener.on_run_start(run_tasks)
+
+    def run_stage(stage, task_list, on_complete=None):
+        listener.on_stage_start(stage, [t.agent.role for t in task_list])
+
+        def finish(node_result):
+            if node_result.ok:
+                # The KPI block is kept as a typed record and removed from the narrative report
+                node_result.output, kpi_record = parse_kpis(node_result.output)
+                if kpi_record is not None:
+                    result.kpis[node_result.name] = kpi_record
+            if node_result.name in result.reused:
+                listener.on_task_reused(node_result.name, result.reused[node_result.name])
+            if node_result.name in result.truncated:
+                listener.on_task_truncated(node_result.name, result.truncated[node_result.name])
+            result.task_results[node_result.name] = node_result
+            result.outputs[node_result.name] = node_result.output if node_result.ok else NO_DATA
+            status = "reused" if node_result.name in result.reused else result.task_status(node_result.name)
+            event_log.emit(
+                f"task_{status}", run_id, node_result.name, duration_s=node_result.duration,
+                message=repr(node_result.error) if node_result.error else None,
+                level=TASK_LOG_LEVELS.get(status, logging.INFO), stage=stage,
+            )
+            if on_complete is not None:
+                on_complete(node_result)
+            listener.on_task_complete(node_result)
+
+        graph = build_task_graph(task_list, run_tasks.stages, execution)
+        with result.metrics.span("stage", stage, stage=stage):
+            report = DagScheduler(max_workers=settings.max_parallel_tasks).run(
+                graph, on_complete=finish, poll_interval=settings.poll_interval, on_idle=listener.on_idle
+            )
+        result.stage_reports[stage] = (graph, report)
+        listener.on_stage_complete(stage, graph, report)
+        return report
+
+    # Map step of the summary: each finished report is reduced to a bounded extract right away
+    def extract_finished_report(node_result):
+        result.extracts[node_result.name] = extract_report(
+            node_result.name, result.outputs[node_result.name], settings.summary_extract_tokens
+        )
+
+    # -------------------------------------------------------------------------
+    # MONTE CARLO GROUNDING
+    # -------------------------------------------------------------------------
+    # Every agent receives the simulated figures of its own node (the analyst and the
+    # summary agent get the overview), so the narratives agree on the numbers.
+    if settings.monte_carlo_trials:
+        with result.metrics.span("stage", "monte_carlo", stage="monte_carlo"):
+            result.monte_carlo = run_monte_carlo(
+                crisis_detail,
+                crisis_duration,
+                node_topics={run_tasks.agent_keys[role]: topics for role, topics in run_tasks.topics.items()},
+                trials=settings.monte_carlo_trials,
+                seed=settings.monte_carlo_seed,
+            )
+        for t in run_tasks.all:
+            grounding = grounding_text(result.monte_carlo, run_tasks.agent_keys.get(t.agent.role))
+            t.add_input(None, grounding)
+        listener.on_monte_carlo(result.monte_carlo)
+
+    # -------------------------------------------------------------------------
+    # CRISIS ANALYSIS TASK
+    # -------------------------------------------------------------------------
+    # The analysis of a similarly worded crisis of the same duration is reused when the settings
+    # allow it; a fresh analysis the user asked for also bypasses the task memo
+    crisis_role = task_crisis_analysis.agent.role
+    crisis_cache = registry.crisis_cache
+    if crisis_cache is not None and settings.reuse_crisis_analysis:
+        result.crisis_cache_match = crisis_cache.lookup(crisis_detail, crisis_duration)
+    if result.crisis_cache_match is not None:
+        execution.cached[crisis_role] = result.crisis_cache_match
+        listener.on_crisis_cache_hit(result.crisis_cache_match)
+    elif settings.fresh_crisis_analysis:
+        execution.fresh = frozenset([crisis_role])
+    run_stage(STAGE_CRISIS, [task_crisis_analysis], extract_finished_report)
+    crisis_report = get_task_output(task_crisis_analysis)
+    crisis_result = result.task_results[crisis_role]
+    analysed = crisis_result.ok and crisis_report != NO_DATA and crisis_role not in result.truncated
+    if crisis_cache is not None and analysed and crisis_role not in execution.cached:
+        analysis_seconds = result.reused.get(crisis_role, crisis_result.duration)
+        crisis_cache.put(crisis_detail, crisis_duration, crisis_report, analysis_seconds)
+
+    # -------------------------------------------------------------------------
+    # PRODUCTION & LOGISTICS TASKS (EXCEPT SUMMARY)
+    # -------------------------------------------------------------------------
+    result.crisis_contexts = prepare_contexts(
+        crisis_report,
+        {t.agent.role: run_tasks.topics.get(t.agent.role) for t in remaining_tasks},
+        settings.crisis_digest_tokens,
+        settings.crisis_context_tokens,
+    )
+    for t in remaining_tasks:
+        t.add_input("Crisis Report Details", result.crisis_contexts[t.agent.role].text)
+    listener.on_contexts_prepared(result.crisis_contexts)
+    run_stage(STAGE_PRODUCTION, remaining_tasks, extract_finished_report)
+
+    # -------------------------------------------------------------------------
+    # SUMMARY AGENT TASK
+    # -------------------------------------------------------------------------
+    # Reduce step: the extracts are packed per tier under an explicit token budget
+    reported_tasks = remaining_tasks + [task_crisis_analysis]
+    tiers = [(run_tasks.stages[crisis_role], [crisis_role])] + list(run_tasks.tiers().items())
+    extracts_text, result.summary_input_tokens = build_tiered_summary_context(
+        [(tier, [result.extracts[role] for role in roles]) for tier, roles in tiers],
+        settings.summary_token_budget,
+    )
+    final_text = "Below are the key KPIs, challenges and solutions extracted from all agents' outputs:\n\n"
+    final_text += extracts_text
+    task_summary.add_input("All Agents' Reports", final_text)
+    truncated_roles = [t.agent.role for t in reported_tasks if t.agent.role in result.truncated]
+    if truncated_roles:
+        task_summary.add_input(
+            "Truncated Reports",
+            "These reports were cut short by the time limit of the run and may be incomplete: "
+            + ", ".join(truncated_roles) + ". Say so in the summary.",
+        )
+    result.raw_report_tokens = sum(count_tokens(result.outputs[t.agent.role]) for t in reported_tasks)
+    listener.on_summary_input(result.summary_input_tokens, result.raw_report_tokens, settings.summary_token_budget)
+    run_stage(STAGE_SUMMARY, [task_summary])
+
+    if memory is not None:
+        result.memory = memory.stats()
+    result.wall_time = time.perf_counter() - started
+    event_log.emit("run_complete", run_id, duration_s=result.wall_time, truncated=len(result.truncated) or None)
+    if settings.metrics_dir:
+        result.metrics.write_jsonl(os.path.join(settings.metrics_dir, "spans.jsonl"))
+        write_prometheus(os.path.join(settings.metrics_dir, "simulator.prom"))
+    return result
@@ -0,0 +1,109 @@
+"""
+Background loading of the agent stack.
+
+Importing crewai, langchain and the OpenAI client and building the agent
+catalog takes seconds, while the input form of the app needs none of it.
+``StackLoader`` runs the imports and the build on a background thread as soon
+as the first page is requested, so the form renders right away and the stack
+is usually warm by the time "Run Simulation" is clicked. Every step is timed,
+which gives an import-time profile of a cold start.
+"""
+import importlib
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+
+# Imported in this order, so the time of each module excludes the modules before it
+STACK_MODULES = (
+    "openai",
+    "langchain_core.callbacks",
+    "langchain.chat_models",
+    "crewai",
+    "registry",
+    "jobs",
+)
+
+
+def install_sqlite_shim():
+    """CrewAI's vector store needs a newer SQLite than many system Pythons ship."""
+    import pysqlite3
+
+    sys.modules["sqlite3"] = pysqlite3
+
+
+@dataclass
+class ProfileStep:
+    name: str
+    seconds: float
+
+
+class StackLoader:
+    """Imports ``modules`` and then calls a build function once, on a background thread."""
+
+    def __init__(self, modules=STACK_MODULES):
+        self.modules = modules
+        self.profile = []
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, build):
+        """Start loading unless it has already started; ``build()`` returns what ``wait`` hands out."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._load, args=(build,), name="stack-loader", daemon=True)
+            self._thread.start()
+
+    def _load(self, build):
+        try:
+            self._timed("sqlite shim", install_sqlite_shim)
+            for module in self.modules:
+                self._timed(f"import {module}", lambda: importlib.import_module(module))
+            self.result = self._timed("build", build)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self._done.set()
+
+    def _timed(self, name, fn):
+        started = time.perf_counter()
+        value = fn()
+        self.profile.append(ProfileStep(name, time.perf_counter() - started))
+        return value
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    @property
+    def seconds(self):
+        return sum(step.seconds for step in self.profile)
+
+    def wait(self, timeout=None):
+        """Block until the stack is loaded and return the build result; re-raises a load error."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"The agent stack did not load within {timeout}s.")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def get_stack_loader():
+    """Return the process-wide ``StackLoader``."""
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                _loader = StackLoader()
+    return _loader
@@ -0,0 +1,70 @@
+"""
+Token streaming from worker threads to the Streamlit script thread.
+
+Every production task runs on its own scheduler worker thread, so the shared
+LLM client can attribute streamed tokens to a task through a thread-local
+sink. ``TokenBuffer`` collects those tokens per task and lets the script
+thread pick up whatever changed since its last refresh.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+_local = threading.local()
+
+
+class TokenStreamHandler(BaseCallbackHandler):
+    """Forwards every new LLM token to the sink installed on the current thread."""
+
+    def on_llm_new_token(self, token, **kwargs):
+        sink = getattr(_local, "sink", None)
+        if sink is not None:
+            sink(token)
+
+
+@contextmanager
+def token_sink(sink):
+    """Route tokens generated on this thread to ``sink`` while the block runs."""
+    previous = getattr(_local, "sink", None)
+    _local.sink = sink
+    try:
+        yield
+    finally:
+        _local.sink = previous
+
+
+class TokenBuffer:
+    """Thread-safe per-key text accumulator drained by the UI thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._text = defaultdict(str)
+        self._tokens = defaultdict(int)
+        self._dirty = set()
+
+    def sink_for(self, key):
+        return lambda token: self.append(key, token)
+
+    def append(self, key, token):
+        with self._lock:
+            self._text[key] += token
+            self._tokens[key] += 1
+            self._dirty.add(key)
+
+    def text(self, key):
+        with self._lock:
+            return self._text.get(key, "")
+
+    def token_count(self, key):
+        with self._lock:
+            return self._tokens[key]
+
+    def drain_updates(self):
+        """Return ``{key: text so far}`` for every key that changed since the last call."""
+        with self._lock:
+            updates = {key: self._text[key] for key in self._dirty}
+            self._dirty.clear()
+        return updates
@@ -0,0 +1,185 @@
+"""
+Map-reduce preparation of the Summary Agent's input.
+
+Instead of appending every agent's full report to ``task_summary``, each report
+is first mapped to a bounded extract of its KPIs, challenges and solutions.
+The map step is extractive (it keeps the report's own bullet points under the
+matching headings), so it costs no LLM call and can run the moment a task
+finishes. The reduce step packs the extracts into the summary prompt under an
+explicit token budget, grouped per tier of the network. A tier whose share of
+the budget leaves too little room per report, as in networks of hundreds of
+suppliers, is reduced to a single extract of the whole tier.
+"""
+import re
+from itertools import zip_longest
+from dataclasses import dataclass, field
+
+from tokens import count_tokens
+
+
+DEFAULT_EXTRACT_TOKENS = 350
+DEFAULT_SUMMARY_TOKEN_BUDGET = 3000
+# Below this share of the budget per report, the reports of a tier are merged into one extract
+MIN_REPORT_TOKENS = 80
+
+CATEGORIES = ("kpis", "challenges", "solutions")
+CATEGORY_LABELS = {"kpis": "KPIs", "challenges": "Challenges", "solutions": "Solutions"}
+CATEGORY_KEYWORDS = {
+    "kpis": ("kpi", "metric", "indicator", "performance", "rate", "turnover", "throughput"),
+    "challenges": ("challenge", "issue", "risk", "impact", "disruption", "bottleneck", "delay", "shortage"),
+    "solutions": ("solution", "action", "mitigation", "recommendation", "adopted", "measure", "lesson", "strateg"),
+}
+
+_MARKDOWN_HEADING = re.compile(r"^\s*#{1,6}\s+(?P<title>.+?)\s*#*\s*$")
+_BOLD_HEADING = re.compile(r"^\s*(?:[-*]\s+)?\*\*(?P<title>[^*]+?)\*\*:?\s*$")
+_COLON_HEADING = re.compile(r"^\s*(?:\d+\.\s+)?(?P<title>[A-Z][\w &/(),'-]{0,60}):\s*$")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?\s*(?:%|percent|days|weeks|months|units|x\b)", re.IGNORECASE)
+
+
+@dataclass
+class ReportExtract:
+    role: str
+    kpis: list = field(default_factory=list)
+    challenges: list = field(default_factory=list)
+    solutions: list = field(default_factory=list)
+    source_tokens: int = 0
+
+    def to_text(self):
+        lines = [f"### {self.role}"]
+        for category in CATEGORIES:
+            items = getattr(self, category)
+            if items:
+                lines.append(f"{CATEGORY_LABELS[category]}:")
+                lines.extend(f"- {item}" for item in items)
+        if len(lines) == 1:
+            lines.append("- No KPIs, challenges or solutions reported.")
+        return "\n".join(lines)
+
+    @property
+    def tokens(self):
+        return count_tokens(self.to_text())
+
+    def trimmed(self, max_tokens):
+        """Drop trailing items, round-robin across categories, until the extract fits."""
+        extract = ReportExtract(self.role, list(self.kpis), list(self.challenges), list(self.solutions), self.source_tokens)
+        while extract.tokens > max_tokens:
+            longest = max(CATEGORIES, key=lambda c: len(getattr(extract, c)))
+            if not getattr(extract, longest):
+                break
+            getattr(extract, longest).pop()
+        return extract
+
+
+# -----------------------------------------------------------------------------------
+# MAP: ONE BOUNDED EXTRACT PER REPORT
+# -----------------------------------------------------------------------------------
+def _heading_title(line):
+    for pattern in (_MARKDOWN_HEADING, _BOLD_HEADING, _COLON_HEADING):
+        match = pattern.match(line)
+        if match:
+            return match.group("title")
+    return None
+
+
+def _categorize(title):
+    lowered = title.lower()
+    for category in ("challenges", "solutions", "kpis"):
+        if any(keyword in lowered for keyword in CATEGORY_KEYWORDS[category]):
+            return category
+    return None
+
+
+def _clean_item(line):
+    item = _BULLET.sub("", line).strip()
+    return item.replace("**", "")
+
+
+def extract_report(role, text, max_tokens=DEFAULT_EXTRACT_TOKENS):
+    """Map one agent report to its KPIs, challenges and solutions, within ``max_tokens``."""
+    extract = ReportExtract(role, source_tokens=count_tokens(text))
+    current = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        title = _heading_title(line)
+        if title is not None:
+            current = _categorize(title)
+            continue
+        item, category = _clean_item(line), current
+        if category is None or not _BULLET.match(line):
+            # Outside a section's bullet list, "Lessons learned: diversify ports" style lines
+            # carry their own category, and lines quoting figures are treated as KPIs
+            inline_title, _, rest = item.partition(":")
+            inline_category = _categorize(inline_title) if rest.strip() and len(inline_title) < 60 else None
+            if inline_category in ("challenges", "solutions"):
+                category, item = inline_category, rest.strip()
+            elif inline_category == "kpis" or _NUMBER.search(item):
+                category = "kpis"
+        if category is not None and item and item not in getattr(extract, category):
+            getattr(extract, category).append(item)
+    return extract.trimmed(max_tokens)
+
+
+# -----------------------------------------------------------------------------------
+# REDUCE: PACK THE EXTRACTS UNDER A TOKEN BUDGET
+# -----------------------------------------------------------------------------------
+def build_summary_context(extracts, token_budget=DEFAULT_SUMMARY_TOKEN_BUDGET):
+    """
+    Join the extracts into the Summary Agent's input without exceeding
+    ``token_budget``. Unused budget from short extracts is handed on to the
+    longer ones. Returns ``(text, tokens)``.
+    """
+    extracts = list(extracts)
+    by_size = sorted(range(len(extracts)), key=lambda i: extracts[i].tokens)
+    parts = {}
+    remaining = token_budget
+    for n, i in enumerate(by_size):
+        share = remaining // (len(extracts) - n)
+        parts[i] = extracts[i].trimmed(share).to_text()
+        remaining -= count_tokens(parts[i])
+
+    text = "\n\n".join(parts[i] for i in range(len(extracts)))
+    return text, count_tokens(text)
+
+
+def merge_extracts(title, extracts, max_items=None):
+    """
+    One extract of several reports, their items interleaved so trimming keeps
+    every report represented, with at most ``max_items`` items per category.
+    """
+    merged = ReportExtract(title, source_tokens=sum(e.source_tokens for e in extracts))
+    for category in CATEGORIES:
+        columns = [[f"{e.role}: {item}" for item in getattr(e, category)] for e in extracts]
+        items = getattr(merged, category)
+        for row in zip_longest(*columns):
+            items.extend(item for item in row if item is not None)
+        del items[max_items:]
+    return merged
+
+
+def build_tiered_summary_context(tiers, token_budget=DEFAULT_SUMMARY_TOKEN_BUDGET):
+    """
+    Like ``build_summary_context`` for ``tiers``, a list of ``(tier, extracts)``:
+    each tier gets a share of the budget proportional to its number of reports,
+    and a tier whose share is below ``MIN_REPORT_TOKENS`` per report is merged
+    into a single extract. Returns ``(text, tokens)``.
+    """
+    reports_left = sum(len(extracts) for _, extracts in tiers)
+    remaining = token_budget
+    parts = []
+    for tier, extracts in tiers:
+        heading = f"## {tier}"
+        share = remaining * len(extracts) // reports_left - count_tokens(heading)
+        if len(extracts) > 1 and share // len(extracts) < MIN_REPORT_TOKENS:
+            # No item is shorter than a few tokens, so longer lists would only be trimmed away
+            merged = merge_extracts(f"All {len(extracts)} reports", extracts, max_items=share // 4)
+            body = merged.trimmed(share).to_text()
+        else:
+            body, _ = build_summary_context(extracts, share)
+        parts.append(f"{heading}\n\n{body}")
+        remaining -= count_tokens(parts[-1])
+        reports_left -= len(extracts)
+
+    text = "\n\n".join(parts)
+    return text, count_tokens(text)
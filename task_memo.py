@@ -0,0 +1,150 @@
+"""
+Memoization of task outputs by their exact inputs.
+
+A task's inputs are its agent (role, goal, backstory and model), its compiled
+prompt (template and run-specific inputs), and the outputs of the tasks it takes as
+context. When all of them match a previous run, the stored output is reused
+instead of running the agent again. Since downstream descriptions embed the
+upstream outputs (crisis context, summary extracts) and context outputs are
+part of the key, a changed input only reruns the tasks that depend on it.
+
+The key names the model an agent is routed to, so outputs its fallback model
+answered in part are not memoized (see ``answered_by_fallback``): a replayed
+output always comes from the model in its key.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from llm_cache import normalize_prompt
+
+
+DEFAULT_TASK_MEMO_PATH = os.path.join(".cache", "task_memo.sqlite3")
+DEFAULT_MAX_ENTRIES = 20_000
+
+
+def task_key(task, context_outputs):
+    """Hash of everything that determines the output of ``task``."""
+    agent = task.agent
+    llm = agent.llm
+    parts = [
+        agent.role,
+        agent.goal,
+        agent.backstory,
+        str(getattr(llm, "model_name", type(llm).__name__)),
+        repr(getattr(llm, "temperature", None)),
+        normalize_prompt(task.prompt()),
+        *context_outputs,
+    ]
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def answered_by_fallback(task, recorder):
+    """
+    Whether the fallback model of a routed agent answered any LLM call of ``task``
+    in the run ``recorder`` measures. Without a recorder this cannot be told, so a
+    routed agent counts as answered by its fallback.
+    """
+    fallback = getattr(task.agent.llm, "fallback", None)
+    if fallback is None:
+        return False
+    if recorder is None:
+        return True
+    return any(
+        span.role == task.agent.role and span.model == fallback.model_name for span in recorder.by_kind("llm")
+    )
+
+
+@dataclass
+class MemoEntry:
+    output: str
+    duration_s: float
+
+
+@dataclass
+class MemoStats:
+    hits: int = 0
+    misses: int = 0
+    saved_seconds: float = 0.0
+    entries: int = 0
+
+
+class TaskMemo:
+    """SQLite store of task outputs keyed by ``task_key``, least recently used evicted first."""
+
+    def __init__(self, path=DEFAULT_TASK_MEMO_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = MemoStats()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS task_memo (
+                    key TEXT PRIMARY KEY,
+                    role TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    duration_s REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_task_memo_last_used ON task_memo (last_used_at)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT output, duration_s FROM task_memo WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return None
+            self._stats.hits += 1
+            self._stats.saved_seconds += row[1]
+            with self._conn:
+                self._conn.execute("UPDATE task_memo SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        return MemoEntry(*row)
+
+    def put(self, key, role, output, duration_s):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO task_memo (key, role, output, duration_s, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, role, output, duration_s, now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM task_memo WHERE key IN (
+                    SELECT key FROM task_memo ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM task_memo").fetchone()[0]
+            return MemoStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                saved_seconds=self._stats.saved_seconds,
+                entries=entries,
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM task_memo")
@@ -0,0 +1,424 @@
+"""
+Task templates of the Supply Chain Simulator.
+
+The templates in ``TASK_SPECS`` are static; ``build_tasks`` renders them into
+fresh ``CompiledTask`` instances for a single simulation run, so the shared
+agent catalog can be reused across runs and sessions. Templates hold no
+run-specific values: the crisis inputs are appended after the compiled
+template of the crisis analysis, the only task given them (see prompts.py),
+so the prompt prefix is the same on every run.
+Networks loaded from a file (see network.py) use the same spec format.
+"""
+from dataclasses import dataclass, field
+
+from kpis import KPI_INSTRUCTIONS
+from prompts import CompiledTask, compile_prefix, run_inputs
+
+
+# Keys of the first and the last task of every network
+CRISIS_TASK = "crisis_analysis"
+SUMMARY_TASK = "summary"
+
+TASK_SPECS = {}
+
+# -----------------------------------------------------------------------------------
+# 1. CRISIS ANALYSIS, PRODUCTION & LOGISTICS TASKS
+# -----------------------------------------------------------------------------------
+TASK_SPECS["crisis_analysis"] = dict(
+    description="""
+    The Crisis Analyst must expand upon the inputs provided by the user to develop a comprehensive context analysis.
+
+    Inputs:
+    - The Crisis Details and the Crisis Duration given under "Run Inputs" below.
+
+    Task:
+    - Analyze and expand upon the provided crisis details, considering geopolitical, economic, and logistical factors.
+    - Develop a detailed scenario that outlines potential impacts on the supply chain, key stakeholders involved, and ripple effects across industries.
+    - Focus on providing a thorough context for the crisis without suggesting mitigation actions or strategies.
+    """,
+    expected_output="""
+    Comprehensive Crisis Analysis Report
+
+    Prepared by: Crisis Analyst Team
+    Crisis in Focus: the crisis given in the Run Inputs
+
+    The report should include:
+    - A detailed overview of the crisis, including root causes, key stakeholders, and affected industries.
+    - Analysis of potential impacts on the supply chain, with a focus on the Galaxy S24 Ultra production and distribution.
+    - Identification of secondary effects, such as economic, political, or environmental repercussions.
+    - Scenarios outlining possible developments over the crisis duration given in the Run Inputs.
+    """,
+    agent="crisis_analyst",
+    stage="Crisis Analysis"
+)
+
+TASK_SPECS["qualcomm"] = dict(
+    description="""
+    Qualcomm must ensure the production and delivery of Snapdragon chipsets for the Galaxy S24 Ultra.
+
+    - Consider the current crisis context based on the report provided by crisis_analyst.
+    - Evaluate the current production capacity and utilize available resources.
+    - Collaborate with Samsung R&D to determine production priorities.
+    - Interact with Foxconn Assembly to understand assembly requirements and synchronize timelines.
+    - Report any issues, such as material shortages or logistical delays, and implement appropriate solutions.
+    """,
+    expected_output="""
+    Qualcomm Supply Chain Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Details of production decisions based on current capacity and model priorities.
+    - Collaborations with other agents, such as Samsung R&D and Foxconn Assembly, to align production with supply chain requirements.
+    - Relevant KPIs, including production capacity, on-time delivery rate, inventory levels, and cost impacts.
+    - Challenges encountered (e.g., material shortages, logistical disruptions) and the solutions adopted.
+    - Evaluation of future outlooks and lessons learned.
+    """,
+    agent="qualcomm_chipset",
+    stage="Component Suppliers",
+    topics=["semiconductor", "chip", "wafer", "foundry", "fab", "taiwan", "export"],
+    kpis=True
+)
+
+TASK_SPECS["samsung_display"] = dict(
+    description="""
+    Samsung Display must ensure uninterrupted OLED panel production for the Galaxy S24 Ultra.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Evaluate current production capacity and material availability.
+    - Collaborate with suppliers to address any material shortages and explore alternative sourcing options.
+    - Communicate with Foxconn Assembly to align delivery schedules with production needs.
+    - Report any disruptions or quality concerns and implement corrective measures.
+    """,
+    expected_output="""
+    Samsung Display Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Overview of production decisions and adjustments made to maintain OLED panel output.
+    - Details of collaborations with suppliers to secure materials and mitigate disruptions.
+    - Coordination efforts with Foxconn Assembly to align production timelines with assembly requirements.
+    - Key KPIs, including production volume, quality metrics, lead time adherence, and supplier performance.
+    - Challenges encountered (e.g., material shortages, production delays) and solutions implemented.
+    - Lessons learned and recommendations for future resilience.
+    """,
+    agent="samsung_display",
+    stage="Component Suppliers",
+    topics=["display", "oled", "panel", "glass", "korea", "material"],
+    kpis=True
+)
+
+TASK_SPECS["sony_camera"] = dict(
+    description="""
+    Sony must ensure the production and delivery of high-resolution camera sensors for the Galaxy S24 Ultra.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Evaluate the production capacity and prioritize flagship sensor models to meet Samsung's requirements.
+    - Collaborate with suppliers to secure raw materials and address any shortages.
+    - Communicate with Foxconn Assembly to align sensor delivery with assembly timelines.
+    - Report on any production or quality issues encountered and outline the corrective actions taken.
+    """,
+    expected_output="""
+    Sony Camera Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Summary of production priorities and adjustments made to ensure high-resolution sensor output.
+    - Details of collaborations with suppliers to address material shortages or sourcing challenges.
+    - Coordination efforts with Foxconn Assembly to align sensor delivery with assembly requirements.
+    - Key KPIs, including production volume, quality rates, lead time adherence, and supplier performance.
+    - Challenges encountered (e.g., material shortages, production delays) and solutions implemented.
+    - Recommendations for improving supply chain resilience in future crises.
+    """,
+    agent="sony_camera",
+    stage="Component Suppliers",
+    topics=["sensor", "camera", "semiconductor", "wafer", "japan"],
+    kpis=True
+)
+
+TASK_SPECS["lg_chem"] = dict(
+    description="""
+    LG Chem must ensure the uninterrupted production and delivery of high-density batteries for the Galaxy S24 Ultra.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Evaluate the availability of raw materials and collaborate with suppliers to address any shortages.
+    - Optimize production processes to maintain quality and efficiency despite potential constraints.
+    - Communicate with Foxconn Assembly to synchronize battery delivery with the assembly schedule.
+    - Report on any production challenges, material shortages, or delays, and detail the actions taken to resolve them.
+    """,
+    expected_output="""
+    LG Chem Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Summary of measures implemented to secure raw materials and maintain production output.
+    - Collaborations with suppliers to address material shortages and ensure continuity.
+    - Coordination efforts with Foxconn Assembly to align battery delivery with assembly requirements.
+    - Key KPIs, including production capacity, defect rates, lead times, and cost variations for raw materials.
+    - Challenges encountered (e.g., raw material shortages, production inefficiencies) and solutions adopted.
+    - Recommendations for improving production resilience and supply chain efficiency in future crises.
+    """,
+    agent="lg_chem",
+    stage="Component Suppliers",
+    topics=["battery", "batteries", "lithium", "cobalt", "nickel", "material", "chemical", "mining"],
+    kpis=True
+)
+
+TASK_SPECS["sk_hynix"] = dict(
+    description="""
+    SK Hynix must ensure a stable supply of memory modules for the Galaxy S24 Ultra, addressing any potential disruptions caused by the crisis.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Evaluate current production capabilities and identify any risks to memory module supply.
+    - Collaborate with suppliers and production partners to diversify sourcing and ensure supply continuity.
+    - Communicate with Foxconn Assembly to align memory delivery schedules with assembly requirements.
+    - Report on challenges faced, such as material shortages or logistical delays, and the measures taken to address them.
+    """,
+    expected_output="""
+    SK Hynix Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Overview of steps taken to secure memory module supply and ensure production continuity.
+    - Collaborations with suppliers and production partners to address sourcing challenges and diversify supply.
+    - Coordination efforts with Foxconn Assembly to synchronize memory delivery with assembly timelines.
+    - Key KPIs, including production volume, on-time delivery rate, supply diversification index, and cost impact.
+    - Challenges encountered (e.g., material shortages, production delays) and solutions implemented.
+    - Recommendations for improving memory supply chain resilience in future crises.
+    """,
+    agent="sk_hynix",
+    stage="Component Suppliers",
+    topics=["memory", "dram", "nand", "semiconductor", "wafer", "korea"],
+    kpis=True
+)
+
+TASK_SPECS["ibiden"] = dict(
+    description="""
+    Ibiden must ensure uninterrupted PCB production for the Galaxy S24 Ultra, addressing any disruptions caused by the crisis.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Evaluate material availability and collaborate with suppliers to address any shortages.
+    - Explore alternative sourcing options and implement design adjustments to optimize production.
+    - Communicate with Foxconn Assembly to align PCB delivery schedules with assembly requirements.
+    - Report on any production challenges, material issues, or delays, and detail the corrective actions taken.
+    """,
+    expected_output="""
+    Ibiden Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Overview of measures implemented to maintain PCB production and address material sourcing challenges.
+    - Details of collaborations with suppliers to secure raw materials and diversify sourcing options.
+    - Coordination efforts with Foxconn Assembly to ensure timely delivery of PCBs for assembly.
+    - Key KPIs, including production throughput, defect rate, supply diversification index, and cost impact.
+    - Challenges encountered (e.g., material shortages, production inefficiencies) and solutions implemented.
+    - Recommendations for enhancing PCB production resilience and efficiency in future crises.
+    """,
+    agent="ibiden",
+    stage="Component Suppliers",
+    topics=["pcb", "circuit board", "substrate", "copper", "laminate", "material", "japan"],
+    kpis=True
+)
+
+TASK_SPECS["foxconn"] = dict(
+    description="""
+    Foxconn must oversee the final assembly of the Galaxy S24 Ultra while addressing any disruptions caused by the crisis.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Coordinate with suppliers such as Samsung Display, Qualcomm, and Ibiden to ensure timely delivery of components.
+    - Adjust assembly lines and optimize workflows to maintain production efficiency under challenging conditions.
+    - Implement stringent quality control measures to ensure the final product meets Samsung's standards.
+    - Collaborate with DHL Logistics to plan outbound shipments and synchronize delivery schedules.
+    - Report on challenges faced during assembly and logistics, and detail the actions taken to resolve them.
+    """,
+    expected_output="""
+    Foxconn Assembly Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Summary of assembly adjustments and workflow optimizations implemented to maintain production efficiency.
+    - Details of collaborations with suppliers (e.g., Samsung Display, Qualcomm, Ibiden) to ensure timely component delivery.
+    - Coordination efforts with DHL Logistics to plan outbound shipments and minimize delays.
+    - Key KPIs, including assembly throughput, defect rates, and on-time shipment percentage.
+    - Challenges encountered (e.g., component delays, assembly line disruptions) and solutions adopted.
+    - Recommendations for improving assembly and logistics coordination in future crises.
+    """,
+    agent="foxconn_assembly",
+    stage="Assembly",
+    topics=["assembly", "labor", "labour", "factory", "vietnam", "component", "production"],
+    context=["qualcomm", "samsung_display", "sony_camera", "lg_chem", "sk_hynix", "ibiden"],
+    kpis=True
+)
+
+TASK_SPECS["dhl"] = dict(
+    description="""
+    DHL must manage the global logistics operations for the Galaxy S24 Ultra, ensuring smooth inbound and outbound shipments despite the crisis.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Evaluate the actions and updates from other agents: Qualcomm, Sony Camera, Samsung Display, and LG Chem, SK Hynix, Ibiden and Foxconn Assembly including their geographic locations, to adapt logistics strategies accordingly.
+    - Incorporate geographic information into planning, mapping routes between agent locations (e.g., Samsung Display in South Korea to Foxconn Assembly in Vietnam).
+    - Develop contingency plans to reroute shipments in case of delays or disruptions.
+    - Prioritize the handling and delivery of critical components to maintain the supply chain flow.
+    - Report on logistical challenges faced, including transportation bottlenecks or cost overruns, and detail the solutions implemented.
+    """,
+    expected_output="""
+    DHL Logistics Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Overview of logistics adjustments made in response to the crisis, including rerouting and prioritization strategies.
+    - Geographic information on logistics routes, including:
+        - Key routes
+        - Alternate routes and contingency plans implemented to bypass disruptions.
+    - Details of coordination efforts with other agents: Qualcomm, Sony Camera, Samsung Display, and LG Chem, SK Hynix, Ibiden and Foxconn Assembly to align logistics with production timelines.
+    - Key KPIs, such as delivery time variance, on-time shipment rate, and cost impact of logistical changes.
+    - Challenges encountered and the measures taken to resolve them.
+    - Recommendations for improving logistics resilience and efficiency in future crises.
+    """,
+    agent="dhl_logistics",
+    stage="Logistics",
+    topics=["logistic", "port", "shipping", "freight", "route", "transport", "customs", "strike"],
+    context=["qualcomm", "samsung_display", "sony_camera", "lg_chem", "sk_hynix", "ibiden", "foxconn"],
+    kpis=True
+)
+
+TASK_SPECS["amazon"] = dict(
+    description="""
+    Amazon must manage the global distribution and sales of the Galaxy S24 Ultra, ensuring timely delivery and customer satisfaction despite the crisis.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Coordinate closely with DHL Logistics to align shipping schedules, prioritize key markets, and address disruptions in transportation.
+    - Use geographic and logistical insights from DHL Logistics to optimize inventory placement in regional fulfillment centers.
+    - Implement customer communication plans to manage expectations and provide updates on order status based on real-time delivery data from DHL Logistics.
+    - Report on challenges faced in distribution, such as regional delays or mismatches between supply and demand, and the actions taken to resolve them.
+    """,
+    expected_output="""
+    Amazon Distribution Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Summary of adjustments made to distribution and sales strategies based on the crisis context.
+    - Details of coordination with DHL Logistics, including:
+        - Shipping schedule alignment for timely deliveries.
+        - Prioritization of key markets based on demand and logistical feasibility.
+        - Inventory redistribution to minimize delays in regional fulfillment centers.
+    - Implementation of customer communication strategies informed by DHL's real-time delivery updates to manage expectations and improve satisfaction.
+    - Key KPIs:
+        - Delivery timeliness rate.
+        - Inventory turnover rates across regions.
+        - Customer satisfaction metrics.
+    - Challenges encountered:
+        - Regional delays due to logistical bottlenecks reported by DHL Logistics also specify teh geographical positions.
+        - Mismatches in demand and supply in certain regions.
+    - Solutions Adopted:
+        - Dynamic reprioritization of shipments with DHL to address high-priority regions.
+        - Enhanced communication channels to keep customers informed about delays and alternatives.
+    """,
+    agent="amazon_distribution",
+    stage="Distribution",
+    topics=["distribution", "demand", "consumer", "retail", "warehouse", "fulfillment", "delivery", "market"],
+    context=["dhl"],
+    kpis=True
+)
+
+TASK_SPECS["samsung_care"] = dict(
+    description="""
+    Samsung Care must provide comprehensive after-sales support for the Galaxy S24 Ultra, ensuring high customer satisfaction during the crisis.
+
+    - Assess the current crisis context based on the report provided by crisis_analyst.
+    - Plan and manage spare parts inventory to ensure availability for repairs, considering potential supply chain delays.
+    - Adjust repair workflows to maintain efficiency under constrained conditions, prioritizing high-impact cases.
+    - Implement proactive customer communication strategies to address concerns and manage expectations.
+    - Report on challenges faced in after-sales operations, such as spare part shortages or increased service demand, and the actions taken to address them.
+    """,
+    expected_output="""
+    Samsung Care After-Sales Report – Galaxy S24 Ultra
+
+    Actions Taken:
+    - Overview of spare parts inventory management and adjustments made to ensure repair readiness.
+    - Details of updated repair workflows to maintain efficiency and prioritize critical cases.
+    - Implementation of customer communication strategies to minimize dissatisfaction and build trust.
+    - Key KPIs, including repair turnaround time, first-time resolution rate, and customer satisfaction metrics.
+    - Challenges encountered (e.g., spare part shortages, increased service demand) and solutions adopted.
+    - Recommendations for improving after-sales service resilience and customer engagement in future crises.
+    """,
+    agent="samsung_care",
+    stage="After-Sales",
+    topics=["customer", "consumer", "repair", "warranty", "spare", "service", "after-sales"],
+    kpis=True
+)
+
+# -----------------------------------------------------------------------------------
+# 2. SUMMARY AGENT TASK
+# -----------------------------------------------------------------------------------
+TASK_SPECS["summary"] = dict(
+    description="""
+    Summary Agent must collect the most important information from all other agents' outputs 
+    and produce a final summary and highlight section.
+
+    - Review the final outputs from each agent (Qualcomm, Samsung Display, Sony Camera, LG Chem, 
+      SK Hynix, Ibiden, Foxconn, DHL, Amazon, Samsung Care, and the Crisis Analyst).
+    - Extract critical highlights, including major KPIs, challenges, solutions, and overall 
+      operational performance.
+    - Provide a concise set of bullet points for "Highlights" and a short paragraph summarizing 
+      how the crisis was managed.
+    """,
+    expected_output="""
+    Final Consolidated Summary
+
+    Highlights:
+    - Key bullet points capturing major achievements and metrics.
+
+    Overall Summary:
+    A concise paragraph describing the outcome of the crisis management efforts, 
+    including main challenges, solutions, and the final result on supply chain operations.
+    """,
+    agent="summary_agent",
+    stage="Summary"
+)
+
+
+@dataclass
+class SimulationTasks:
+    """The tasks of one run, split the way the app executes them."""
+    crisis_analysis: CompiledTask
+    remaining: list
+    summary: CompiledTask
+    stages: dict
+    topics: dict
+    agent_keys: dict
+    # {role: level of the task in the dependency graph} of the production tasks
+    levels: dict = field(default_factory=dict)
+
+    @property
+    def all(self):
+        return [self.crisis_analysis] + self.remaining + [self.summary]
+
+    def tiers(self):
+        """``{stage: [roles]}`` of the production tasks, ordered by the level each stage starts at."""
+        tiers = {}
+        for t in sorted(self.remaining, key=lambda t: self.levels.get(t.agent.role, 0)):
+            tiers.setdefault(self.stages[t.agent.role], []).append(t.agent.role)
+        return tiers
+
+
+def build_tasks(agents, crisis_detail, crisis_duration, specs=None, levels=None):
+    """
+    Render every template in ``specs`` (``TASK_SPECS`` by default) into a new
+    ``CompiledTask`` for one run. ``specs`` must list every task after the tasks
+    it depends on, as ``network.compile_network`` orders them. ``levels`` are the ``{task key: level}`` of the
+    production tasks, as computed by ``network.compile_network``.
+    """
+    specs = specs or TASK_SPECS
+    built = {}
+    for key, spec in specs.items():
+        expected_output = spec["expected_output"] + (KPI_INSTRUCTIONS if spec.get("kpis") else "")
+        built[key] = CompiledTask(
+            description=spec["description"],
+            expected_output=expected_output,
+            prefix=compile_prefix(spec["description"], expected_output),
+            agent=agents[spec["agent"]],
+            context=[built[dep] for dep in spec.get("context", [])] or None,
+        )
+    # Only the crisis analysis reads the crisis as the user wrote it; every other task works
+    # from the analysis, so its prompt and memo key do not change with the wording
+    built[CRISIS_TASK].add_input(None, run_inputs(crisis_detail, crisis_duration))
+    return SimulationTasks(
+        crisis_analysis=built[CRISIS_TASK],
+        remaining=[built[key] for key in specs if key not in (CRISIS_TASK, SUMMARY_TASK)],
+        summary=built[SUMMARY_TASK],
+        stages={agents[spec["agent"]].role: spec["stage"] for spec in specs.values()},
+        topics={agents[spec["agent"]].role: spec.get("topics", []) for spec in specs.values()},
+        agent_keys={agents[spec["agent"]].role: spec["agent"] for spec in specs.values()},
+        levels={built[key].agent.role: level for key, level in (levels or {}).items()},
+    )
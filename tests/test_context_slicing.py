@@ -0,0 +1,36 @@
+from context_slicing import prepare_contexts, split_sections
+from tokens import count_tokens
+
+
+FILLER = "Freight rates stay high while carriers reroute around the closed lanes. " * 5
+
+
+def test_a_report_within_the_limit_is_passed_whole():
+    report = "Port strikes close Busan for two weeks.\n\nChip output is unaffected."
+    contexts = prepare_contexts(report, {"DHL": ["port"], "Amazon": ["warehouse"]}, slice_tokens=900)
+    for context in contexts.values():
+        assert context.text == report
+        assert context.tokens_after == count_tokens(report)
+
+
+def test_a_report_without_headings_is_split_at_its_paragraphs():
+    paragraphs = [
+        f"Overview of the crisis. {FILLER}",
+        f"Demand outlook for the quarter. {FILLER}",
+        f"Battery cell supply falls by a third. {FILLER}",
+        f"Port congestion delays container shipping. {FILLER}",
+    ]
+    report = "\n\n".join(paragraphs)
+    assert [s.title for s in split_sections(report)] == ["Paragraph 1", "Paragraph 2", "Paragraph 3", "Paragraph 4"]
+
+    contexts = prepare_contexts(report, {"DHL": ["container"]}, digest_tokens=100, slice_tokens=300)
+    dhl = contexts["DHL"]
+    assert dhl.sections == ["Paragraph 4"]
+    assert "Port congestion delays container shipping." in dhl.text
+    assert "Battery cell supply" not in dhl.text
+    assert dhl.tokens_after < dhl.tokens_before
+
+
+def test_headings_still_split_sections():
+    report = "# Crisis\nStrikes.\n\n## Logistics\nPorts closed.\n\nMore on ports."
+    assert [s.title for s in split_sections(report)] == ["Crisis", "Logistics"]
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+
+from deadline import CancellationHandler, TaskCancelled, cancel_scope, partial_answer, run_with_timeout
+from fake_llm import FakeChatModel
+
+
+class TokenCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.tokens = 0
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.tokens += 1
+
+
+def test_cancelled_llm_call_stops_streaming():
+    counter = TokenCounter()
+    # About four seconds of streaming
+    llm = FakeChatModel(latency_s=0.0, output_tokens=400, tokens_per_second=100.0)
+    llm.callbacks = [counter, CancellationHandler()]
+
+    finished, value = run_with_timeout(lambda: llm.invoke("You are Supplier 1."), 0.3)
+    assert not finished and value is None
+
+    time.sleep(0.2)
+    streamed = counter.tokens
+    time.sleep(0.3)
+    assert counter.tokens == streamed
+    assert not any(thread.name == "budgeted-task" for thread in threading.enumerate())
+
+
+def test_cancel_scope_stops_the_next_call():
+    llm = FakeChatModel(latency_s=0.0)
+    llm.callbacks = [CancellationHandler()]
+    event = threading.Event()
+    event.set()
+    with cancel_scope(event), pytest.raises(TaskCancelled):
+        llm.invoke("You are Supplier 1.")
+    # Outside the scope the same model answers
+    assert "Final Answer:" in llm.invoke("You are Supplier 1.").content
+
+
+def test_finished_calls_return_their_value():
+    assert run_with_timeout(lambda: 42, 1.0) == (True, 42)
+
+
+def test_partial_answer_prefers_the_final_answer():
+    assert partial_answer("Thought: checking\nFinal Answer: ships late") == "ships late"
+    assert partial_answer("Thought: checking the ports") == "checking the ports"
@@ -0,0 +1,34 @@
+import threading
+
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+
+import event_log
+from event_log import EventLog, log_agent_step
+
+
+def test_log_agent_step_on_a_fresh_thread_without_a_task_span(monkeypatch):
+    log = EventLog(ring_events=10)
+    monkeypatch.setattr(event_log, "_event_log", log)
+    errors = []
+
+    def steps():
+        try:
+            log_agent_step([AgentStep(action=AgentAction("search", "ports", "Thought: check ports"), observation="closed")])
+            log_agent_step(AgentFinish({"output": "Ports are closed."}, "Final Answer: Ports are closed."))
+        except Exception as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=steps)
+    thread.start()
+    thread.join()
+    assert errors == []
+    assert log.flush(2)
+    assert log.stats().emitted == 2
+
+
+def test_events_are_kept_per_run_and_sampled_by_run():
+    log = EventLog(sample_rate=0.0, ring_events=2)
+    for step in range(3):
+        log.emit("agent_action", "run-1", "Supplier 1", step)
+    assert [event.step for event in log.events("run-1")] == [1, 2]
+    assert log.stats().sampled_out == 3
@@ -0,0 +1,23 @@
+from memory_store import EMBEDDING_BYTES, RunMemory
+
+
+REPORT = "## Shortages\nThe port strike delays wafer deliveries.\n\n## Solutions\nWafers are flown in from Japan."
+
+
+def test_stats_count_what_crewai_memory_would_have_cost():
+    memory = RunMemory(capacity=8)
+    memory.save("Qualcomm", REPORT)
+    notes = memory.recall("wafer deliveries delayed by the strike", roles={"Qualcomm"}, k=1)
+    stats = memory.stats()
+    assert [role for role, _, _ in notes] == ["Qualcomm"]
+    assert (stats.saves, stats.recalls) == (1, 1)
+    assert stats.embedding_calls_avoided == 2
+    assert stats.disk_writes_avoided == 1
+    assert stats.disk_bytes_avoided == len(REPORT.encode("utf-8")) + EMBEDDING_BYTES
+    assert stats.notes_recalled == 1 and stats.recalled_tokens > 0
+
+
+def test_recall_is_limited_to_the_given_roles():
+    memory = RunMemory(capacity=8)
+    memory.save("Qualcomm", REPORT)
+    assert memory.recall("wafer deliveries delayed by the strike", roles={"Sony"}) == []
@@ -0,0 +1,36 @@
+from fake_llm import FakeChatModel
+from llm_cache import LLMResponseCache
+from metrics import MetricsCallbackHandler, MetricsRecorder, render_prometheus, task_scope
+
+
+MODEL = "gpt-4o-mini"
+
+
+def exported(line_start):
+    """Value of the first exported Prometheus series starting with ``line_start``, 0 when absent."""
+    for line in render_prometheus().splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_cache_hits_are_free_and_left_out_of_the_latency_histogram():
+    llm = FakeChatModel(
+        model_name=MODEL, latency_s=0.0, cache=LLMResponseCache(":memory:").view(MODEL, 0.7),
+        callbacks=[MetricsCallbackHandler(MODEL)],
+    )
+    latency_count = f'simulator_llm_latency_seconds_count{{model="{MODEL}"}}'
+    hits = f'simulator_llm_cache_hits_total{{role="Metrics Supplier",model="{MODEL}"}}'
+    observed = exported(latency_count)
+    recorder = MetricsRecorder()
+    with task_scope(recorder, "Metrics Supplier"):
+        llm.invoke("You are Supplier 1.")
+        llm.invoke("You are Supplier 1.")
+
+    provider_call, cached_call = recorder.by_kind("llm")
+    assert not provider_call.cache_hit
+    assert provider_call.completion_tokens > 0 and provider_call.cost_usd > 0
+    assert cached_call.cache_hit
+    assert (cached_call.prompt_tokens, cached_call.completion_tokens, cached_call.cost_usd) == (0, 0, 0.0)
+    assert exported(latency_count) == observed + 1
+    assert exported(hits) == 1
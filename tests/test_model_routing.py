@@ -0,0 +1,29 @@
+from fake_llm import FakeChatModel
+from llm_cache import LLMResponseCache
+from model_routing import LatencyRouter, RoutedChatModel
+
+
+def routed_model(router, cache=None):
+    primary = FakeChatModel(model_name="fake-strong", latency_s=0.0, cache=cache)
+    fallback = FakeChatModel(model_name="fake-fast", latency_s=0.0)
+    return RoutedChatModel(primary=primary, fallback=fallback, router=router)
+
+
+def calls(router, model):
+    return next((latency.calls for latency in router.stats() if latency.model == model), 0)
+
+
+def test_cache_hits_are_left_out_of_the_latency_statistics():
+    router = LatencyRouter()
+    llm = routed_model(router, LLMResponseCache(":memory:").view("fake-strong", 0.7))
+    first = llm.invoke("You are Supplier 1.").content
+    assert llm.invoke("You are Supplier 1.").content == first
+    assert calls(router, "fake-strong") == 1
+
+
+def test_provider_calls_are_recorded():
+    router = LatencyRouter()
+    llm = routed_model(router)
+    llm.invoke("You are Supplier 1.")
+    llm.invoke("You are Supplier 1.")
+    assert calls(router, "fake-strong") == 2
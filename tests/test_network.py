@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("crewai")
+
+from agents import build_agents  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+from network import parse_network  # noqa: E402
+from tasks import CRISIS_TASK, SUMMARY_TASK, build_tasks  # noqa: E402
+
+
+TEMPLATE = {
+    "agent": {"role": "{name}", "goal": "Supply {name}.", "backstory": "{name} is a supplier."},
+    "task": {"description": "{name} must keep supplying.", "expected_output": "{name} Report", "stage": "Suppliers"},
+}
+
+# "a" depends on "b" but is listed first
+OUT_OF_ORDER = {
+    "templates": {"supplier": TEMPLATE},
+    "nodes": [
+        {"key": "a", "template": "supplier", "depends_on": ["b"], "vars": {"name": "A"}},
+        {"key": "b", "template": "supplier", "vars": {"name": "B"}},
+    ],
+}
+
+
+def test_tasks_are_ordered_by_their_dependencies():
+    network = parse_network(OUT_OF_ORDER)
+    assert list(network.tasks) == [CRISIS_TASK, "b", "a", SUMMARY_TASK]
+    assert network.levels == {"b": 0, "a": 1}
+
+
+def test_tasks_listed_before_their_dependencies_are_built():
+    network = parse_network(OUT_OF_ORDER)
+    agents = build_agents(FakeChatModel(), specs=network.agents)
+    run_tasks = build_tasks(agents, "Port strike", 3, network.tasks, network.levels)
+    a, = [t for t in run_tasks.remaining if t.agent.role == "A"]
+    assert [t.agent.role for t in a.context] == ["B"]
@@ -0,0 +1,47 @@
+import httpx
+import openai
+from langchain_core.messages import HumanMessage
+
+from rate_limit import RateLimitedChatOpenAI, RateLimiter, build_rate_limited_llm
+
+
+def completion_response(request):
+    return httpx.Response(
+        200,
+        json={
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": "Final Answer: ok"}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+        },
+    )
+
+
+def test_build_rate_limited_llm_leaves_langchain_rate_limiter_unset():
+    limiter = RateLimiter()
+    llm = build_rate_limited_llm("gpt-4o-mini", 0.7, limiter, openai_api_key="test")
+    assert llm.request_limiter is limiter
+    assert llm.rate_limiter is None
+
+
+def test_uncached_invoke_goes_through_the_request_limiter():
+    limiter = RateLimiter()
+    client = openai.OpenAI(
+        api_key="test", http_client=httpx.Client(transport=httpx.MockTransport(completion_response)), max_retries=0
+    )
+    llm = RateLimitedChatOpenAI(
+        model_name="gpt-4o-mini",
+        openai_api_key="test",
+        request_limiter=limiter,
+        client=client.chat.completions,
+        max_retries=0,
+        cache=False,
+    )
+    message = llm.invoke([HumanMessage(content="Report on the crisis.")])
+    assert message.content == "Final Answer: ok"
+    assert limiter.stats().requests == 1
+    assert limiter.stats().failures == 0
@@ -0,0 +1,209 @@
+import pytest
+
+from semantic_cache import (
+    DEFAULT_SIMILARITY_THRESHOLD, CrisisAnalysisCache, CrisisEmbedder, conflicts, contradicts, crisis_terms,
+)
+
+
+# Rewordings of the same crisis, which should share an analysis
+PARAPHRASES = [
+    (
+        "A strike by dock workers has closed the main container ports of East Asia for six weeks. "
+        "Ships are queueing outside the ports and freight rates have doubled. "
+        "Components from suppliers in the region cannot be shipped to assembly plants.",
+        "Container ports across East Asia are shut by a dockworkers' strike expected to last six weeks. "
+        "With vessels waiting at anchor, freight rates have doubled, and suppliers in the region "
+        "cannot ship components to the assembly plants.",
+    ),
+    (
+        "Typhoon Haikui made landfall in Taiwan and flooded several semiconductor fabs in Hsinchu. "
+        "Power outages halted wafer production, and clean rooms need to be decontaminated before "
+        "production can restart. Chip deliveries to smartphone makers are delayed.",
+        "Flooding from Typhoon Haikui hit semiconductor fabs in Hsinchu, Taiwan. Production of wafers "
+        "stopped after power outages, and the clean rooms must be decontaminated before it restarts. "
+        "Smartphone makers face delayed chip deliveries.",
+    ),
+    (
+        "A magnitude 7 earthquake struck northern Japan, damaging factories that produce camera sensors "
+        "and display glass. Aftershocks and inspections keep production lines halted, and rail links "
+        "to the ports are cut.",
+        "Northern Japan was hit by a magnitude 7 quake that damaged plants making display glass and "
+        "camera sensors. Production lines remain halted during inspections and aftershocks, while "
+        "rail connections to the ports are cut.",
+    ),
+    (
+        "The US imposes a 25% tariff on electronics components imported from China. "
+        "Importers must pay the tariff on memory chips, circuit boards and batteries, and suppliers "
+        "are looking to move production to Vietnam and India.",
+        "A 25% US tariff now applies to electronics components imported from China, including memory "
+        "chips, circuit boards and batteries. Suppliers are considering moving production to Vietnam "
+        "and India to avoid the tariff.",
+    ),
+    (
+        "A global shortage of lithium is driving up battery prices. Mines in Chile and Australia cannot "
+        "keep up with demand, and battery makers are rationing cells to their customers.",
+        "Battery prices are rising because of a worldwide lithium shortage. Demand exceeds what mines in "
+        "Australia and Chile can produce, so battery makers ration cells among their customers.",
+    ),
+    (
+        "A ransomware attack on Foxconn took its factory systems in Vietnam offline. Assembly lines are "
+        "stopped while the systems are restored, and orders are being moved to other plants.",
+        "Foxconn's factory systems in Vietnam went offline after a ransomware attack. While the systems "
+        "are restored, the assembly lines are stopped and orders move to other plants.",
+    ),
+    (
+        "Sanctions on Russia cut off exports of neon gas, which chip fabs use in lithography lasers. "
+        "Fabs have a few months of stock left, and neon prices have risen tenfold.",
+        "Neon gas exports from Russia are cut off by sanctions. Chip fabs need neon for their lithography "
+        "lasers, hold only a few months of stock, and face neon prices that have risen tenfold.",
+    ),
+    (
+        "A pandemic lockdown in Shenzhen closes the factories that assemble circuit boards. Workers must stay "
+        "home for at least three weeks and trucks cannot reach the industrial parks.",
+        "Factories assembling circuit boards in Shenzhen are closed by a pandemic lockdown. For three weeks or "
+        "more, workers stay home and trucks are unable to reach the industrial parks.",
+    ),
+    ("semiconductor shortage and port strikes", "port strikes plus chip shortage"),
+    ("Typhoon floods Taiwanese chip fabs", "Flooding of chip fabs in Taiwan after a hurricane"),
+    ("Global shortage of lithium for batteries", "Lithium scarcity hits battery makers worldwide"),
+]
+
+# Crises worded alike that differ in a number, company, place, kind of crisis or product
+DIFFERENT_IDENTIFIERS = [
+    ("Port closures in East Asia", "Port closures in Europe"),
+    ("A 10% tariff on electronics components", "A 60% tariff on electronics components"),
+    ("Samsung plants flooded", "Foxconn plants flooded"),
+    (
+        "A strike by dock workers has closed the main container ports of East Asia for six weeks. "
+        "Ships are queueing outside the ports and freight rates have doubled.",
+        "A strike by dock workers has closed the main container ports of Europe for six weeks. "
+        "Ships are queueing outside the ports and freight rates have doubled.",
+    ),
+    (
+        "The US imposes a 10% tariff on electronics components imported from China. "
+        "Importers must pay the tariff on memory chips, circuit boards and batteries.",
+        "The US imposes a 60% tariff on electronics components imported from China. "
+        "Importers must pay the tariff on memory chips, circuit boards and batteries.",
+    ),
+    (
+        "Heavy rain flooded Samsung plants in South Korea. Production of displays and memory chips "
+        "is halted until the plants are cleaned up.",
+        "Heavy rain flooded Foxconn plants in South Korea. Production of displays and memory chips "
+        "is halted until the plants are cleaned up.",
+    ),
+    (
+        "A magnitude 7 earthquake struck northern Japan, damaging factories that produce camera sensors.",
+        "A magnitude 7 earthquake struck southern Japan, damaging factories that produce camera sensors.",
+    ),
+    (
+        "A flood at the Samsung memory plant in South Korea halts production for two weeks.",
+        "A fire at the Samsung memory plant in South Korea halts production for two weeks.",
+    ),
+    (
+        "A shortage of memory chips from SK Hynix in Korea delays smartphone assembly in Vietnam.",
+        "A shortage of display panels from SK Hynix in Korea delays smartphone assembly in Vietnam.",
+    ),
+    ("semiconductor shortage and port strikes", "semiconductor shortage"),
+    ("Global shortage of lithium for batteries", "Global shortage of cobalt for batteries"),
+]
+
+# Different crises with the same identifiers, told apart by their similarity alone
+DIFFERENT_CRISES = [
+    (
+        "Dock workers at the container ports of East Asia are on strike for six weeks, and ships cannot "
+        "be unloaded.",
+        "Truck drivers serving the container ports of East Asia are on strike for six weeks, and "
+        "containers cannot leave the terminals.",
+    ),
+    (
+        "A semiconductor shortage in Taiwan delays chip deliveries to smartphone makers by several months.",
+        "A semiconductor shortage in Taiwan raises chip prices for carmakers, who cut vehicle output.",
+    ),
+    (
+        "A pandemic lockdown in Shenzhen closes the factories that assemble circuit boards.",
+        "A pandemic lockdown in Shenzhen keeps customs officers home, so finished circuit boards wait at "
+        "the border for clearance.",
+    ),
+]
+
+NEGATIONS = [
+    ("No port strike; only a chip shortage", "port strike and chip shortage"),
+    ("port strike without a chip shortage", "port strike and chip shortage"),
+    ("Ports are not on strike, but chips are short", "port strikes plus chip shortage"),
+]
+
+
+def similarity(a, b):
+    embedder = CrisisEmbedder()
+    return float(embedder.embed(a) @ embedder.embed(b))
+
+
+@pytest.mark.parametrize("a, b", PARAPHRASES)
+def test_paraphrases_match(a, b):
+    assert similarity(a, b) >= DEFAULT_SIMILARITY_THRESHOLD
+    assert not conflicts(crisis_terms(a), crisis_terms(b))
+
+
+@pytest.mark.parametrize("a, b", DIFFERENT_IDENTIFIERS + NEGATIONS)
+def test_crises_with_different_identifiers_conflict(a, b):
+    assert conflicts(crisis_terms(a), crisis_terms(b))
+
+
+@pytest.mark.parametrize("a, b", DIFFERENT_CRISES)
+def test_different_crises_stay_below_the_threshold(a, b):
+    assert similarity(a, b) < DEFAULT_SIMILARITY_THRESHOLD
+
+
+@pytest.mark.parametrize("a, b", NEGATIONS)
+def test_negated_terms_contradict(a, b):
+    assert contradicts(crisis_terms(a), crisis_terms(b))
+
+
+def test_negation_ends_with_the_clause():
+    terms = crisis_terms("No port strike; only a chip shortage")
+    assert (terms.asserted, terms.negated) == (["semiconductor", "shortage"], ["port", "strike"])
+
+
+def test_identifiers():
+    terms = crisis_terms("Samsung warns that a six-week strike at Busan and a 12.5% tariff hit its OLED output.")
+    assert terms.numbers == {6, 12.5}
+    assert terms.names == {"samsung", "busan"}
+    assert terms.events == {"strike", "tariff"}
+    assert terms.products == {"oled"}
+
+
+def test_sentence_start_is_not_a_name():
+    assert crisis_terms("Ships queue outside the ports. Freight rates doubled.").names == set()
+
+
+@pytest.fixture
+def cache():
+    return CrisisAnalysisCache(":memory:", max_entries=10)
+
+
+def test_lookup_reuses_the_analysis_of_a_reworded_crisis(cache):
+    cache.put(PARAPHRASES[0][0], 3, "analysis", 12.0)
+    match = cache.lookup(PARAPHRASES[0][1], 3)
+    assert match is not None
+    assert match.output == "analysis"
+    assert cache.stats().hits == 1
+
+
+@pytest.mark.parametrize("a, b", DIFFERENT_IDENTIFIERS[:3])
+def test_lookup_never_reuses_the_analysis_of_a_crisis_with_other_identifiers(cache, a, b):
+    cache.put(a, 3, "analysis", 12.0)
+    # Even a threshold every other crisis would pass does not reuse the analysis
+    cache.similarity_threshold = 0.0
+    assert cache.lookup(b, 3) is None
+
+
+def test_lookup_never_reuses_the_analysis_of_a_negated_crisis(cache):
+    cache.put("port strike and chip shortage", 3, "analysis", 12.0)
+    cache.similarity_threshold = 0.0
+    assert cache.lookup("No port strike; only a chip shortage", 3) is None
+    assert cache.stats().misses == 1
+
+
+def test_lookup_requires_the_same_duration(cache):
+    cache.put("semiconductor shortage and port strikes", 3, "analysis", 12.0)
+    assert cache.lookup("semiconductor shortage and port strikes", 4) is None
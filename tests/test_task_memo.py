@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from metrics import MetricsRecorder, Span
+from task_memo import TaskMemo, answered_by_fallback
+
+
+def routed_task(role="Crisis Analyst"):
+    llm = SimpleNamespace(model_name="gpt-4o", fallback=SimpleNamespace(model_name="gpt-4o-mini"))
+    return SimpleNamespace(agent=SimpleNamespace(role=role, llm=llm))
+
+
+def llm_span(recorder, role, model):
+    recorder.add(Span("llm", f"{role} #1", recorder.run_id, 0.0, role=role, model=model))
+
+
+def test_outputs_of_the_primary_model_are_memoizable():
+    recorder = MetricsRecorder()
+    llm_span(recorder, "Crisis Analyst", "gpt-4o")
+    llm_span(recorder, "Supplier 1", "gpt-4o-mini")
+    assert not answered_by_fallback(routed_task(), recorder)
+
+
+def test_outputs_answered_by_the_fallback_model_are_not_memoizable():
+    recorder = MetricsRecorder()
+    llm_span(recorder, "Crisis Analyst", "gpt-4o")
+    llm_span(recorder, "Crisis Analyst", "gpt-4o-mini")
+    assert answered_by_fallback(routed_task(), recorder)
+
+
+def test_unrouted_agents_and_unmeasured_runs():
+    unrouted = SimpleNamespace(agent=SimpleNamespace(role="Supplier 1", llm=SimpleNamespace(model_name="gpt-4o-mini")))
+    assert not answered_by_fallback(unrouted, None)
+    assert answered_by_fallback(routed_task(), None)
+
+
+def test_memo_round_trip():
+    memo = TaskMemo(":memory:")
+    assert memo.get("key") is None
+    memo.put("key", "Supplier 1", "report", 3.5)
+    entry = memo.get("key")
+    assert (entry.output, entry.duration_s) == ("report", 3.5)
+    assert memo.stats().hits == 1 and memo.stats().misses == 1